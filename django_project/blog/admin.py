@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Pet
+from django.contrib import admin, messages
+from .models import ModerationLog, Pet
+from .moderation import moderate_pets
+from .search import search_pet_ids
+
+# Сколько результатов полнотекстового поиска показывать в админке
+ADMIN_SEARCH_LIMIT = 1000
 
 
 @admin.register(Pet)
@@ -7,3 +12,33 @@ class PetAdmin(admin.ModelAdmin):
     list_display = ('name', 'species', 'age', 'owner', 'created_at')
     list_filter = ('species', 'owner')
     search_fields = ('name', 'description')
+    list_select_related = ('owner',)
+    actions = ('activate_pets', 'deactivate_pets')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по search_fields используется полнотекстовый индекс (см. blog.search)
+        if not search_term.strip():
+            return queryset, False
+        pet_ids = search_pet_ids(search_term, active_only=False, limit=ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=pet_ids), False
+
+    def _moderate(self, request, queryset, active):
+        # Один UPDATE на все выбранные записи вместо save() для каждой
+        changed = moderate_pets(queryset.values_list('pk', flat=True), active, request.user)
+        self.message_user(request, f'Статус изменён у питомцев: {len(changed)}.', messages.SUCCESS)
+
+    @admin.action(description='Активировать выбранных питомцев')
+    def activate_pets(self, request, queryset):
+        self._moderate(request, queryset, True)
+
+    @admin.action(description='Деактивировать выбранных питомцев')
+    def deactivate_pets(self, request, queryset):
+        self._moderate(request, queryset, False)
+
+
+@admin.register(ModerationLog)
+class ModerationLogAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'action', 'pet', 'moderator', 'batch')
+    list_filter = ('action',)
+    list_select_related = ('pet', 'moderator')
+    readonly_fields = ('pet', 'moderator', 'action', 'batch', 'created_at')
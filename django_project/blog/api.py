@@ -0,0 +1,373 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from django.forms import model_to_dict, modelform_factory
+from django.http import HttpResponse, QueryDict
+from django.middleware.csrf import CsrfViewMiddleware, get_token
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from config.conditional import viewer_key
+from users.permissions import get_permissions
+
+from .cache import get_pet_version
+from .forms import PetForm, ReviewForm
+from .listing import ORDERING, SORT_ORDERINGS, InvalidCursor, cursor_page, filter_pets
+from .models import Pedigree, Pet, Review
+from .page_cache import get_pages_version
+
+# JSON API для питомцев, родословных и отзывов.
+# Списки листаются курсором по (created_at, id) без COUNT, fields= ограничивает
+# выбираемые колонки через only(), include= подгружает связанные записи одним prefetch.
+# ETag ответа на GET строится из версии данных в кэше (blog.cache, blog.page_cache) до обработчика:
+# повторный запрос с If-None-Match получает 304 без запросов к базе и сериализации.
+# Вошедший через сессию клиент отправляет POST/PATCH/DELETE с заголовком X-CSRFToken
+# (значение cookie csrftoken, её выставляет любой GET к API); без него ответ — 403 в JSON.
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Поле в ответе -> поле модели (для внешних ключей отдаётся id)
+PET_FIELDS = {
+    'id': 'id', 'name': 'name', 'species': 'species', 'age': 'age', 'birth_date': 'birth_date',
+    'description': 'description', 'owner': 'owner_id', 'is_active': 'is_active', 'view_count': 'view_count',
+    'rating_avg': 'rating_avg', 'review_count': 'review_count', 'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+PEDIGREE_FIELDS = {
+    'id': 'id', 'pet': 'pet_id', 'parent_type': 'parent_type', 'parent_name': 'parent_name', 'breed': 'breed',
+    'birth_date': 'birth_date', 'description': 'description',
+}
+REVIEW_FIELDS = {
+    'id': 'id', 'slug': 'slug', 'pet': 'pet_id', 'author': 'author_id', 'text': 'text', 'rating': 'rating',
+    'created_at': 'created_at',
+}
+PET_INCLUDES = {'pedigrees': PEDIGREE_FIELDS, 'reviews': REVIEW_FIELDS}
+# Поля, которые в форме питомца меняют только администраторы и модераторы
+MODERATED_FIELDS = ('is_active', 'owner', 'view_count')
+
+PedigreeForm = modelform_factory(Pedigree, fields=('parent_type', 'parent_name', 'breed', 'birth_date',
+                                                   'description'))
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.body = {'detail': detail, **extra}
+
+
+def json_response(data, status=200):
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+def serialize(obj, fields):
+    return {name: getattr(obj, attname) for name, attname in fields.items()}
+
+
+def _split(value):
+    return [part for part in (value or '').split(',') if part]
+
+
+def parse_fields(request, available):
+    """Поля из ?fields=; id возвращается всегда."""
+    requested = _split(request.GET.get('fields'))
+    if not requested:
+        return available
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise ApiError(400, f'Unknown fields: {", ".join(unknown)}', available=list(available))
+    return {name: available[name] for name in ['id', *requested] if name in available}
+
+
+def parse_limit(request):
+    limit = request.GET.get('limit', '')
+    return min(int(limit), MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else DEFAULT_LIMIT
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Invalid JSON')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Expected a JSON object')
+        return data
+    if request.method == 'POST':
+        return request.POST.dict()
+    # Для PATCH Django не разбирает тело формы сам
+    return QueryDict(request.body).dict()
+
+
+class CsrfCheck(CsrfViewMiddleware):
+    """Проверка CsrfViewMiddleware, которая сообщает об ошибке ApiError, а не HTML-страницей 403."""
+
+    def _reject(self, request, reason):
+        raise ApiError(403, 'CSRF verification failed', reason=reason)
+
+
+class ApiView(View):
+    """Общая часть: ошибки в JSON, проверка CSRF и условные ответы на GET."""
+
+    # Middleware пропускает API, CSRF проверяется в check_csrf
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        etag = response = None
+        try:
+            self.check_csrf(request)
+            if request.method == 'GET':
+                etag = self.get_etag(request, *args, **kwargs)
+            if etag is not None:
+                # None, если If-None-Match не совпал; иначе готовый ответ 304
+                response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response(error.body, status=error.status)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+        # Ответы зависят от пользователя (видимость неактивных питомцев)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+    def check_csrf(self, request):
+        # Анонимный запрос не несёт cookie сессии, подделывать от его имени нечего
+        if not request.user.is_authenticated:
+            return
+        if request.method in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            get_token(request)
+            return
+        check = CsrfCheck(lambda request: None)
+        check.process_request(request)
+        check.process_view(request, None, (), {})
+
+    def get_version(self, **kwargs):
+        """Версия данных ответа на GET, которая дешевле самого ответа, или None, если ETag не нужен."""
+        return None
+
+    def get_etag(self, request, *args, **kwargs):
+        version = self.get_version(**kwargs)
+        if version is None:
+            return None
+        # Ответ зависит от адреса (fields, include, курсор, фильтры) и от того, кто смотрит
+        key = f'{version}|{request.get_full_path()}|{viewer_key(request)}'
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        raise ApiError(405, f'Method {request.method} not allowed')
+
+    @property
+    def access(self):
+        return get_permissions(self.request.user)
+
+    def require_login(self):
+        if not self.request.user.is_authenticated:
+            raise ApiError(401, 'Authentication required')
+
+    def visible_pets(self):
+        # Видимость та же, что у списка на сайте: неактивных видят администраторы и модераторы
+        return filter_pets(Pet.objects.all(), {}, self.request.user)
+
+    def get_pet(self, pk, *fields):
+        queryset = self.visible_pets()
+        if fields:
+            queryset = queryset.only(*fields)
+        try:
+            return queryset.get(pk=pk)
+        except Pet.DoesNotExist:
+            raise ApiError(404, 'Pet not found')
+
+    def page(self, queryset, fields, ordering=ORDERING):
+        # Поля ключа сортировки нужны курсору, даже если их не запросили
+        columns = {attname for attname in fields.values()} | {name.lstrip('-') for name in ordering}
+        try:
+            rows, next_cursor, previous_cursor = cursor_page(
+                queryset.only(*columns), self.request.GET.get('cursor'), parse_limit(self.request), ordering)
+        except InvalidCursor:
+            # Курсор другой сортировки или испорченный: молча отдать первую страницу было бы ошибкой
+            raise ApiError(400, 'Invalid cursor')
+        return rows, {'next': next_cursor or None, 'previous': previous_cursor or None}
+
+    def form_errors(self, form):
+        return ApiError(400, 'Validation failed', errors=form.errors.get_json_data())
+
+
+class PetApiMixin:
+    def pet_queryset(self, includes):
+        queryset = self.visible_pets()
+        for name in includes:
+            related = PET_INCLUDES[name]
+            related_queryset = (Pedigree if name == 'pedigrees' else Review).objects.only(*related.values())
+            if name == 'reviews':
+                related_queryset = related_queryset.order_by(*ORDERING)
+            queryset = queryset.prefetch_related(Prefetch(name, queryset=related_queryset))
+        return queryset
+
+    def parse_includes(self):
+        includes = _split(self.request.GET.get('include'))
+        unknown = [name for name in includes if name not in PET_INCLUDES]
+        if unknown:
+            raise ApiError(400, f'Unknown include: {", ".join(unknown)}', available=list(PET_INCLUDES))
+        return includes
+
+    def serialize_pet(self, pet, fields, includes):
+        data = serialize(pet, fields)
+        for name in includes:
+            data[name] = [serialize(obj, PET_INCLUDES[name]) for obj in getattr(pet, name).all()]
+        return data
+
+    def pet_form(self, data, instance=None):
+        if instance is not None:
+            # PATCH: неуказанные поля берутся из текущей записи
+            data = {**model_to_dict(instance, fields=PetForm._meta.fields), **data}
+        elif self.access.can_moderate_fields:
+            data.setdefault('owner', self.request.user.pk)
+        form = PetForm(data, instance=instance)
+        if not self.access.can_moderate_fields:
+            for name in MODERATED_FIELDS:
+                del form.fields[name]
+        return form
+
+
+class PetListApiView(PetApiMixin, ApiView):
+    """GET — список с фильтрами PetListView, POST — новый питомец."""
+
+    def get_version(self):
+        # Общая версия списков: её сдвигает любое изменение питомцев, родословных и отзывов
+        return get_pages_version()
+
+    def get(self, request):
+        fields = parse_fields(request, PET_FIELDS)
+        includes = self.parse_includes()
+        ordering = SORT_ORDERINGS.get(request.GET.get('sort', ''), ORDERING)
+        queryset = filter_pets(self.pet_queryset(includes), request.GET, request.user)
+        is_active = request.GET.get('is_active')
+        if is_active in ('true', 'false'):
+            queryset = queryset.filter(is_active=is_active == 'true')
+        pets, links = self.page(queryset, fields, ordering)
+        return json_response({'results': [self.serialize_pet(pet, fields, includes) for pet in pets], **links})
+
+    def post(self, request):
+        self.require_login()
+        if not self.access.can_edit_pets:
+            raise ApiError(403, 'You cannot create pets')
+        form = self.pet_form(parse_body(request))
+        if not form.is_valid():
+            raise self.form_errors(form)
+        if not self.access.can_moderate_fields:
+            form.instance.owner = request.user
+        pet = form.save()
+        return json_response(serialize(pet, PET_FIELDS), status=201)
+
+
+class PetDetailApiView(PetApiMixin, ApiView):
+    """GET, PATCH и DELETE одного питомца."""
+
+    def get_version(self, pk):
+        return get_pet_version(pk)
+
+    def get(self, request, pk):
+        fields = parse_fields(request, PET_FIELDS)
+        includes = self.parse_includes()
+        queryset = self.pet_queryset(includes).only(*fields.values())
+        pet = queryset.filter(pk=pk).first()
+        if pet is None:
+            raise ApiError(404, 'Pet not found')
+        return json_response(self.serialize_pet(pet, fields, includes))
+
+    def patch(self, request, pk):
+        self.require_login()
+        pet = self.get_pet(pk)
+        if not self.access.can_edit(pet):
+            raise ApiError(403, 'You cannot edit this pet')
+        form = self.pet_form(parse_body(request), instance=pet)
+        if not form.is_valid():
+            raise self.form_errors(form)
+        pet = form.save()
+        return json_response(serialize(pet, PET_FIELDS))
+
+    def delete(self, request, pk):
+        self.require_login()
+        pet = self.get_pet(pk, 'id', 'owner_id')
+        if not self.access.can_delete(pet):
+            raise ApiError(403, 'You cannot delete this pet')
+        pet.delete()
+        return HttpResponse(status=204)
+
+
+class PedigreeListApiView(ApiView):
+    """Родословная питомца: GET — список, POST — новая запись."""
+
+    def get_version(self, pk):
+        return get_pet_version(pk)
+
+    def get(self, request, pk):
+        pet = self.get_pet(pk, 'id')
+        fields = parse_fields(request, PEDIGREE_FIELDS)
+        pedigrees = Pedigree.objects.filter(pet=pet).only(*fields.values()).order_by('id')
+        return json_response({'results': [serialize(pedigree, fields) for pedigree in pedigrees]})
+
+    def post(self, request, pk):
+        self.require_login()
+        pet = self.get_pet(pk, 'id', 'owner_id')
+        if not self.access.can_edit(pet):
+            raise ApiError(403, 'You cannot edit this pet')
+        form = PedigreeForm(parse_body(request))
+        if not form.is_valid():
+            raise self.form_errors(form)
+        form.instance.pet = pet
+        pedigree = form.save()
+        return json_response(serialize(pedigree, PEDIGREE_FIELDS), status=201)
+
+
+class ReviewListApiView(ApiView):
+    """Отзывы питомца: GET — страница по курсору, POST — новый отзыв."""
+
+    def get_version(self, pk):
+        return get_pet_version(pk)
+
+    def get(self, request, pk):
+        pet = self.get_pet(pk, 'id')
+        fields = parse_fields(request, REVIEW_FIELDS)
+        reviews, links = self.page(Review.objects.filter(pet=pet), fields)
+        return json_response({'results': [serialize(review, fields) for review in reviews], **links})
+
+    def post(self, request, pk):
+        self.require_login()
+        pet = self.get_pet(pk, 'id', 'owner_id')
+        if self.access.is_owner(pet):
+            raise ApiError(403, 'You cannot review your own pet')
+        data = parse_body(request)
+        data.pop('slug', None)  # slug генерируется при сохранении
+        form = ReviewForm(data)
+        if not form.is_valid():
+            raise self.form_errors(form)
+        form.instance.pet = pet
+        form.instance.author = request.user
+        # Отзыв и агрегаты оценок питомца сохраняются в одной транзакции
+        with transaction.atomic():
+            review = form.save()
+        return json_response(serialize(review, REVIEW_FIELDS), status=201)
+
+
+class ReviewDetailApiView(ApiView):
+    def get_version(self, slug):
+        # Правка отзыва сдвигает версию его питомца (blog.signals)
+        pet_id = Review.objects.filter(slug=slug).values_list('pet_id', flat=True).first()
+        return None if pet_id is None else get_pet_version(pet_id)
+
+    def get(self, request, slug):
+        fields = parse_fields(request, REVIEW_FIELDS)
+        review = Review.objects.only(*fields.values(), 'pet_id').filter(slug=slug).first()
+        if review is None:
+            raise ApiError(404, 'Review not found')
+        # Отзывы неактивных питомцев видны тем же, кто видит самих питомцев
+        self.get_pet(review.pet_id, 'id')
+        return json_response(serialize(review, fields))
@@ -0,0 +1,68 @@
+import asyncio
+
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+from config.conditional import AsyncConditionalGetMixin
+from users.permissions import get_permissions
+
+from . import views
+from .cache import aget_pet_detail, aget_pet_rows, aget_pet_validators
+from .counters import apending_views, arecord_view
+from .page_cache import aget_partition_counts
+
+# Асинхронные версии страниц чтения для работы под ASGI (ASYNC_VIEWS=True, см. config/asgi.py).
+# Контекст, шаблоны и проверки наследуются от синхронных представлений; асинхронно
+# выполняется только доступ к данным — ORM (aget, aaggregate, async for) и кэш (aget/aset).
+# Шаблон рендерит обработчик Django после возврата TemplateResponse.
+
+
+class PetListView(views.PetListView):
+    async def get(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        self.object_list = self.get_queryset()
+        queryset = self.object_list.only(*self.list_fields)
+        counts = await aget_partition_counts(queryset)
+        # Страницы разделов не зависят друг от друга и запрашиваются одновременно
+        self.pages = await asyncio.gather(*(
+            paginator.aget_page(*params) for paginator, params in self.get_paginators(queryset, counts)))
+        self.rows = await aget_pet_rows([pet for page in self.pages for pet in page],
+                                        get_permissions(request.user).can_toggle_active)
+        return self.render_to_response(self.get_context_data())
+
+    def get_pages(self, queryset):
+        return self.pages
+
+    def get_rows(self, pets):
+        return self.rows
+
+
+class PetDetailView(AsyncConditionalGetMixin, views.PetDetailView):
+    async def aget_validators(self):
+        return self.use_validators(await aget_pet_validators(self.kwargs['pk']))
+
+    async def anot_modified(self):
+        if self.counts_view(self.validators['owner_id']):
+            await arecord_view(self.kwargs['pk'])
+
+    async def render_page(self, request, *args, **kwargs):
+        self.payload = await aget_pet_detail(self.kwargs['pk'])
+        self.object = self.payload['pet']
+        if self.counts_view(self.object.owner_id):
+            await arecord_view(self.object.pk)
+        self.object.view_count += await apending_views(self.object.pk)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+class ReviewDetailView(AsyncConditionalGetMixin, views.ReviewDetailView):
+    async def aget_validators(self):
+        return self.use_validators(await self.validators_queryset().afirst())
+
+    async def render_page(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        try:
+            self.object = await queryset.aget(slug=self.kwargs['slug'])
+        except queryset.model.DoesNotExist:
+            raise Http404(_('No %(verbose_name)s found matching the query') % {
+                'verbose_name': queryset.model._meta.verbose_name})
+        return self.render_to_response(self.get_context_data(object=self.object))
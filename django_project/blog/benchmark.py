@@ -0,0 +1,685 @@
+import asyncio
+import io
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from itertools import accumulate
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.template import engines
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import User
+
+from .cache import get_pet_rows, invalidate_pet, render_rows, row_keys
+from .models import Pedigree, Pet, Review
+from .ratings import recompute_ratings
+from .search import update_documents
+from .views import PetDetailView, PetListView
+
+# Синтетические данные и нагрузочные сценарии для команд seed_benchmark и run_benchmark (--suite).
+# Генератор детерминирован (random.Random(seed)), поэтому при одинаковых параметрах
+# на двух ревизиях получается один и тот же набор данных и результаты можно сравнивать.
+EMAIL_DOMAIN = 'bench.example.com'
+PASSWORD = 'bench-password'
+
+SPECIES_WEIGHTS = {'dog': 40, 'cat': 35, 'bird': 10, 'fish': 8, 'other': 7}
+# Оценки смещены к высоким, как на реальных площадках с отзывами
+RATING_WEIGHTS = [5, 7, 13, 30, 45]
+PET_NAMES = [
+    'Рекс', 'Мурка', 'Барсик', 'Шарик', 'Бобик', 'Снежок', 'Пушок', 'Лаки', 'Граф', 'Ася',
+    'Дымка', 'Тузик', 'Кеша', 'Белка', 'Джек', 'Марс', 'Соня', 'Чарли', 'Рыжик', 'Буся',
+]
+BREEDS = ['', 'метис', 'лабрадор', 'овчарка', 'британская', 'сиамская', 'мейн-кун', 'волнистый', 'золотая']
+WORDS = (
+    'добрый игривый спокойный ласковый активный умный весёлый привитый здоровый пушистый '
+    'любит гулять играть спать мяч корм детей хозяина дом двор парк'
+).split()
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _zipf_cum_weights(size, exponent=1.1):
+    # Небольшая часть записей получает основную долю связей (популярные питомцы, активные владельцы).
+    # Накопленные веса считаются один раз: так rng.choices выбирает за O(log n)
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+def _spread_created_at(model, objects, rng, days, batch_size):
+    # auto_now_add перезаписывает created_at при вставке, поэтому даты проставляются отдельно
+    now = timezone.now()
+    for obj in objects:
+        obj.created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+    model.objects.bulk_update(objects, ['created_at'], batch_size=batch_size)
+
+
+def seed(users, pets, reviews, seed=0, days=730, batch_size=2000, log=None):
+    """Добавляет синтетических пользователей, питомцев, родословные и отзывы пакетами."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    password = make_password(PASSWORD)  # один хэш на всех: PBKDF2 на каждого занял бы минуты
+    started = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').count()
+
+    # Первые два пользователя — администратор и модератор: от их имени ходит run_benchmark
+    for start in range(0, users, batch_size):
+        batch = []
+        for i in range(started + start, started + min(start + batch_size, users)):
+            role = 'admin' if i == 0 else 'moderator' if i == 1 else rng.choices(
+                ['user', 'moderator', 'admin'], [95, 4, 1])[0]
+            batch.append(User(
+                email=f'user{i}@{EMAIL_DOMAIN}', password=password, role=role,
+                first_name=rng.choice(PET_NAMES), is_staff=role == 'admin', is_superuser=role == 'admin',
+                date_joined=timezone.now() - timedelta(days=rng.randint(0, days)),
+            ))
+        User.objects.bulk_create(batch)
+        log(f'Users: {start + len(batch)}/{users}')
+
+    owner_ids = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk').values_list(
+        'pk', flat=True))
+    owner_weights = _zipf_cum_weights(len(owner_ids), exponent=0.8)
+    species, species_weights = list(SPECIES_WEIGHTS), list(SPECIES_WEIGHTS.values())
+    today = timezone.localdate()
+    new_pet_ids = []
+    for start in range(0, pets, batch_size):
+        batch = []
+        for _ in range(min(batch_size, pets - start)):
+            age = int(rng.triangular(1, 16, 3))
+            birth_date = None
+            if rng.random() < 0.5:
+                birth_date = today - timedelta(days=age * 365 + rng.randint(0, 300))
+            batch.append(Pet(
+                name=rng.choice(PET_NAMES), species=rng.choices(species, species_weights)[0], age=age,
+                birth_date=birth_date, description=_text(rng, 5, 40),
+                owner_id=rng.choices(owner_ids, cum_weights=owner_weights)[0], is_active=rng.random() < 0.9,
+                view_count=int(rng.paretovariate(1.2)) - 1,
+            ))
+        Pet.objects.bulk_create(batch)
+        _spread_created_at(Pet, batch, rng, days, batch_size)
+        new_pet_ids.extend(pet.pk for pet in batch)
+
+        pedigrees = []
+        for pet in batch:
+            # Около 60% питомцев с обоими родителями, 20% — с одним
+            roll = rng.random()
+            parent_types = ['mother', 'father'] if roll < 0.6 else [rng.choice(['mother', 'father'])] \
+                if roll < 0.8 else []
+            for parent_type in parent_types:
+                pedigrees.append(Pedigree(
+                    pet=pet, parent_type=parent_type, parent_name=rng.choice(PET_NAMES),
+                    breed=rng.choice(BREEDS), description=_text(rng, 0, 10),
+                ))
+        Pedigree.objects.bulk_create(pedigrees)
+        log(f'Pets: {start + len(batch)}/{pets}')
+
+    all_pet_ids = list(Pet.objects.filter(owner__email__endswith=f'@{EMAIL_DOMAIN}').order_by('pk').values_list(
+        'pk', flat=True))
+    pet_weights = _zipf_cum_weights(len(all_pet_ids))
+    review_offset = Review.objects.filter(slug__startswith='bench-').count()
+    reviewed = set()
+    for start in range(0, reviews if all_pet_ids else 0, batch_size):
+        batch = []
+        for i in range(review_offset + start, review_offset + min(start + batch_size, reviews)):
+            pet_id = rng.choices(all_pet_ids, cum_weights=pet_weights)[0]
+            reviewed.add(pet_id)
+            batch.append(Review(
+                slug=f'bench-{i}', pet_id=pet_id, author_id=rng.choice(owner_ids),
+                text=_text(rng, 3, 60), rating=rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+            ))
+        Review.objects.bulk_create(batch)
+        _spread_created_at(Review, batch, rng, days, batch_size)
+        log(f'Reviews: {start + len(batch)}/{reviews}')
+
+    # bulk_create не отправляет сигналы: агрегаты оценок, поиск и кэш обновляются здесь
+    affected = sorted(set(new_pet_ids) | reviewed)
+    for start in range(0, len(affected), batch_size):
+        chunk = affected[start:start + batch_size]
+        recompute_ratings(chunk)
+        update_documents(chunk)
+        invalidate_pet(*chunk)
+    log(f'Refreshed ratings and search documents for {len(affected)} pets')
+    return dataset_size()
+
+
+def dataset_size():
+    return {
+        'users': User.objects.count(),
+        'pets': Pet.objects.count(),
+        'pedigrees': Pedigree.objects.count(),
+        'reviews': Review.objects.count(),
+    }
+
+
+Scenario = namedtuple('Scenario', 'name method url data user')
+
+
+def build_scenarios():
+    """Сценарии для каждого адреса blog.urls и users.urls на данных, созданных seed()."""
+    admin = User.objects.filter(email=f'user0@{EMAIL_DOMAIN}').first()
+    member = User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}', role='user').order_by('pk').first()
+    pet = Pet.objects.filter(is_active=True).order_by('-review_count', 'pk').only('pk').first()
+    if admin is None or member is None or pet is None:
+        return []
+    review = Review.objects.filter(pet=pet).order_by('pk').values_list('slug', flat=True).first()
+
+    # Адреса строятся без префикса ru-ru: i18n_patterns принимает только поддерживаемые языки
+    with translation.override(translation.get_supported_language_variant(settings.LANGUAGE_CODE)):
+        def url(name, query='', **kwargs):
+            return reverse(name, kwargs=kwargs) + (f'?{query}' if query else '')
+
+        scenarios = [
+            Scenario('pet_list:anonymous', 'get', url('blog:pet_list'), None, None),
+            Scenario('pet_list:admin', 'get', url('blog:pet_list'), None, admin),
+            Scenario('pet_list:filtered', 'get', url('blog:pet_list', 'species=dog&age_min=2&age_max=8'), None, None),
+            Scenario('pet_list:by_rating', 'get', url('blog:pet_list', 'sort=rating&rating_min=4'), None, None),
+            Scenario('pet_list:last_page', 'get', url('blog:pet_list', 'page_active=1000000'), None, None),
+            Scenario('pet_search', 'get', url('blog:pet_search', 'q=игривый'), None, None),
+            Scenario('pet_detail:anonymous', 'get', url('blog:pet_detail', pk=pet.pk), None, None),
+            Scenario('pet_detail:admin', 'get', url('blog:pet_detail', pk=pet.pk), None, admin),
+            Scenario('pet_create', 'get', url('blog:pet_create'), None, admin),
+            Scenario('pet_update', 'get', url('blog:pet_update', pk=pet.pk), None, admin),
+            Scenario('pet_delete', 'get', url('blog:pet_delete', pk=pet.pk), None, admin),
+            Scenario('pet_toggle_active', 'get', url('blog:pet_toggle_active', pk=pet.pk), None, admin),
+            Scenario('review_create', 'get', url('blog:review_create', pet_pk=pet.pk), None, member),
+            Scenario('review_detail', 'get', url('blog:review_detail', slug=review), None, None),
+            Scenario('register', 'get', url('users:register'), None, None),
+            Scenario('login', 'get', url('users:login'), None, None),
+            Scenario('login:submit', 'post', url('users:login'),
+                     {'email': member.email, 'password': PASSWORD}, None),
+            Scenario('profile', 'get', url('users:profile'), None, member),
+            Scenario('update_profile', 'get', url('users:update_profile'), None, member),
+            Scenario('change_password', 'get', url('users:change_password'), None, member),
+            Scenario('password_reset', 'get', url('users:password_reset'), None, None),
+            Scenario('password_reset_confirm', 'get', url(
+                'users:password_reset_confirm', uidb64=urlsafe_base64_encode(force_bytes(member.pk)),
+                token=default_token_generator.make_token(member)), None, None),
+            Scenario('logout', 'get', url('users:logout'), None, member),
+            Scenario('user_list', 'get', url('users:user_list'), None, admin),
+            Scenario('user_list:last_page', 'get', url('users:user_list', 'page=last'), None, admin),
+            Scenario('user_detail', 'get', url('users:user_detail', pk=member.pk), None, admin),
+        ]
+    return scenarios
+
+
+def _request(client, scenario):
+    # Вход выполняется до замера, чтобы каждая итерация начиналась в одинаковом состоянии
+    if scenario.user is None:
+        client.logout()
+    elif client.session.get('_auth_user_id') != str(scenario.user.pk):
+        client.force_login(scenario.user)
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, scenario.method)(scenario.url, scenario.data)
+    return (time.perf_counter() - started) * 1000, len(queries), response.status_code
+
+
+def _percentiles(samples):
+    if len(samples) < 2:
+        return samples * 3
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+
+def _timed(run, iterations, prepare=None):
+    """Время iterations вызовов run() в миллисекундах; prepare() выполняется перед каждым вызовом вне замера."""
+    timings = []
+    for _ in range(iterations):
+        if prepare:
+            prepare()
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _latency(samples):
+    p50, p95, p99 = _percentiles(samples)
+    return {
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+    }
+
+
+# Колонки строки лога: ключ результата и формат; выводятся только ключи, которые есть в результате
+REPORT_COLUMNS = [
+    ('throughput_rps', '{:>8.1f} req/s'),
+    ('mean_ms', 'mean {:>9.3f} ms'),
+    ('p50_ms', 'p50 {:>9.3f} ms'),
+    ('p95_ms', 'p95 {:>9.3f} ms'),
+    ('p99_ms', 'p99 {:>9.3f} ms'),
+    ('queries', '{:>3} queries'),
+    ('peak_memory_kb', '{:>8.1f} KB'),
+    ('html_kb', '{:>9.1f} KB HTML'),
+    ('connections_opened', '{:>5} connections'),
+    ('session_queries', '{:>5.2f} session/user queries per request'),
+]
+
+
+def format_result(name, result):
+    return '  '.join([f'{name:<40}'] + [fmt.format(result[key]) for key, fmt in REPORT_COLUMNS if key in result])
+
+
+def make_report(results, log=None, **fields):
+    """Отчёт любого набора замеров: ревизия, база и результаты; каждый результат пишется в log."""
+    log = log or (lambda message: None)
+    for name, result in results.items():
+        log(format_result(name, result))
+    return {
+        'revision': git_revision(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        **fields,
+        'scenarios': results,
+    }
+
+
+def run_scenario(scenario, iterations=50, warmup=5):
+    client = Client()
+    for _ in range(warmup):
+        _request(client, scenario)
+
+    latencies, query_counts, statuses = [], [], set()
+    for _ in range(iterations):
+        elapsed, queries, status = _request(client, scenario)
+        latencies.append(elapsed)
+        query_counts.append(queries)
+        statuses.add(status)
+
+    # Пиковая память меряется отдельным запросом: tracemalloc заметно замедляет выполнение
+    tracemalloc.start()
+    try:
+        _request(client, scenario)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'method': scenario.method.upper(),
+        'url': scenario.url,
+        'status': sorted(statuses),
+        **_latency(latencies),
+        'queries': max(query_counts),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scenarios, iterations=50, warmup=5, log=None):
+    results = {scenario.name: run_scenario(scenario, iterations, warmup) for scenario in scenarios}
+    return make_report(results, log, dataset=dataset_size(), iterations=iterations, warmup=warmup)
+
+
+# Сценарии страниц чтения, у которых есть асинхронные версии (blog.async_views)
+READ_SCENARIOS = ('pet_list', 'pet_detail', 'review_detail')
+
+
+async def _client_for(user):
+    client = AsyncClient()
+    if user is not None:
+        await client.aforce_login(user)
+    return client
+
+
+async def _concurrent(scenario, requests, concurrency):
+    # Каждый «пользователь» — отдельный клиент со своей сессией, все в одном event loop,
+    # как у uvicorn с одним воркером
+    clients = await asyncio.gather(*(_client_for(scenario.user) for _ in range(concurrency)))
+    latencies, statuses = [], set()
+
+    async def worker(client, count):
+        for _ in range(count):
+            started = time.perf_counter()
+            response = await getattr(client, scenario.method)(scenario.url, scenario.data)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.add(response.status_code)
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client, count) for client, count in zip(clients, shares)))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def run_throughput(scenario, requests=200, concurrency=20, warmup=20):
+    """
+    Прогоняет сценарий через ASGI-обработчик Django (AsyncClient) с concurrency одновременными
+    запросами. Представления синхронные или асинхронные — в зависимости от ASYNC_VIEWS.
+    """
+    asyncio.run(_concurrent(scenario, warmup, min(concurrency, warmup)))
+    elapsed, latencies, statuses = asyncio.run(_concurrent(scenario, requests, concurrency))
+    return {
+        'method': scenario.method.upper(),
+        'url': scenario.url,
+        'status': sorted(statuses),
+        'requests': requests,
+        'concurrency': concurrency,
+        'throughput_rps': round(requests / elapsed, 2),
+        **_latency(latencies),
+    }
+
+
+def run_throughput_suite(scenarios, requests=200, concurrency=20, log=None):
+    results = {scenario.name: run_throughput(scenario, requests, concurrency) for scenario in scenarios}
+    return make_report(results, log, dataset=dataset_size(), views='async' if settings.ASYNC_VIEWS else 'sync',
+                       requests=requests, concurrency=concurrency)
+
+
+# Варианты управления соединениями для run_benchmark --suite connections: (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+CONNECTION_MODES = {
+    'close_each_request': (0, False),
+    'persistent': (60, False),
+    'persistent_health_checks': (60, True),
+}
+
+
+def _wsgi_environ(url, cookie):
+    path, _, query = url.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_COOKIE': cookie,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+
+
+def _wsgi_get(handler, environ, statuses):
+    response = handler(environ, lambda status, headers: None)
+    b''.join(response)
+    response.close()
+    statuses.add(response.status_code)
+
+
+def _session_cookie(user):
+    if user is None:
+        return ''
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def run_connection_benchmark(scenario, requests=200, modes=CONNECTION_MODES):
+    """
+    Запросы идут прямо в WSGIHandler, как от настоящего сервера: после каждого ответа
+    request_finished закрывает соединение, если истёк CONN_MAX_AGE (тестовый Client этого не делает).
+    Для каждого режима возвращает задержки и число открытых соединений.
+    """
+    handler = WSGIHandler()
+    cookie = _session_cookie(scenario.user)
+    opened = []
+
+    def count(sender, **kwargs):
+        opened.append(1)
+
+    settings_dict = connection.settings_dict
+    original = settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS']
+    connection_created.connect(count)
+    results = {}
+    try:
+        for name, (max_age, health_checks) in modes.items():
+            # Параметры читаются при открытии соединения, поэтому текущее закрываем
+            connection.close()
+            settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = max_age, health_checks
+            opened.clear()
+            statuses = set()
+            latencies = _timed(lambda: _wsgi_get(handler, _wsgi_environ(scenario.url, cookie), statuses), requests)
+            results[name] = {
+                'conn_max_age': max_age,
+                'health_checks': health_checks,
+                'status': sorted(statuses),
+                'connections_opened': len(opened),
+                **_latency(latencies),
+            }
+    finally:
+        connection_created.disconnect(count)
+        connection.close()
+        settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = original
+    return results
+
+
+def run_connection_suite(scenarios, requests=200, log=None):
+    results = {f'{scenario.name} {mode}': result for scenario in scenarios
+               for mode, result in run_connection_benchmark(scenario, requests).items()}
+    return make_report(results, log, requests=requests)
+
+
+# Настройки сессий для run_benchmark --suite sessions: прежние (сессия и пользователь из базы,
+# сообщения с откатом в сессию) и текущие из config/settings.py
+SESSION_CONFIGS = {
+    'db_sessions': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    },
+    'cached_sessions': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+        'AUTHENTICATION_BACKENDS': ['users.auth.CachedUserBackend', 'django.contrib.auth.backends.ModelBackend'],
+    },
+}
+# Таблицы, обращения к которым делают сессионный слой (SessionMiddleware, AuthenticationMiddleware)
+SESSION_TABLES = ('django_session', 'users_user')
+
+
+def run_session_benchmark(scenario, requests=200, configs=SESSION_CONFIGS):
+    """
+    Для каждой конфигурации сессий отправляет запросы сценария в WSGIHandler и считает задержку
+    и запросы к django_session и users_user. Выход завершает сессию, поэтому для сценария logout
+    каждый запрос получает свою заранее созданную сессию.
+    """
+    session_queries = []
+
+    def count(execute, sql, params, many, context):
+        if any(table in sql for table in SESSION_TABLES):
+            session_queries.append(sql)
+        return execute(sql, params, many, context)
+
+    results = {}
+    for name, overrides in configs.items():
+        with override_settings(**overrides):
+            # SessionMiddleware выбирает движок при создании, поэтому обработчик свой для каждой конфигурации
+            handler = WSGIHandler()
+            single_use = scenario.name == 'logout'
+            cookies = [_session_cookie(scenario.user) for _ in range(requests if single_use else 1)]
+            environs = iter([_wsgi_environ(scenario.url, cookies[number if single_use else 0])
+                             for number in range(requests)])
+            statuses = set()
+            session_queries.clear()
+            with connection.execute_wrapper(count):
+                latencies = _timed(lambda: _wsgi_get(handler, next(environs), statuses), requests)
+        results[name] = {
+            'status': sorted(statuses),
+            'session_queries': round(len(session_queries) / requests, 2),
+            **_latency(latencies),
+        }
+    return results
+
+
+def run_session_suite(scenarios, requests=200, log=None):
+    results = {f'{scenario.name} {config}': result for scenario in scenarios
+               for config, result in run_session_benchmark(scenario, requests).items()}
+    return make_report(results, log, requests=requests)
+
+
+# Прежняя разметка пагинации списка питомцев: каждая ссылка заново обходит request.GET
+LEGACY_PAGINATION = (
+    '{% for num in page.paginator.page_range %}'
+    '<li class="page-item {% if page.number == num %}active{% endif %}"><a class="page-link" '
+    'href="?page_active={{ num }}{% for key, value in request.GET.items %}'
+    '{% if key != \'page_active\' and key != \'cursor_active\' %}&{{ key }}={{ value }}{% endif %}'
+    '{% endfor %}">{{ num }}</a></li>{% endfor %}'
+)
+WINDOWED_PAGINATION = "{% load pagination_tags %}{% paginate page 'page_active' 'cursor_active' %}"
+# Фильтры, которые сохраняются в ссылках пагинации
+PAGINATION_QUERY = {'name': 'Рекс', 'species': 'dog', 'age_min': '2', 'age_max': '8', 'sort': 'rating',
+                    'page_inactive': '3'}
+
+
+def run_pagination_benchmark(page_counts=(10, 10000), iterations=20, log=None):
+    """
+    Время рендеринга и размер разметки пагинации одного раздела (прежней и blog.templatetags.pagination_tags)
+    для списков из page_counts страниц. Текущая страница — в середине списка.
+    """
+    engine = engines['django']
+    templates = {'legacy': engine.from_string(LEGACY_PAGINATION), 'windowed': engine.from_string(WINDOWED_PAGINATION)}
+    results = {}
+    for pages in page_counts:
+        paginator = Paginator(range(pages * 10), 10)
+        page = paginator.page(max(1, pages // 2))
+        request = RequestFactory().get('/', {**PAGINATION_QUERY, 'page_active': page.number})
+        for name, template in templates.items():
+            timings = _timed(lambda: template.render({'page': page}, request), iterations)
+            html = template.render({'page': page}, request)
+            results[f'{name}:{pages}'] = {'pages': pages, **_latency(timings),
+                                          'html_kb': round(len(html.encode()) / 1024, 1)}
+    return make_report(results, log, iterations=iterations)
+
+
+def run_fragment_benchmark(page_sizes=(5, 50), iterations=50, log=None):
+    """
+    Время получения разметки строк страницы списка: полный рендеринг каждой строки,
+    первый запрос с пустым кэшем (get_many, рендеринг, set_many) и страница целиком из кэша строк.
+    """
+    results = {}
+    for size in page_sizes:
+        pets = list(Pet.objects.only(*PetListView.list_fields).order_by('-created_at', '-id')[:size])
+        if not pets:
+            break
+        keys = list(row_keys(pets, False).values())
+        # (подготовка вне замера, замеряемый вызов)
+        modes = {
+            'full': (None, lambda: render_rows(pets, False)),
+            'cold_cache': (lambda: cache.delete_many(keys), lambda: get_pet_rows(pets, False)),
+            'fragment_cached': (None, lambda: get_pet_rows(pets, False)),
+        }
+        for name, (prepare, run) in modes.items():
+            run()
+            results[f'{name}:{size}'] = {'rows': len(pets), **_latency(_timed(run, iterations, prepare))}
+    return make_report(results, log, iterations=iterations)
+
+
+def run_detail_benchmark(pet_id, iterations=50, log=None):
+    """
+    Рендеринг PetDetailView с пустым и заполненным кэшем данных страницы (blog.cache). Запрашивает
+    вошедший владелец питомца: запрос без cookie сессии получил бы ответ из кэша страниц
+    (blog.page_cache), а просмотр постороннего пользователя писал бы в счётчик просмотров.
+    """
+    pet = Pet.objects.select_related('owner').get(pk=pet_id)
+    view = PetDetailView.as_view()
+    factory = RequestFactory(HTTP_COOKIE=_session_cookie(pet.owner))
+    query_counts = []
+
+    def render():
+        request = factory.get(reverse('blog:pet_detail', kwargs={'pk': pet_id}))
+        # Middleware не выполняется: пользователь сессии подставляется напрямую
+        request.user = pet.owner
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, pk=pet_id)
+            response.render()
+        query_counts.append(len(queries))
+
+    render()
+    results = {}
+    for mode, prepare in (('cold_cache', lambda: invalidate_pet(pet_id)), ('warm_cache', None)):
+        query_counts.clear()
+        timings = _timed(render, iterations, prepare)
+        results[mode] = {**_latency(timings), 'queries': max(query_counts)}
+    return make_report(results, log, pet=pet_id, iterations=iterations)
+
+
+# Метрики, которые compare сравнивает в отчётах любого набора: ключ, подпись, единица и формат.
+# Регрессия — рост p95 или падение пропускной способности больше threshold, либо любой рост счётчиков
+COMPARED_METRICS = (
+    ('throughput_rps', 'throughput', ' req/s', '.1f'),
+    ('p95_ms', 'p95', ' ms', '.2f'),
+    ('queries', 'queries', '', 'd'),
+    ('connections_opened', 'connections', '', 'd'),
+    ('session_queries', 'session queries', '', 'd'),
+    ('peak_memory_kb', 'memory', ' KB', '.1f'),
+    ('html_kb', 'html', ' KB', '.1f'),
+)
+COUNTED_METRICS = ('queries', 'connections_opened', 'session_queries')
+
+
+def _relative_change(before, after):
+    return (after - before) / before if before else 0
+
+
+def _regression(key, before, after, threshold):
+    if key == 'p95_ms':
+        return _relative_change(before, after) > threshold
+    if key == 'throughput_rps':
+        return _relative_change(before, after) < -threshold
+    return key in COUNTED_METRICS and after > before
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Сравнивает два отчёта одного набора run_benchmark. Возвращает строки отчёта и список регрессий.
+    Сравниваются только метрики, которые есть в обоих отчётах, поэтому подходит любой набор.
+    """
+    lines, regressions = [], []
+    if baseline.get('dataset') != current.get('dataset'):
+        lines.append(f'Warning: datasets differ ({baseline.get("dataset")} vs {current.get("dataset")})')
+    if baseline.get('views') or current.get('views'):
+        lines.append(f'{baseline.get("views")} views @ {baseline.get("revision")} -> '
+                     f'{current.get("views")} views @ {current.get("revision")}')
+    else:
+        lines.append(f'{baseline.get("revision")} -> {current.get("revision")}')
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            lines.append(f'{name:<24} new scenario')
+            continue
+        parts, marks = [], []
+        for key, label, unit, spec in COMPARED_METRICS:
+            if key not in before or key not in result:
+                continue
+            part = f'{label} {before[key]:{spec}} -> {result[key]:{spec}}{unit}'
+            if key in ('p95_ms', 'throughput_rps'):
+                part += f' ({_relative_change(before[key], result[key]):+.0%})'
+            parts.append(part)
+            if _regression(key, before[key], result[key], threshold):
+                marks.append(f'{label} regression')
+        if marks:
+            regressions.append(name)
+        lines.append(f'{name:<24} {"  ".join(parts)}' + (f'  [{", ".join(marks)}]' if marks else ''))
+    return lines, regressions
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
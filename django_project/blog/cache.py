@@ -0,0 +1,211 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import Http404
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .models import Pedigree, Pet, Review
+
+# Данные страницы питомца (питомец с владельцем, родословная, отзывы с авторами)
+# кэшируются целиком. Ключ содержит версию питомца: при любом изменении версия
+# увеличивается, и данные, собранные до изменения, больше никогда не читаются.
+PAYLOAD_SCHEMA = 1
+PAYLOAD_KEY = 'blog:pet-detail:{}:s{}:v{}'
+VERSION_KEY = 'blog:pet-detail-version:{}'
+# Валидаторы условного GET (ETag/Last-Modified) хранятся под той же версией
+VALIDATORS_KEY = 'blog:pet-validators:{}:v{}'
+# Функции с префиксом a — асинхронные двойники для представлений blog.async_views:
+# те же ключи и те же запросы через aget/aset и асинхронный ORM.
+
+
+def get_pet_version(pet_id):
+    key = VERSION_KEY.format(pet_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_pet_version(pet_id):
+    key = VERSION_KEY.format(pet_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def invalidate_pet(*pet_ids):
+    # Новая версия для всех питомцев одним set_many: пакетные операции (модерация, импорт)
+    # обходятся одним обращением к кэшу вместо incr на каждого питомца
+    if pet_ids:
+        version = time.time_ns()
+        cache.set_many({VERSION_KEY.format(pet_id): version for pet_id in pet_ids}, timeout=None)
+
+
+def _pet_queryset():
+    return Pet.objects.select_related('owner', 'moderated_by')
+
+
+def _reviews(pet):
+    return pet.reviews.select_related('author').order_by('created_at', 'id')
+
+
+def build_pet_detail(pet_id):
+    try:
+        pet = _pet_queryset().get(pk=pet_id)
+    except Pet.DoesNotExist:
+        raise Http404('Питомец не найден')
+    return {
+        'pet': pet,
+        'pedigrees': list(pet.pedigrees.all()),
+        'reviews': list(_reviews(pet)),
+    }
+
+
+async def abuild_pet_detail(pet_id):
+    try:
+        pet = await _pet_queryset().aget(pk=pet_id)
+    except Pet.DoesNotExist:
+        raise Http404('Питомец не найден')
+    return {
+        'pet': pet,
+        'pedigrees': [pedigree async for pedigree in pet.pedigrees.all()],
+        'reviews': [review async for review in _reviews(pet)],
+    }
+
+
+def get_pet_detail(pet_id):
+    """Возвращает словарь с ключами pet, pedigrees и reviews — из кэша или из базы."""
+    key = PAYLOAD_KEY.format(pet_id, PAYLOAD_SCHEMA, get_pet_version(pet_id))
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_pet_detail(pet_id)
+        cache.set(key, payload, timeout=settings.PET_DETAIL_CACHE_TIMEOUT)
+    return payload
+
+
+async def aget_pet_detail(pet_id):
+    key = PAYLOAD_KEY.format(pet_id, PAYLOAD_SCHEMA, await aget_pet_version(pet_id))
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await abuild_pet_detail(pet_id)
+        await cache.aset(key, payload, timeout=settings.PET_DETAIL_CACHE_TIMEOUT)
+    return payload
+
+
+def _per_pet(model, aggregate):
+    # Коррелированный подзапрос: агрегат по связанным записям без JOIN в основном запросе
+    return Subquery(model.objects.filter(pet=OuterRef('pk')).order_by().values('pet').annotate(
+        value=aggregate).values('value'))
+
+
+def _validators_queryset(pet_id):
+    return Pet.objects.filter(pk=pet_id).annotate(
+        last_review=_per_pet(Review, Max('created_at')),
+        last_pedigree=_per_pet(Pedigree, Max('updated_at')),
+        pedigree_count=_per_pet(Pedigree, Count('id')),
+    ).values('owner_id', 'updated_at', 'review_count', 'last_review', 'last_pedigree', 'pedigree_count')
+
+
+def _validators(pet_id, row):
+    if row is None:
+        return None
+    last_modified = max(value for value in (row['updated_at'], row['last_review'], row['last_pedigree']) if value)
+    version = '|'.join(str(row[name]) for name in (
+        'updated_at', 'review_count', 'last_review', 'pedigree_count', 'last_pedigree'))
+    return {'owner_id': row['owner_id'], 'version': f'{pet_id}|{version}', 'last_modified': last_modified}
+
+
+def build_pet_validators(pet_id):
+    """
+    Версия страницы питомца одним запросом: updated_at питомца, самый новый отзыв,
+    последнее изменение родословной и количества (удаление не сдвигает максимумы).
+    view_count не учитывается: счётчик меняется при каждом просмотре.
+    """
+    return _validators(pet_id, _validators_queryset(pet_id).first())
+
+
+async def abuild_pet_validators(pet_id):
+    return _validators(pet_id, await _validators_queryset(pet_id).afirst())
+
+
+def get_pet_validators(pet_id):
+    """Словарь с owner_id, version и last_modified или None, если питомца нет."""
+    key = VALIDATORS_KEY.format(pet_id, get_pet_version(pet_id))
+    validators = cache.get(key)
+    if validators is None:
+        validators = build_pet_validators(pet_id)
+        if validators is not None:
+            cache.set(key, validators, timeout=settings.PET_DETAIL_CACHE_TIMEOUT)
+    return validators
+
+
+async def aget_pet_validators(pet_id):
+    key = VALIDATORS_KEY.format(pet_id, await aget_pet_version(pet_id))
+    validators = await cache.aget(key)
+    if validators is None:
+        validators = await abuild_pet_validators(pet_id)
+        if validators is not None:
+            await cache.aset(key, validators, timeout=settings.PET_DETAIL_CACHE_TIMEOUT)
+    return validators
+
+
+# Строки списка питомцев (blog/pet_row.html) кэшируются по отдельности. Ключ содержит всё, от чего
+# зависит разметка: updated_at (правка и модерация), оценки (ratings обновляет их через update(),
+# не трогая updated_at), язык (ссылки и названия видов) и вариант строки (с флажком модерации или без).
+# Устаревшие строки не удаляются, а перестают читаться и истекают через PET_ROW_CACHE_TIMEOUT.
+ROW_KEY = 'blog:pet-row:{}:{}:{}:{}:{}:{}'
+
+
+def _row_key(pet, moderate, language):
+    return ROW_KEY.format(pet.pk, pet.updated_at.timestamp(), pet.review_count, pet.rating_avg, language,
+                          'moderate' if moderate else 'plain')
+
+
+def render_rows(pets, moderate):
+    """Разметка строк без кэша: {pk: html}."""
+    template = get_template('blog/pet_row.html')
+    return {pet.pk: mark_safe(template.render({'pet': pet, 'moderate': moderate})) for pet in pets}
+
+
+def row_keys(pets, moderate):
+    """Ключи кэша строк для текущего языка: {pk: ключ}."""
+    language = get_language()
+    return {pet.pk: _row_key(pet, moderate, language) for pet in pets}
+
+
+def _collect_rows(pets, moderate, keys, cached):
+    """Возвращает ({pk: html}, недостающие строки для set_many)."""
+    rows = {pk: mark_safe(cached[key]) for pk, key in keys.items() if key in cached}
+    missing = render_rows([pet for pet in pets if pet.pk not in rows], moderate)
+    rows.update(missing)
+    return rows, {keys[pk]: str(html) for pk, html in missing.items()}
+
+
+def get_pet_rows(pets, moderate):
+    """
+    Строки страницы списка: все за одно обращение get_many, недостающие рендерятся
+    и сохраняются одним set_many. Возвращает {pk: html}.
+    """
+    keys = row_keys(pets, moderate)
+    rows, missing = _collect_rows(pets, moderate, keys, cache.get_many(keys.values()))
+    if missing:
+        cache.set_many(missing, timeout=settings.PET_ROW_CACHE_TIMEOUT)
+    return rows
+
+
+async def aget_pet_rows(pets, moderate):
+    # aget_many/aset_many встроенных бэкендов обращаются к кэшу по ключу за раз,
+    # поэтому пакетные вызовы выполняются синхронными методами в потоке
+    keys = row_keys(pets, moderate)
+    rows, missing = _collect_rows(pets, moderate, keys, await sync_to_async(cache.get_many)(list(keys.values())))
+    if missing:
+        await sync_to_async(cache.set_many)(missing, timeout=settings.PET_ROW_CACHE_TIMEOUT)
+    return rows
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+
+from config.tiered_cache import TieredCache
+from users.mail import enqueue_mail
+
+from .cache import invalidate_pet
+from .models import Pet
+
+# Просмотры копятся в кэше (при CACHE_ENABLED это общий Redis, иначе память процесса)
+# и периодически переносятся в blog_pet пакетными UPDATE ... SET view_count = view_count + n.
+# Процесс сам сбрасывает просмотры, которые накопил (flush_view_counts при очередном просмотре);
+# то, что осталось от затихшего, перезапущенного или остановленного процесса, переносит
+# команда flush_view_counts, которая ищет ненулевые счётчики в кэше по всем питомцам.
+# Команде нужен общий кэш: память чужого процесса ей не видна (см. buffer_is_shared).
+PENDING_KEY = 'blog:views:pending:{}'
+FLUSH_LOCK_KEY = 'blog:views:flush-lock'
+FLUSH_LOCK_TIMEOUT = 30
+# Питомцев на одно чтение счётчиков (get_many) при обходе всей таблицы
+SCAN_CHUNK_SIZE = 1000
+MILESTONE = 100
+
+_dirty = set()
+_dirty_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def buffer_is_shared():
+    """True, если буфер просмотров лежит в кэше, общем для всех процессов."""
+    backend = caches['default']
+    if isinstance(backend, TieredCache):
+        backend = backend.l2
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+def _mark_dirty(pet_id):
+    """Запоминает питомца для следующего сброса; True, если сброс пора выполнить."""
+    with _dirty_lock:
+        _dirty.add(pet_id)
+    return time.monotonic() - _last_flush >= settings.VIEW_COUNT_FLUSH_INTERVAL
+
+
+def record_view(pet_id):
+    key = PENDING_KEY.format(pet_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+    if _mark_dirty(pet_id):
+        flush_view_counts()
+
+
+async def arecord_view(pet_id):
+    key = PENDING_KEY.format(pet_id)
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+    if _mark_dirty(pet_id):
+        # Сброс работает с транзакциями и блокировками строк, поэтому выполняется в потоке
+        await sync_to_async(flush_view_counts)()
+
+
+def pending_views(pet_id):
+    return cache.get(PENDING_KEY.format(pet_id), 0)
+
+
+async def apending_views(pet_id):
+    return await cache.aget(PENDING_KEY.format(pet_id), 0)
+
+
+def flush_view_counts():
+    """Переносит в базу просмотры, накопленные этим процессом. Возвращает количество обновлённых питомцев."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    with _dirty_lock:
+        pet_ids = list(_dirty)
+        _dirty.clear()
+    if not pet_ids:
+        return 0
+    try:
+        flushed = _flush(pet_ids)
+    except Exception:
+        with _dirty_lock:
+            _dirty.update(pet_ids)
+        raise
+    if flushed is None:
+        # Сброс уже идёт в другом процессе — попробуем в следующий раз
+        with _dirty_lock:
+            _dirty.update(pet_ids)
+        return 0
+    return flushed
+
+
+def flush_pending_views(chunk_size=SCAN_CHUNK_SIZE, lock_wait=FLUSH_LOCK_TIMEOUT):
+    """
+    Переносит в базу все просмотры из кэша, кем бы они ни были накоплены (команда flush_view_counts).
+    Возвращает количество обновлённых питомцев; None, если блокировку сброса не удалось
+    получить за lock_wait секунд.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        pet_ids = list(
+            Pet.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pet_ids:
+            return total
+        last_id = pet_ids[-1]
+        pending = cache.get_many([PENDING_KEY.format(pk) for pk in pet_ids])
+        pet_ids = [pk for pk in pet_ids if pending.get(PENDING_KEY.format(pk), 0) > 0]
+        if not pet_ids:
+            continue
+        deadline = time.monotonic() + lock_wait
+        flushed = _flush(pet_ids)
+        while flushed is None:
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.5)
+            flushed = _flush(pet_ids)
+        total += flushed
+
+
+def _flush(pet_ids):
+    """Сброс просмотров питомцев pet_ids под общей блокировкой; None, если её держит другой процесс."""
+    if not cache.add(FLUSH_LOCK_KEY, 1, timeout=FLUSH_LOCK_TIMEOUT):
+        return None
+    try:
+        pending = cache.get_many([PENDING_KEY.format(pk) for pk in pet_ids])
+        deltas = {pk: pending.get(PENDING_KEY.format(pk), 0) for pk in pet_ids}
+        deltas = {pk: n for pk, n in deltas.items() if n > 0}
+        if not deltas:
+            return 0
+
+        with transaction.atomic():
+            # Блокировка строк сериализует сбросы, поэтому каждый порог в 100 просмотров
+            # пересекается ровно одним сбросом
+            rows = Pet.objects.select_for_update(of=('self',)).filter(pk__in=deltas).values_list(
+                'pk', 'view_count', 'name', 'owner__email')
+            current = {pk: (view_count, name, email) for pk, view_count, name, email in rows}
+            by_delta = defaultdict(list)
+            for pk in current:
+                by_delta[deltas[pk]].append(pk)
+            for n, ids in by_delta.items():
+                Pet.objects.filter(pk__in=ids).update(view_count=F('view_count') + n)
+            # Письмо ставится в очередь в той же транзакции, что и новое значение счётчика:
+            # откат не оставит письма без просмотров, повторный сброс не отправит его дважды
+            for pk, (view_count, name, email) in current.items():
+                new_count = view_count + deltas[pk]
+                for threshold in range(view_count // MILESTONE + 1, new_count // MILESTONE + 1):
+                    _notify_milestone(name, email, threshold * MILESTONE)
+
+        # Закэшированная страница питомца хранит старое значение view_count
+        invalidate_pet(*current)
+        for pk, n in deltas.items():
+            try:
+                cache.decr(PENDING_KEY.format(pk), n)
+            except ValueError:
+                pass
+        return len(current)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _notify_milestone(pet_name, owner_email, view_count):
+    if not owner_email:
+        return
+    enqueue_mail(
+        'Достигнуто 100 просмотров!',
+        f'Ваш питомец {pet_name} набрал {view_count} просмотров.',
+        settings.EMAIL_HOST_USER,
+        [owner_email],
+    )
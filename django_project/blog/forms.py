@@ -1,4 +1,5 @@
 from django import forms
+from users.models import User
 from .models import Pet, Review
 from datetime import date
 import re
@@ -10,6 +11,13 @@ class PetForm(forms.ModelForm):
         widget=forms.Select(attrs={'class': 'form-control'}),
         required=True
     )
+    # Владелец вводится по email: выпадающий список выводил бы всех пользователей сайта
+    owner = forms.ModelChoiceField(
+        queryset=User.objects.only('id', 'email'),
+        to_field_name='email',
+        widget=forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'owner@example.com'}),
+        label=_('Owner'),
+    )
 
     class Meta:
         model = Pet
@@ -20,7 +28,6 @@ class PetForm(forms.ModelForm):
             'birth_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'placeholder': _('Enter description')}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-            'owner': forms.Select(attrs={'class': 'form-control'}),
             'view_count': forms.NumberInput(attrs={'class': 'form-control', 'readonly': 'readonly'}),
         }
         labels = {
@@ -30,10 +37,15 @@ class PetForm(forms.ModelForm):
             'birth_date': _('Birth Date'),
             'description': _('Description'),
             'is_active': _('Active'),
-            'owner': _('Owner'),
             'view_count': _('View Count'),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # model_to_dict кладёт в initial owner_id, а поле ждёт email
+        if self.instance.owner_id:
+            self.initial['owner'] = self.instance.owner.email
+
     def clean_name(self):
         name = self.cleaned_data.get('name')
         if not name:
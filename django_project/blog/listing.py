@@ -0,0 +1,303 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import timedelta
+from math import ceil
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from users.permissions import get_permissions
+
+# Порядок выдачи списков: сначала новые. Ключ (created_at, id) уникален,
+# поэтому по нему можно «перешагивать» страницы без OFFSET.
+ORDERING = ('-created_at', '-id')
+# Сортировка по средней оценке (параметр sort=rating); id в конце делает ключ уникальным
+RATING_ORDERING = ('-rating_avg', '-created_at', '-id')
+SORT_ORDERINGS = {
+    '': ORDERING,
+    'rating': RATING_ORDERING,
+}
+# Насколько целых страниц курсор ссылки может «перешагнуть» от своей строки (см. KeysetPage.cursor_for).
+# Больший пропуск в присланном курсоре не принимается: страница ищется по номеру.
+MAX_SKIP_PAGES = 10
+
+
+def filter_pets(queryset, params, user):
+    """Фильтры списка питомцев из GET-параметров (общие для страницы списка и служебных команд)."""
+    access = get_permissions(user)
+    # Базовая фильтрация для неадминистраторов и не модераторов
+    if not access.can_view_inactive:
+        queryset = queryset.filter(is_active=True)
+
+    name_filter = params.get('name', '')
+    if name_filter:
+        queryset = queryset.filter(name__icontains=name_filter)
+
+    species_filter = params.get('species', '')
+    if species_filter:
+        queryset = queryset.filter(species=species_filter)
+
+    age_min = params.get('age_min', '')
+    age_max = params.get('age_max', '')
+    if age_min and age_min.isdigit():
+        queryset = queryset.filter(age__gte=int(age_min))
+    if age_max and age_max.isdigit():
+        queryset = queryset.filter(age__lte=int(age_max))
+
+    owner_filter = params.get('owner', '')
+    if owner_filter and access.can_filter_owner:
+        queryset = queryset.filter(owner__email__icontains=owner_filter)
+
+    created_at_filter = params.get('created_at', '')
+    if created_at_filter == 'last_month':
+        one_month_ago = timezone.now() - timedelta(days=30)
+        queryset = queryset.filter(created_at__gte=one_month_ago)
+
+    rating_min = params.get('rating_min', '')
+    if rating_min and rating_min.isdigit():
+        queryset = queryset.filter(rating_avg__gte=int(rating_min))
+
+    return queryset
+
+
+PARTITIONS = {
+    'active': Count('pk', filter=Q(is_active=True)),
+    'inactive': Count('pk', filter=Q(is_active=False)),
+}
+
+
+def partition_counts(queryset):
+    """Считает активных и неактивных питомцев одним агрегирующим запросом."""
+    return queryset.order_by().aggregate(**PARTITIONS)
+
+
+async def apartition_counts(queryset):
+    return await queryset.order_by().aaggregate(**PARTITIONS)
+
+
+def _ordering_fields(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или собран не для этой сортировки."""
+
+
+def encode_cursor(direction, obj, ordering=ORDERING, skip=0):
+    """Курсор от строки obj; skip — сколько строк пропустить за ней (только у ссылок KeysetPaginator)."""
+    values = []
+    for name, _ in _ordering_fields(ordering):
+        value = getattr(obj, name)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    # Пропуск — объект, а не число: иначе курсор другой сортировки с лишним полем ключа прочитался бы как пропуск
+    raw = json.dumps([direction] + values + ([{'skip': skip}] if skip else []))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, ordering=ORDERING):
+    """
+    Возвращает (direction, [значения ключа], skip) или None для пустого курсора; битый — InvalidCursor.
+    """
+    if not token:
+        return None
+    fields = _ordering_fields(ordering)
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(data, list) or len(data) not in (len(fields) + 1, len(fields) + 2) or \
+                data[0] not in ('after', 'before'):
+            raise InvalidCursor(token)
+        extra = data[len(fields) + 1] if len(data) > len(fields) + 1 else {'skip': 0}
+        skip = extra.get('skip') if isinstance(extra, dict) else None
+        if type(skip) is not int or skip < 0:
+            raise InvalidCursor(token)
+        values = [model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, data[1:])]
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, ValidationError):
+        raise InvalidCursor(token)
+    if any(value is None for value in values):
+        raise InvalidCursor(token)
+    return data[0], values, skip
+
+
+def _seek_filter(ordering, values, forward):
+    # Лексикографическое сравнение ключа: (a < a0) OR (a = a0 AND b < b0) OR ...
+    fields = _ordering_fields(ordering)
+    condition = Q()
+    for i, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending == forward else 'gt'
+        equal = {fields[j][0]: values[j] for j in range(i)}
+        condition |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+    return condition
+
+
+def cursor_page(queryset, cursor, limit, ordering=ORDERING):
+    """
+    Страница по курсору без подсчёта общего числа записей (для API).
+    Возвращает (строки, курсор следующей страницы, курсор предыдущей); битый курсор — InvalidCursor.
+    """
+    queryset = queryset.order_by(*ordering)
+    seek = decode_cursor(cursor, queryset.model, ordering)
+    if seek and seek[2]:
+        # API отдаёт курсоры только соседних страниц
+        raise InvalidCursor(cursor)
+    if seek and seek[0] == 'before':
+        rows = list(queryset.filter(_seek_filter(ordering, seek[1], forward=False)).order_by(
+            *_reverse_ordering(ordering))[:limit + 1])
+        has_previous, has_next = len(rows) > limit, True
+        rows = rows[:limit][::-1]
+    else:
+        if seek:
+            queryset = queryset.filter(_seek_filter(ordering, seek[1], forward=True))
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = list(queryset[:limit + 1])
+        has_previous, has_next = seek is not None, len(rows) > limit
+        rows = rows[:limit]
+    next_cursor = encode_cursor('after', rows[-1], ordering) if rows and has_next else ''
+    previous_cursor = encode_cursor('before', rows[0], ordering) if rows and has_previous else ''
+    return rows, next_cursor, previous_cursor
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по уникальному ключу сортировки (по умолчанию (created_at, id)).
+    Количество записей передаётся снаружи, чтобы оба раздела списка
+    посчитать одним запросом (см. partition_counts).
+    """
+
+    def __init__(self, queryset, per_page, count, ordering=ORDERING):
+        self.ordering = tuple(ordering)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+        self.count = count
+
+    @property
+    def num_pages(self):
+        return max(1, ceil(self.count / self.per_page))
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return min(max(number, 1), self.num_pages)
+
+    def get_page(self, number, cursor=None):
+        number, rows, reverse = self._page_query(number, cursor)
+        return self._page(number, list(rows), reverse)
+
+    async def aget_page(self, number, cursor=None):
+        number, rows, reverse = self._page_query(number, cursor)
+        return self._page(number, [row async for row in rows], reverse)
+
+    def _page_query(self, number, cursor):
+        """
+        Возвращает (номер страницы, queryset строк, признак обратного порядка).
+        Строки выбирают get_page и aget_page, поэтому синхронная и асинхронная
+        пагинация строят одинаковые запросы.
+        """
+        number = self.validate_number(number)
+        if not self.count:
+            return number, self.queryset.none(), False
+        try:
+            seek = decode_cursor(cursor, self.queryset.model, self.ordering)
+        except InvalidCursor:
+            # Ссылки страниц несут и номер, и курсор: по испорченному курсору страница
+            # находится по номеру, как при переходе без курсора
+            seek = None
+        if seek is None or seek[2] > MAX_SKIP_PAGES * self.per_page:
+            return (number, *self._page_by_number(number))
+
+        direction, values, skip = seek
+        if direction == 'after':
+            rows = self.queryset.filter(_seek_filter(self.ordering, values, forward=True))
+            return number, rows[skip:skip + self.per_page], False
+        rows = self.queryset.filter(_seek_filter(self.ordering, values, forward=False)).order_by(
+            *_reverse_ordering(self.ordering))
+        return number, rows[skip:skip + self.per_page], True
+
+    def _page(self, number, rows, reverse):
+        return KeysetPage(rows[::-1] if reverse else rows, number, self)
+
+    def _page_by_number(self, number):
+        # Переход по номеру страницы без курсора идёт от ближайшего конца списка, так что
+        # смещение никогда не превышает половины раздела. Ссылки {% paginate %} без курсора ведут
+        # только на первую и последнюю страницы (смещение 0); дальний номер, набранный в адресе
+        # вручную, остаётся OFFSET-запросом.
+        start = (number - 1) * self.per_page
+        end = min(start + self.per_page, self.count)
+        if start <= self.count - end:
+            return self.queryset[start:end], False
+        reverse_start = self.count - end
+        return self.queryset.order_by(*_reverse_ordering(self.ordering))[
+            reverse_start:reverse_start + (end - start)], True
+
+
+class KeysetPage(Sequence):
+    """Страница с тем же интерфейсом, что и django.core.paginator.Page, плюс курсоры соседних страниц."""
+
+    def __init__(self, object_list, number, paginator):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f'<Page {self.number} of {self.paginator.num_pages}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.number < self.paginator.num_pages
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_cursor(self):
+        if not (self.object_list and self.has_next()):
+            return ''
+        return encode_cursor('after', self.object_list[-1], self.paginator.ordering)
+
+    @property
+    def previous_cursor(self):
+        if not (self.object_list and self.has_previous()):
+            return ''
+        return encode_cursor('before', self.object_list[0], self.paginator.ordering)
+
+    def cursor_for(self, number):
+        """
+        Курсор ссылки на страницу number: от крайней строки текущей страницы с пропуском
+        страниц между ними, так что цена перехода не зависит от глубины списка. Первая
+        и последняя страницы находятся по номеру без курсора.
+        """
+        between = abs(number - self.number) - 1
+        if not self.object_list or number in (1, self.number, self.paginator.num_pages) or \
+                between >= MAX_SKIP_PAGES:
+            return ''
+        skip = between * self.paginator.per_page
+        if number > self.number:
+            return encode_cursor('after', self.object_list[-1], self.paginator.ordering, skip)
+        return encode_cursor('before', self.object_list[0], self.paginator.ordering, skip)
@@ -0,0 +1,48 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from config.instrumentation import read_records
+
+
+class Command(BaseCommand):
+    help = ('Shows two-tier cache statistics (L1/L2 hits, misses, evictions, recomputes) for each worker '
+            'process, summed over the sampled requests of that worker in the performance log')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=str(settings.PERFORMANCE_LOG_FILE), help='Performance log file')
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'stats'):
+            self.stdout.write('The default cache is not config.tiered_cache.TieredCache '
+                              '(CACHE_ENABLED=True enables it)')
+        workers = defaultdict(Counter)
+        requests = Counter()
+        try:
+            for record in read_records(options['log']):
+                # В записи — операции кэша одного запроса; по воркеру они суммируются
+                if 'cache' in record:
+                    workers[record['pid']].update(record['cache'])
+                    requests[record['pid']] += 1
+        except FileNotFoundError:
+            raise CommandError(f'Log file {options["log"]} not found')
+        if not workers:
+            self.stdout.write('No sampled requests with cache statistics in the log yet')
+            return
+
+        self.stdout.write(f'{"worker pid":>10} {"requests":>9} {"L1 hits":>9} {"L2 hits":>9} {"misses":>8} '
+                          f'{"hit %":>6} {"evicted":>8} {"expired":>8} {"recomputes":>11} {"early":>6} '
+                          f'{"coalesced":>10} {"stale":>6}')
+        for pid, stats in sorted(workers.items()):
+            reads = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+            hit_rate = 100 * (stats['l1_hits'] + stats['l2_hits']) / reads if reads else 0
+            self.stdout.write(
+                f'{pid:>10} {requests[pid]:>9} {stats["l1_hits"]:>9} {stats["l2_hits"]:>9} {stats["misses"]:>8} '
+                f'{hit_rate:>6.1f} {stats["l1_evictions"]:>8} {stats["l1_expirations"]:>8} '
+                f'{stats["recomputes"]:>11} {stats["early_recomputes"]:>6} {stats["coalesced"]:>10} '
+                f'{stats["stale_hits"]:>6}'
+            )
+        self.stdout.write('Counts cover sampled requests only (INSTRUMENTATION_SAMPLE_RATE); many evictions '
+                          'per L1 hit mean CACHE_L1_MAX_ENTRIES or CACHE_L1_MAX_BYTES is too small')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compares two run_benchmark JSON reports of the same suite, e.g. from two git revisions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline')
+        parser.add_argument('current')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 growth or throughput drop '
+                                 'before a scenario counts as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        lines, regressions = benchmark.compare(
+            benchmark.load_report(options['baseline']), benchmark.load_report(options['current']),
+            options['threshold'])
+        for line in lines:
+            self.stdout.write(line)
+        if regressions:
+            message = f'{len(regressions)} regressions: {", ".join(regressions)}'
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions'))
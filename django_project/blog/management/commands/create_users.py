@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
+from users.provisioning import provision_users
 
 
 class Command(BaseCommand):
@@ -17,29 +16,15 @@ class Command(BaseCommand):
              'is_superuser': False, 'is_active': True},
         ]
 
-        for data in users_data:
-            try:
-                user, created = User.objects.get_or_create(email=data['email'], defaults={
-                    'role': data['role'],
-                    'is_staff': data['is_staff'],
-                    'is_superuser': data['is_superuser'],
-                    'is_active': data['is_active'],
-                })
-                if created:
-                    user.set_password(data['password'])
-                    user.save()
-                    self.stdout.write(self.style.SUCCESS(
-                        f'Created user: {data["email"]} with role {user.role}, is_staff={user.is_staff}, is_superuser={user.is_superuser}, is_active={user.is_active}'))
-                else:
-                    user.role = data['role']
-                    user.is_staff = data['is_staff']
-                    user.is_superuser = data['is_superuser']
-                    user.is_active = data['is_active']
-                    user.set_password(data['password'])
-                    user.save()
-                    self.stdout.write(self.style.WARNING(
-                        f'Updated user: {data["email"]} with role {user.role}, is_staff={user.is_staff}, is_superuser={user.is_superuser}, is_active={user.is_active}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error processing user {data["email"]}: {str(e)}'))
+        # Пароль перехэшируется, только если сохранённый хэш ему не соответствует
+        result = provision_users(users_data)
+        for user in result.created:
+            self.stdout.write(self.style.SUCCESS(
+                f'Created user: {user.email} with role {user.role}, is_staff={user.is_staff}, is_superuser={user.is_superuser}, is_active={user.is_active}'))
+        for user in result.updated:
+            self.stdout.write(self.style.WARNING(
+                f'Updated user: {user.email} with role {user.role}, is_staff={user.is_staff}, is_superuser={user.is_superuser}, is_active={user.is_active}'))
+        for user in result.unchanged:
+            self.stdout.write(f'Unchanged user: {user.email}')
 
         self.stdout.write(self.style.SUCCESS('Successfully processed users'))
@@ -0,0 +1,74 @@
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from config.instrumentation import read_records
+
+
+class Command(BaseCommand):
+    help = ('Shows the connection settings in effect, database connections opened per request for each '
+            'worker process (from the performance log) and, on PostgreSQL, the server-side connections')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=str(settings.PERFORMANCE_LOG_FILE), help='Performance log file')
+
+    def handle(self, *args, **options):
+        self.show_settings()
+        self.show_churn(options['log'])
+        if connection.vendor == 'postgresql':
+            self.show_server()
+
+    def show_settings(self):
+        database = settings.DATABASES['default']
+        pool = database.get('OPTIONS', {}).get('pool')
+        self.stdout.write(f'Engine:             {database["ENGINE"]}')
+        self.stdout.write(f'CONN_MAX_AGE:       {database.get("CONN_MAX_AGE", 0)}')
+        self.stdout.write(f'CONN_HEALTH_CHECKS: {database.get("CONN_HEALTH_CHECKS", False)}')
+        if pool:
+            self.stdout.write(f'Pool:               min {pool.get("min_size")}, max {pool.get("max_size")}, '
+                              f'timeout {pool.get("timeout")} s')
+        else:
+            self.stdout.write('Pool:               off')
+        self.stdout.write('')
+
+    def show_churn(self, path):
+        workers = defaultdict(list)
+        try:
+            for record in read_records(path):
+                # Соединения считаются только у сэмплированных запросов
+                if record.get('sampled') and 'new_connections' in record:
+                    workers[record['pid']].append(record)
+        except FileNotFoundError:
+            raise CommandError(f'Log file {path} not found')
+        if not workers:
+            self.stdout.write('No sampled requests with connection data in the log yet')
+            return
+
+        self.stdout.write(f'{"worker pid":>10} {"requests":>9} {"new conns":>10} {"per request":>12} '
+                          f'{"mean ms":>9} {"mean sql ms":>12}')
+        for pid, records in sorted(workers.items()):
+            opened = sum(record['new_connections'] for record in records)
+            self.stdout.write(
+                f'{pid:>10} {len(records):>9} {opened:>10} {opened / len(records):>12.2f} '
+                f'{statistics.fmean(r["total_ms"] for r in records):>9.1f} '
+                f'{statistics.fmean(r["sql_ms"] for r in records):>12.1f}'
+            )
+        # 1.00 на запрос — соединение открывается заново каждый раз (CONN_MAX_AGE=0 без пула)
+        self.stdout.write('')
+
+    def show_server(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW max_connections')
+            max_connections = cursor.fetchone()[0]
+            cursor.execute(
+                'SELECT application_name, state, count(*) FROM pg_stat_activity '
+                'WHERE datname = current_database() GROUP BY 1, 2 ORDER BY 1, 2'
+            )
+            rows = cursor.fetchall()
+        self.stdout.write(f'PostgreSQL max_connections: {max_connections}')
+        self.stdout.write(f'{"application":<24} {"state":<24} {"connections":>11}')
+        for application, state, count in rows:
+            self.stdout.write(f'{application or "-":<24} {state or "-":<24} {count:>11}')
@@ -0,0 +1,72 @@
+import re
+from itertools import combinations
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from blog.listing import ORDERING, filter_pets
+from blog.models import Pet
+from users.models import User
+
+# Группы фильтров PetListView и значения, с которыми строятся запросы
+FILTER_GROUPS = {
+    'name': {'name': 'ре'},
+    'species': {'species': 'dog'},
+    'age': {'age_min': '2', 'age_max': '8'},
+    'owner': {'owner': 'example'},
+    'created_at': {'created_at': 'last_month'},
+}
+
+INDEX_PATTERNS = [
+    re.compile(r'Index (?:Only )?Scan(?: Backward)? using (\w+)'),  # PostgreSQL
+    re.compile(r'Bitmap Index Scan on (\w+)'),  # PostgreSQL
+    re.compile(r'USING (?:COVERING )?INDEX (\w+)'),  # SQLite
+]
+
+
+def used_indexes(plan):
+    found = []
+    for pattern in INDEX_PATTERNS:
+        for name in pattern.findall(plan):
+            if name not in found:
+                found.append(name)
+    return found
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN for every PetListView filter combination and reports which ones hit an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--misses', action='store_true', help='Only show combinations without an index')
+        parser.add_argument('--verbose-plan', action='store_true', help='Print the full EXPLAIN output')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Database: {connection.vendor}')
+        viewers = [('public', AnonymousUser()), ('admin', User(role='admin'))]
+        hits = total = 0
+
+        for size in range(len(FILTER_GROUPS) + 1):
+            for groups in combinations(FILTER_GROUPS, size):
+                params = {}
+                for group in groups:
+                    params.update(FILTER_GROUPS[group])
+                for role, user in viewers:
+                    partitions = [True] if role == 'public' else [True, False]
+                    for is_active in partitions:
+                        queryset = filter_pets(Pet.objects.all(), params, user).filter(is_active=is_active)
+                        plan = queryset.order_by(*ORDERING)[:5].explain()
+                        indexes = used_indexes(plan)
+                        total += 1
+                        hits += bool(indexes)
+                        if options['misses'] and indexes:
+                            continue
+                        label = ', '.join(groups) or '(no filters)'
+                        partition = 'active' if is_active else 'inactive'
+                        result = ', '.join(indexes) if indexes else 'NO INDEX'
+                        line = f'{role:<7} {partition:<9} {label:<45} {result}'
+                        self.stdout.write(self.style.SUCCESS(line) if indexes else self.style.WARNING(line))
+                        if options['verbose_plan']:
+                            self.stdout.write(plan)
+
+        self.stdout.write(f'{hits} of {total} filter combinations use an index')
@@ -0,0 +1,37 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.transfer import COLUMNS, FORMATS, export_rows, write_rows
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = 'Streams pets, pedigrees, reviews or users to JSON Lines or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=list(COLUMNS), default='pets')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output', help='Output file (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = export_rows(options['model'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                count = write_rows(rows, stream, options['format'], options['model'])
+        else:
+            count = write_rows(rows, sys.stdout, options['format'], options['model'])
+
+        elapsed = time.perf_counter() - started
+        report = f'Exported {count} {options["model"]} in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)'
+        if resource:
+            report += f', peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB'
+        # Отчёт идёт в stderr, чтобы не смешиваться с данными при выводе в stdout
+        self.stderr.write(self.style.SUCCESS(report))
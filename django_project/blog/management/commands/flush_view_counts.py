@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.counters import FLUSH_LOCK_TIMEOUT, SCAN_CHUNK_SIZE, buffer_is_shared, flush_pending_views
+
+
+class Command(BaseCommand):
+    help = ('Moves buffered pet view counts from the cache into the database for every pet, including views '
+            'buffered by worker processes that have gone idle or stopped. Run it periodically (cron or --loop). '
+            'Needs a cache shared by all processes (CACHE_ENABLED=True with Redis or a file cache): '
+            'with the default in-memory cache each worker flushes only its own views')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=SCAN_CHUNK_SIZE, help='Pets read per cache get_many')
+        parser.add_argument('--loop', action='store_true', help='Keep flushing instead of exiting')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between flushes with --loop')
+
+    def handle(self, *args, **options):
+        if not buffer_is_shared():
+            raise CommandError('The cache keeps buffered views in the memory of each worker process, so this '
+                               'command cannot see them. Set CACHE_ENABLED=True with a shared cache backend.')
+        while True:
+            started = time.perf_counter()
+            flushed = flush_pending_views(options['chunk_size'], lock_wait=FLUSH_LOCK_TIMEOUT)
+            elapsed = time.perf_counter() - started
+            if flushed is None:
+                message = 'Another flush held the lock for too long; nothing was written'
+                if not options['loop']:
+                    raise CommandError(message)
+                self.stderr.write(message)
+            else:
+                self.stdout.write(f'Flushed view counts of {flushed} pets in {elapsed:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.transfer import COLUMNS, FORMATS, Importer, InvalidRow, batched, read_rows
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Command(BaseCommand):
+    help = 'Streams pets, pedigrees, reviews or users from JSON Lines or CSV and upserts them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument('--model', choices=list(COLUMNS), default='pets')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create/bulk_update')
+        parser.add_argument('--strict', action='store_true',
+                            help='Stop at the first invalid row instead of skipping and reporting it')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        importer = Importer(options['model'], strict=options['strict'])
+        started = time.perf_counter()
+        total = 0
+        first_row = 1
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8', newline='')
+        try:
+            for batch in batched(read_rows(stream, fmt), options['batch_size']):
+                reported = len(importer.invalid)
+                total += importer.import_batch(batch, first_row)
+                first_row += len(batch)
+                for number, message in importer.invalid[reported:]:
+                    self.stderr.write(f'Row {number}: {message}')
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Imported {total} {options["model"]} ({total / elapsed:.0f} rows/s)')
+        except InvalidRow as error:
+            # Пачка с ошибочной строкой откатывается целиком, предыдущие пачки остаются
+            raise CommandError(f'{error}. Imported {total} {options["model"]} before it.')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        report = f'Imported {total} {options["model"]} in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)'
+        if importer.skipped:
+            report += f', skipped {importer.skipped} rows with unknown owner/pet/author'
+        if importer.invalid:
+            report += f', skipped {len(importer.invalid)} invalid rows'
+        if resource:
+            report += f', peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB'
+        self.stdout.write(self.style.SUCCESS(report))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Pet
+from blog.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized review count, rating sum/average and histogram for every pet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        last_id = 0
+        while True:
+            pet_ids = list(
+                Pet.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not pet_ids:
+                break
+            with transaction.atomic():
+                total += recompute_ratings(pet_ids)
+            last_id = pet_ids[-1]
+            self.stdout.write(f'Recomputed {total} pets')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {total} pets in {elapsed:.1f}s'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import Pet
+from blog.search import update_documents
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search documents for pets in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        total = 0
+        last_id = 0
+        # Идём по первичному ключу, чтобы не держать в памяти больше одной пачки
+        while True:
+            pet_ids = list(
+                Pet.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pet_ids:
+                break
+            total += update_documents(pet_ids)
+            last_id = pet_ids[-1]
+            self.stdout.write(f'Indexed {total} pets')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} pets in {elapsed:.1f}s'))
@@ -0,0 +1,132 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import translation
+
+from blog import benchmark
+from blog.models import Pet
+
+# Наборы замеров: urls — все адреса blog и users через тестовый клиент, detail — кэш данных
+# страницы питомца, asgi — пропускная способность под ASGI, connections и sessions — стоимость
+# соединений с базой и сессионного слоя, pagination и fragments — рендеринг пагинации и строк списка
+SUITES = ('urls', 'detail', 'asgi', 'connections', 'sessions', 'pagination', 'fragments')
+# Наборы, которые отправляют запросы в обработчик Django: им нужен хост testserver
+# и подменённая отправка почты
+HANDLER_SUITES = ('urls', 'asgi', 'connections', 'sessions')
+# Сценарии по умолчанию для наборов, которые прогоняют не все адреса
+DEFAULT_SCENARIOS = {
+    'connections': ['profile'],
+    # Анонимный и авторизованный просмотр списка, личный кабинет и выход
+    'sessions': ['pet_list:anonymous', 'pet_list:admin', 'profile', 'logout'],
+}
+DEFAULT_ITERATIONS = {'urls': 50, 'detail': 50, 'pagination': 20, 'fragments': 50}
+
+
+class Command(BaseCommand):
+    help = ('Runs a benchmark suite and reports latency percentiles as JSON: every blog and users URL (urls), '
+            'the pet detail cache (detail), ASGI throughput (asgi), database connection modes (connections), '
+            'session layer configurations (sessions), pagination markup (pagination) or list row fragments '
+            '(fragments)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suite', choices=SUITES, default='urls')
+        parser.add_argument('--iterations', type=int,
+                            help='Measurements per scenario (urls, detail, pagination, fragments)')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per scenario (urls)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per scenario (asgi, connections, sessions)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous clients (asgi)')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Run only scenarios whose name contains this text (repeatable)')
+        parser.add_argument('--pet', type=int, help='Pet id for the detail suite (defaults to the newest pet)')
+        parser.add_argument('--pages', type=int, action='append', default=[],
+                            help='Number of pages in the list (pagination, repeatable, defaults to 10 and 10000)')
+        parser.add_argument('--rows', type=int, action='append', default=[],
+                            help='Rows per page (fragments, repeatable, defaults to 5 and 50)')
+        parser.add_argument('--language', default='ru', help='Language the rows are rendered in (fragments)')
+        parser.add_argument('--output', help='Write the JSON report to this file (defaults to stdout)')
+        parser.add_argument('--compare', help='Baseline JSON report of the same suite')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 growth or throughput drop '
+                                 'before a scenario counts as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        suite = options['suite']
+        options['iterations'] = options['iterations'] or DEFAULT_ITERATIONS.get(suite)
+
+        # Тестовое окружение разрешает хост testserver и подменяет отправку почты
+        if suite in HANDLER_SUITES:
+            setup_test_environment()
+        try:
+            report = getattr(self, f'run_{suite}')(options)
+        finally:
+            if suite in HANDLER_SUITES:
+                teardown_test_environment()
+
+        data = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(data)
+            self.stderr.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+        else:
+            self.stdout.write(data)
+
+        if options['compare']:
+            lines, regressions = benchmark.compare(benchmark.load_report(options['compare']), report,
+                                                   options['threshold'])
+            for line in lines:
+                self.stderr.write(line)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Regressions: {", ".join(regressions)}')
+
+    def scenarios(self, options, default=None):
+        scenarios = benchmark.build_scenarios()
+        if not scenarios:
+            raise CommandError('No benchmark data found. Run seed_benchmark first.')
+        if options['only']:
+            scenarios = [s for s in scenarios if any(part in s.name for part in options['only'])]
+        elif default is not None:
+            scenarios = [s for s in scenarios if s.name in default]
+        if not scenarios:
+            raise CommandError('No scenarios match --only.')
+        return scenarios
+
+    def run_urls(self, options):
+        return benchmark.run_suite(self.scenarios(options), options['iterations'], options['warmup'],
+                                   log=self.stderr.write)
+
+    def run_detail(self, options):
+        pet_id = options['pet'] or Pet.objects.order_by('-id').values_list('pk', flat=True).first()
+        if pet_id is None:
+            raise CommandError('No pets found. Run seed_benchmark first.')
+        return benchmark.run_detail_benchmark(pet_id, options['iterations'], log=self.stderr.write)
+
+    def run_asgi(self, options):
+        # Асинхронные версии есть только у страниц чтения (blog.async_views)
+        scenarios = [s for s in self.scenarios(options) if s.name.startswith(benchmark.READ_SCENARIOS)]
+        self.stderr.write(f'{"async" if settings.ASYNC_VIEWS else "sync"} views, '
+                          f'{options["concurrency"]} concurrent clients')
+        return benchmark.run_throughput_suite(scenarios, options['requests'], options['concurrency'],
+                                              log=self.stderr.write)
+
+    def run_connections(self, options):
+        return benchmark.run_connection_suite(self.scenarios(options, DEFAULT_SCENARIOS['connections']),
+                                              options['requests'], log=self.stderr.write)
+
+    def run_sessions(self, options):
+        return benchmark.run_session_suite(self.scenarios(options, DEFAULT_SCENARIOS['sessions']),
+                                           options['requests'], log=self.stderr.write)
+
+    def run_pagination(self, options):
+        return benchmark.run_pagination_benchmark(options['pages'] or (10, 10000), options['iterations'],
+                                                  log=self.stderr.write)
+
+    def run_fragments(self, options):
+        if not Pet.objects.exists():
+            raise CommandError('No pets found. Run seed_benchmark first.')
+        with translation.override(options['language']):
+            return benchmark.run_fragment_benchmark(options['rows'] or (5, 50), options['iterations'],
+                                                    log=self.stderr.write)
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog import benchmark
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generates synthetic users, pets, pedigrees and reviews for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--pets', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; equal seeds give equal datasets')
+        parser.add_argument('--days', type=int, default=730, help='Spread creation dates over this many days')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help=f'Delete previously generated data (users @{benchmark.EMAIL_DOMAIN}) first')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['clear']:
+            # Питомцы, родословные и отзывы удаляются каскадом вместе с пользователями
+            deleted, _ = User.objects.filter(email__endswith=f'@{benchmark.EMAIL_DOMAIN}').delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+
+        with transaction.atomic():
+            size = benchmark.seed(
+                options['users'], options['pets'], options['reviews'], seed=options['seed'],
+                days=options['days'], batch_size=options['batch_size'], log=self.stdout.write,
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {elapsed:.1f}s: ' + ', '.join(f'{count} {name}' for name, count in size.items())))
+        self.stdout.write(f'All generated users share the password "{benchmark.PASSWORD}"')
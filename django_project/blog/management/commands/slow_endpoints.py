@@ -0,0 +1,72 @@
+import statistics
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config.instrumentation import read_records
+
+SORT_KEYS = ('p95', 'total', 'count', 'sql')
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def _cell(value, width, decimals=1):
+    # Для эндпоинтов без сэмплированных запросов подробных замеров нет
+    return f'{value:>{width}.{decimals}f}' if value is not None else '-'.rjust(width)
+
+
+class Command(BaseCommand):
+    help = 'Summarizes the slowest endpoints from the performance log written by PerformanceMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=str(settings.PERFORMANCE_LOG_FILE), help='Performance log file')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='p95',
+                            help='p95 latency, total time spent, request count or mean SQL time')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--min-count', type=int, default=1, help='Skip endpoints with fewer requests')
+
+    def handle(self, *args, **options):
+        endpoints = defaultdict(list)
+        try:
+            for record in read_records(options['log']):
+                endpoints[record.get('view') or record['path']].append(record)
+        except FileNotFoundError:
+            raise CommandError(f'Log file {options["log"]} not found')
+        if not endpoints:
+            self.stdout.write('No requests logged yet')
+            return
+
+        rows = []
+        for name, records in endpoints.items():
+            if len(records) < options['min_count']:
+                continue
+            totals = [record['total_ms'] for record in records]
+            # Подробные поля есть только у сэмплированных запросов
+            sampled = [record for record in records if record.get('sampled')]
+            rows.append({
+                'name': name,
+                'count': len(records),
+                'p50': _percentile(totals, 50),
+                'p95': _percentile(totals, 95),
+                'max': max(totals),
+                'total': sum(totals),
+                'sql_count': statistics.fmean(r['sql_count'] for r in sampled) if sampled else None,
+                'sql': statistics.fmean(r['sql_ms'] for r in sampled) if sampled else None,
+                'template': statistics.fmean(r['template_ms'] for r in sampled) if sampled else None,
+                'duplicates': max((r['duplicates'] for r in sampled), default=None),
+            })
+        rows.sort(key=lambda row: row[options['sort']] or 0, reverse=True)
+
+        self.stdout.write(f'{"endpoint":<32} {"count":>6} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9} '
+                          f'{"queries":>8} {"sql ms":>8} {"tpl ms":>8} {"dups":>5}')
+        for row in rows[:options['limit']]:
+            self.stdout.write(
+                f'{row["name"][:32]:<32} {row["count"]:>6} {row["p50"]:>9.1f} {row["p95"]:>9.1f} {row["max"]:>9.1f} '
+                f'{_cell(row["sql_count"], 8)} {_cell(row["sql"], 8)} {_cell(row["template"], 8)} '
+                f'{_cell(row["duplicates"], 5, 0)}'
+            )
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import warmup
+
+
+class Command(BaseCommand):
+    help = ('Warms the cache after a deploy or a cache flush: requests the pet list (unfiltered and per species) '
+            'and the most viewed pet pages in every configured language as an anonymous visitor, with a bounded '
+            'pool of worker threads. Read-only, safe to run while the site serves traffic')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=100, help='Most viewed pets whose pages are warmed')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent requests (keep well below the database connection limit)')
+        parser.add_argument('--language', action='append', default=[],
+                            help='Language to warm (repeatable, defaults to LANGUAGES or LANGUAGE_CODE)')
+        parser.add_argument('--host', help='Host header of the requests (defaults to the first ALLOWED_HOSTS entry)')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the pages that would be requested')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            # Без CACHE_ENABLED=True у каждого процесса свой кэш: прогреется только этот
+            self.stderr.write(self.style.WARNING('The default cache is local to this process; '
+                                                 'web workers will not see the warmed entries'))
+        targets = warmup.build_targets(options['top'], options['language'] or None)
+        if options['dry_run']:
+            for target in targets:
+                self.stdout.write(f'{target.kind:<7} {target.url}')
+            self.stdout.write(f'{len(targets)} pages')
+            return
+
+        self.verbosity = options['verbosity']
+        self.total = len(targets)
+        self.done = 0
+        started = time.perf_counter()
+        results = warmup.warm(targets, options['workers'], options['host'], self.report)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'{"kind":<7} {"pages":>6} {"warmed":>7} {"cached":>7} {"failed":>7} '
+                          f'{"p50 ms":>8} {"max ms":>8}')
+        for kind in ('list', 'detail'):
+            group = [result for result in results if result.target.kind == kind]
+            if not group:
+                continue
+            failed = sum(result.status != 200 for result in group)
+            cached = sum(result.cached for result in group)
+            timings = [result.ms for result in group]
+            self.stdout.write(f'{kind:<7} {len(group):>6} {len(group) - failed - cached:>7} {cached:>7} '
+                              f'{failed:>7} {statistics.median(timings):>8.1f} {max(timings):>8.1f}')
+        failures = [result for result in results if result.status != 200]
+        for result in failures[:10]:
+            self.stderr.write(f'{result.target.url}: {result.error or result.status}')
+        style = self.style.WARNING if failures else self.style.SUCCESS
+        self.stdout.write(style(f'Warmed {len(results)} pages in {elapsed:.1f}s with {options["workers"]} workers'))
+
+    def report(self, result):
+        # Вызывается из потоков warmup.warm под общей блокировкой
+        self.done += 1
+        if self.verbosity >= 2:
+            state = 'cached' if result.cached else result.error or result.status
+            self.stdout.write(f'[{self.done}/{self.total}] {result.target.url} {state} {result.ms:.1f} ms')
+        elif self.done == self.total or self.done % max(self.total // 10, 1) == 0:
+            self.stdout.write(f'{self.done}/{self.total} pages')
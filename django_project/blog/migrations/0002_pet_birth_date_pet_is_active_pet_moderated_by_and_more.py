@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='birth_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Дата рождения'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активен'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='moderated_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderated_pets', to=settings.AUTH_USER_MODEL, verbose_name='Модерирован'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество просмотров'),
+        ),
+        migrations.AlterField(
+            model_name='pet',
+            name='species',
+            field=models.CharField(choices=[('dog', 'Собака'), ('cat', 'Кошка'), ('bird', 'Птица'), ('fish', 'Рыба'), ('other', 'Другое')], max_length=100, verbose_name='Вид'),
+        ),
+        migrations.CreateModel(
+            name='Pedigree',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('parent_type', models.CharField(choices=[('mother', 'Мать'), ('father', 'Отец')], max_length=10, verbose_name='Тип родителя')),
+                ('parent_name', models.CharField(max_length=100, verbose_name='Имя родителя')),
+                ('breed', models.CharField(blank=True, max_length=100, verbose_name='Порода')),
+                ('birth_date', models.DateField(blank=True, null=True, verbose_name='Дата рождения родителя')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pedigrees', to='blog.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Родословная',
+                'verbose_name_plural': 'Родословные',
+            },
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст отзыва')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('rating', models.PositiveSmallIntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5)], default=1, verbose_name='Оценка')),
+                ('slug', models.SlugField(blank=True, unique=True, verbose_name='Slug')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='blog.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Отзыв',
+                'verbose_name_plural': 'Отзывы',
+            },
+        ),
+    ]
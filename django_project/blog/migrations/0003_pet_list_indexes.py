@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_pet_birth_date_pet_is_active_pet_moderated_by_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_active', 'species', 'age'], name='pet_active_species_age_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='pet_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'id'], name='pet_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['species', 'age'], name='pet_public_species_age_idx'),
+        ),
+    ]
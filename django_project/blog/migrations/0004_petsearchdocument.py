@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Поисковый индекс зависит от СУБД: на PostgreSQL это вычисляемый столбец tsvector
+# с GIN-индексом, на SQLite — внешняя таблица FTS5, которую синхронизируют триггеры.
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE blog_petsearchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX blog_petsearch_vector_idx ON blog_petsearchdocument USING gin (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS blog_petsearch_vector_idx',
+    'ALTER TABLE blog_petsearchdocument DROP COLUMN IF EXISTS search_vector',
+]
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE blog_petsearch_fts USING fts5(
+        title, body, content='blog_petsearchdocument', content_rowid='pet_id'
+    )
+    """,
+    """
+    CREATE TRIGGER blog_petsearch_ai AFTER INSERT ON blog_petsearchdocument BEGIN
+        INSERT INTO blog_petsearch_fts(rowid, title, body) VALUES (new.pet_id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_petsearch_ad AFTER DELETE ON blog_petsearchdocument BEGIN
+        INSERT INTO blog_petsearch_fts(blog_petsearch_fts, rowid, title, body)
+        VALUES ('delete', old.pet_id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER blog_petsearch_au AFTER UPDATE ON blog_petsearchdocument BEGIN
+        INSERT INTO blog_petsearch_fts(blog_petsearch_fts, rowid, title, body)
+        VALUES ('delete', old.pet_id, old.title, old.body);
+        INSERT INTO blog_petsearch_fts(rowid, title, body) VALUES (new.pet_id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS blog_petsearch_au',
+    'DROP TRIGGER IF EXISTS blog_petsearch_ad',
+    'DROP TRIGGER IF EXISTS blog_petsearch_ai',
+    'DROP TABLE IF EXISTS blog_petsearch_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_pet_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetSearchDocument',
+            fields=[
+                ('pet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.pet', verbose_name='Питомец')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('body', models.TextField(blank=True, verbose_name='Текст')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import blog.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_review_aggregates(apps, schema_editor):
+    # Заполняет новые поля по уже существующим отзывам (далее их поддерживают сигналы)
+    Pet = apps.get_model('blog', 'Pet')
+    Review = apps.get_model('blog', 'Review')
+    histograms = {}
+    for row in Review.objects.order_by().values('pet_id', 'rating').annotate(total=Count('id')):
+        histograms.setdefault(row['pet_id'], [0, 0, 0, 0, 0])[row['rating'] - 1] = row['total']
+    for pet_id, histogram in histograms.items():
+        review_count = sum(histogram)
+        rating_sum = sum(count * rating for rating, count in enumerate(histogram, start=1))
+        Pet.objects.filter(pk=pet_id).update(review_count=review_count, rating_sum=rating_sum,
+                                             rating_avg=rating_sum / review_count, rating_histogram=histogram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_petsearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='rating_avg',
+            field=models.FloatField(default=0, verbose_name='Средняя оценка'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='rating_histogram',
+            field=models.JSONField(default=blog.models.empty_rating_histogram, verbose_name='Распределение оценок'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество отзывов'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['rating_avg', 'created_at', 'id'], name='pet_public_rating_idx'),
+        ),
+        migrations.RunPython(fill_review_aggregates, migrations.RunPython.noop),
+    ]
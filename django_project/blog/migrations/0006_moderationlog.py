@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_pet_review_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('activate', 'Активация'), ('deactivate', 'Деактивация')], max_length=10, verbose_name='Действие')),
+                ('batch', models.UUIDField(verbose_name='Пакет')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('moderator', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Модератор')),
+                ('pet', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='moderation_log', to='blog.pet', verbose_name='Питомец')),
+            ],
+            options={
+                'verbose_name': 'Запись модерации',
+                'verbose_name_plural': 'Журнал модерации',
+            },
+        ),
+    ]
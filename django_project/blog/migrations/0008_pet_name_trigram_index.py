@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Фильтр name__icontains на PostgreSQL — UPPER("name"::text) LIKE UPPER('%…%'). B-tree такой
+# шаблон не использует; GIN-индекс pg_trgm по тому же выражению используется. На SQLite
+# и других СУБД шаг пропускается (там LIKE с ведущим % индексом не ускоряется).
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS pet_name_trgm_idx ON blog_pet USING gin (UPPER(name::text) gin_trgm_ops)',
+]
+# Расширение не удаляется: им могут пользоваться другие объекты базы
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS pet_name_trgm_idx',
+]
+
+
+def create_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in POSTGRESQL_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_pedigree_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
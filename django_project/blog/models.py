@@ -4,6 +4,12 @@ from users.models import User
 from datetime import date
 import uuid
 
+
+def empty_rating_histogram():
+    # Количество оценок 1, 2, 3, 4 и 5
+    return [0, 0, 0, 0, 0]
+
+
 class Pet(models.Model):
     SPECIES_CHOICES = [
         ('dog', 'Собака'),
@@ -27,6 +33,11 @@ class Pet(models.Model):
         related_name='moderated_pets', verbose_name='Модерирован'
     )
     view_count = models.PositiveIntegerField(default=0, verbose_name='Количество просмотров')
+    # Агрегаты отзывов поддерживаются сигналами (см. blog.ratings)
+    review_count = models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')
+    rating_avg = models.FloatField(default=0, verbose_name='Средняя оценка')
+    rating_histogram = models.JSONField(default=empty_rating_histogram, verbose_name='Распределение оценок')
 
     def __str__(self):
         return self.name
@@ -46,6 +57,20 @@ class Pet(models.Model):
     class Meta:
         verbose_name = 'Питомец'
         verbose_name_plural = 'Питомцы'
+        # Индексы под фильтры и сортировку PetListView (см. команду explain_pet_filters).
+        # Триграммный индекс для поиска по кличке создаётся миграцией только на PostgreSQL.
+        indexes = [
+            models.Index(fields=['is_active', 'species', 'age'], name='pet_active_species_age_idx'),
+            models.Index(fields=['is_active', 'created_at', 'id'], name='pet_active_created_idx'),
+            # Публичный список всегда фильтрует is_active=True. SQLite не сопоставляет условие
+            # WHERE "is_active" с составным индексом, а частичный индекс использует.
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_active=True),
+                         name='pet_public_created_idx'),
+            models.Index(fields=['species', 'age'], condition=models.Q(is_active=True),
+                         name='pet_public_species_age_idx'),
+            models.Index(fields=['rating_avg', 'created_at', 'id'], condition=models.Q(is_active=True),
+                         name='pet_public_rating_idx'),
+        ]
 
 class Pedigree(models.Model):
     pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='pedigrees', verbose_name='Питомец')
@@ -58,6 +83,8 @@ class Pedigree(models.Model):
     breed = models.CharField(max_length=100, blank=True, verbose_name='Порода')
     birth_date = models.DateField(null=True, blank=True, verbose_name='Дата рождения родителя')
     description = models.TextField(blank=True, verbose_name='Описание')
+    # Входит в ETag страницы питомца (см. blog.cache.get_pet_validators)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     def __str__(self):
         return f"{self.get_parent_type_display()} {self.parent_name} для {self.pet.name}"
@@ -88,4 +115,41 @@ class Review(models.Model):
 
     class Meta:
         verbose_name = 'Отзыв'
-        verbose_name_plural = 'Отзывы'
\ No newline at end of file
+        verbose_name_plural = 'Отзывы'
+
+class PetSearchDocument(models.Model):
+    # Денормализованный текст для полнотекстового поиска (см. blog.search)
+    pet = models.OneToOneField(Pet, on_delete=models.CASCADE, primary_key=True, related_name='search_document',
+                               verbose_name='Питомец')
+    title = models.CharField(max_length=100, verbose_name='Заголовок')
+    body = models.TextField(blank=True, verbose_name='Текст')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+
+class ModerationLog(models.Model):
+    ACTION_CHOICES = [
+        ('activate', 'Активация'),
+        ('deactivate', 'Деактивация'),
+    ]
+
+    # Питомец и модератор обнуляются при удалении, чтобы журнал сохранялся
+    pet = models.ForeignKey(Pet, on_delete=models.SET_NULL, null=True, related_name='moderation_log',
+                            verbose_name='Питомец')
+    moderator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name='Модератор')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='Действие')
+    batch = models.UUIDField(verbose_name='Пакет')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата')
+
+    def __str__(self):
+        return f'{self.get_action_display()} #{self.pet_id}'
+
+    class Meta:
+        verbose_name = 'Запись модерации'
+        verbose_name_plural = 'Журнал модерации'
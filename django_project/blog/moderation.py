@@ -0,0 +1,38 @@
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_pet
+from .models import ModerationLog, Pet
+from .page_cache import invalidate_pages
+
+# Размер списка в IN (...): больше выбранных питомцев обрабатываются несколькими UPDATE
+MAX_BATCH = 1000
+
+
+def moderate_pets(pet_ids, active, moderator):
+    """
+    Активирует или деактивирует питомцев UPDATE ... WHERE id IN (...), записывает журнал
+    через bulk_create и сбрасывает кэш один раз на всю операцию.
+    Возвращает id питомцев, у которых изменился статус.
+    """
+    pet_ids = list(pet_ids)
+    batch = uuid.uuid4()
+    action = 'activate' if active else 'deactivate'
+    changed = []
+    with transaction.atomic():
+        for start in range(0, len(pet_ids), MAX_BATCH):
+            chunk = list(Pet.objects.select_for_update().filter(pk__in=pet_ids[start:start + MAX_BATCH]).exclude(
+                is_active=active).values_list('pk', flat=True))
+            if not chunk:
+                continue
+            # update() не вызывает save() и сигналы: кэш страниц сбрасывается ниже
+            Pet.objects.filter(pk__in=chunk).update(is_active=active, moderated_by=moderator,
+                                                    updated_at=timezone.now())
+            ModerationLog.objects.bulk_create(
+                [ModerationLog(pet_id=pet_id, moderator=moderator, action=action, batch=batch) for pet_id in chunk])
+            changed.extend(chunk)
+        if changed:
+            transaction.on_commit(lambda: (invalidate_pet(*changed), invalidate_pages()))
+    return changed
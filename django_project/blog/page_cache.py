@@ -0,0 +1,153 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.translation import get_language
+
+from .cache import aget_pet_version, get_pet_version
+from .listing import partition_counts
+
+# Кэш целых страниц для анонимных посетителей: список питомцев, страница питомца и страница отзыва.
+# Ключ включает язык (префикс i18n_patterns уже выбран LocaleMiddleware) и параметры запроса,
+# отсортированные и без пустых значений. Попадание отдаёт сохранённые байты до обращения к ORM
+# и шаблонам. Запрос с cookie сессии или сообщений идёт мимо кэша: такой посетитель может быть
+# вошедшим, а его страница — содержать сообщения.
+PAGE_KEY = 'blog:page:{}:{}:{}:v{}'
+# Версия списков и страниц отзывов; сдвигается сигналами Pet, Pedigree и Review (blog.signals)
+# и пакетными операциями. Страница питомца использует версию питомца из blog.cache.
+PAGES_VERSION_KEY = 'blog:pages-version'
+# Число активных и неактивных питомцев для фильтра списка (по тексту SQL) под той же версией.
+# Агрегат по всей таблице — самое дорогое в списке; get_or_set двухуровневого кэша
+# (config.tiered_cache) пересчитывает его одним запросом, пока остальные читают прежнее значение.
+COUNTS_KEY = 'blog:partition-counts:{}:v{}'
+
+
+def get_pages_version():
+    version = cache.get(PAGES_VERSION_KEY)
+    if version is None:
+        cache.add(PAGES_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(PAGES_VERSION_KEY)
+    return version
+
+
+async def aget_pages_version():
+    version = await cache.aget(PAGES_VERSION_KEY)
+    if version is None:
+        await cache.aadd(PAGES_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(PAGES_VERSION_KEY)
+    return version
+
+
+def invalidate_pages():
+    cache.set(PAGES_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_partition_counts(queryset):
+    if settings.PARTITION_COUNTS_CACHE_TIMEOUT <= 0:
+        return partition_counts(queryset)
+    key = COUNTS_KEY.format(hashlib.md5(str(queryset.query).encode()).hexdigest(), get_pages_version())
+    return cache.get_or_set(key, lambda: partition_counts(queryset), timeout=settings.PARTITION_COUNTS_CACHE_TIMEOUT)
+
+
+async def aget_partition_counts(queryset):
+    # Пересчёт идёт через синхронный ORM, поэтому целиком в потоке
+    return await sync_to_async(get_partition_counts)(queryset)
+
+
+def normalize_query(params):
+    """Параметры запроса в каноническом виде: ключи и значения отсортированы, пустые отброшены."""
+    return '&'.join(f'{key}={value}' for key in sorted(params) for value in sorted(params.getlist(key)) if value)
+
+
+def is_cacheable(request):
+    return (
+        settings.ANONYMOUS_PAGE_CACHE_TIMEOUT > 0
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def _key(request, name, version):
+    query = hashlib.md5(normalize_query(request.GET).encode()).hexdigest()
+    return PAGE_KEY.format(name, get_language(), query, version)
+
+
+def _from_cache(request, entry):
+    status, content, headers = entry
+    # Повторный запрос с тем же ETag получает 304, как и без кэша
+    not_modified = get_conditional_response(request, etag=headers.get('ETag'))
+    response = not_modified if not_modified is not None else HttpResponse(content, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    # Без обращения к сессии SessionMiddleware не добавит Vary: Cookie, а общий кэш (CDN)
+    # не должен отдавать анонимную страницу вошедшему пользователю
+    patch_vary_headers(response, ['Cookie'])
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _entry(response):
+    # Ответ, ставящий cookie, личный; 304 и ошибки не кэшируются
+    if response.status_code != 200 or response.cookies or response.streaming:
+        return None
+    return response.status_code, response.content, dict(response.items())
+
+
+class AnonymousPageCacheMixin:
+    """
+    Кэш страницы представления для анонимных посетителей. page_cache_version() возвращает
+    версию данных страницы; по умолчанию — общая версия списков (invalidate_pages).
+    """
+
+    def page_cache_version(self):
+        return get_pages_version()
+
+    async def apage_cache_version(self):
+        return await aget_pages_version()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        key = _key(request, type(self).__name__, self.page_cache_version())
+        entry = cache.get(key)
+        if entry is not None:
+            return _from_cache(request, entry)
+        return self._store(key, super().dispatch(request, *args, **kwargs))
+
+    async def _adispatch(self, request, *args, **kwargs):
+        key = _key(request, type(self).__name__, await self.apage_cache_version())
+        entry = await cache.aget(key)
+        if entry is not None:
+            return _from_cache(request, entry)
+        return self._store(key, await super().dispatch(request, *args, **kwargs))
+
+    def _store(self, key, response):
+        def store(response):
+            entry = _entry(response)
+            if entry is not None:
+                cache.set(key, entry, timeout=settings.ANONYMOUS_PAGE_CACHE_TIMEOUT)
+
+        # TemplateResponse рендерится обработчиком Django после выхода из представления
+        if getattr(response, 'is_rendered', True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        return response
+
+
+class PetPageCacheMixin(AnonymousPageCacheMixin):
+    """Страница питомца: версия та же, что у данных страницы (blog.cache.invalidate_pet)."""
+
+    def page_cache_version(self):
+        return get_pet_version(self.kwargs['pk'])
+
+    async def apage_cache_version(self):
+        return await aget_pet_version(self.kwargs['pk'])
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .cache import invalidate_pet
+from .models import Pet, Review, empty_rating_histogram
+from .page_cache import invalidate_pages
+
+
+def _aggregates(review_count, rating_sum, histogram):
+    return {
+        'review_count': review_count,
+        'rating_sum': rating_sum,
+        'rating_avg': rating_sum / review_count if review_count else 0,
+        'rating_histogram': histogram,
+    }
+
+
+def apply_review_change(pet_id, added=None, removed=None):
+    """
+    Учитывает добавленную и/или удалённую оценку в агрегатах питомца.
+    Строка питомца блокируется, поэтому параллельные отзывы не теряют обновления.
+    """
+    with transaction.atomic():
+        pet = Pet.objects.select_for_update().filter(pk=pet_id).only(
+            'review_count', 'rating_sum', 'rating_histogram').first()
+        if pet is None:
+            # Питомец удаляется вместе с отзывами
+            return
+        review_count, rating_sum = pet.review_count, pet.rating_sum
+        histogram = list(pet.rating_histogram or empty_rating_histogram())
+        if removed is not None:
+            review_count -= 1
+            rating_sum -= removed
+            histogram[removed - 1] -= 1
+        if added is not None:
+            review_count += 1
+            rating_sum += added
+            histogram[added - 1] += 1
+        # update() не меняет updated_at: добавление отзыва не редактирует самого питомца
+        Pet.objects.filter(pk=pet_id).update(**_aggregates(review_count, rating_sum, histogram))
+
+
+def recompute_ratings(pet_ids):
+    """
+    Пересчитывает агрегаты указанных питомцев по таблице отзывов. Строки питомцев
+    блокируются в порядке pk, как в apply_review_change: параллельный отзыв ждёт пересчёта,
+    а не теряется при bulk_update. Кэш питомцев и страниц сбрасывается после коммита.
+    """
+    with transaction.atomic():
+        locked = list(Pet.objects.select_for_update().filter(pk__in=pet_ids).order_by('pk').values_list(
+            'pk', flat=True))
+        histograms = {pet_id: empty_rating_histogram() for pet_id in locked}
+        rows = Review.objects.filter(pet_id__in=locked).order_by().values('pet_id', 'rating').annotate(
+            total=Count('id'))
+        for row in rows:
+            histograms[row['pet_id']][row['rating'] - 1] = row['total']
+
+        pets = []
+        for pet_id, histogram in histograms.items():
+            review_count = sum(histogram)
+            rating_sum = sum(count * rating for rating, count in enumerate(histogram, start=1))
+            pets.append(Pet(pk=pet_id, **_aggregates(review_count, rating_sum, histogram)))
+        Pet.objects.bulk_update(pets, ['review_count', 'rating_sum', 'rating_avg', 'rating_histogram'])
+        if locked:
+            transaction.on_commit(lambda: (invalidate_pet(*locked), invalidate_pages()))
+    return len(pets)
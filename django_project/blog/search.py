@@ -0,0 +1,85 @@
+import re
+
+from django.db import connection
+
+from .models import Pet, PetSearchDocument
+
+# Полнотекстовый поиск по питомцам, родословным и отзывам. Для каждого питомца хранится
+# денормализованный документ (PetSearchDocument): title — кличка, body — всё остальное.
+# На PostgreSQL по документу строится tsvector с GIN-индексом, на SQLite — таблица FTS5
+# (см. миграцию 0004_petsearchdocument).
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'blog_petsearch_fts'
+DEFAULT_LIMIT = 50
+
+
+def build_document(pet):
+    """Документ для питомца. Родословные и отзывы лучше заранее загрузить через prefetch_related."""
+    parts = [pet.get_species_display(), pet.description]
+    for pedigree in pet.pedigrees.all():
+        parts.extend([pedigree.parent_name, pedigree.breed, pedigree.description])
+    for review in pet.reviews.all():
+        parts.append(review.text)
+    return PetSearchDocument(pet_id=pet.pk, title=pet.name, body='\n'.join(part for part in parts if part))
+
+
+def update_documents(pet_ids):
+    """Пересобирает документы указанных питомцев одним пакетом; удалённые питомцы пропускаются."""
+    pets = Pet.objects.filter(pk__in=pet_ids).only('id', 'name', 'species', 'description').prefetch_related(
+        'pedigrees', 'reviews')
+    documents = [build_document(pet) for pet in pets]
+    PetSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['pet'],
+        update_fields=['title', 'body', 'updated_at'],
+    )
+    return len(documents)
+
+
+def _fts5_query(query):
+    # Каждое слово ищется как префикс; кавычки защищают от синтаксиса FTS5
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_pet_ids(query, active_only=True, limit=DEFAULT_LIMIT):
+    """Возвращает id питомцев, отсортированные по релевантности."""
+    if not query or not query.strip():
+        return []
+    active_clause = 'AND p.is_active' if active_only else ''
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT d.pet_id
+            FROM blog_petsearchdocument d
+            JOIN blog_pet p ON p.id = d.pet_id
+            CROSS JOIN websearch_to_tsquery(%s, %s) q
+            WHERE d.search_vector @@ q {active_clause}
+            ORDER BY ts_rank(d.search_vector, q) DESC, d.pet_id DESC
+            LIMIT %s
+        """
+        params = [SEARCH_CONFIG, query, limit]
+    else:
+        match = _fts5_query(query)
+        if not match:
+            return []
+        # bm25 возвращает тем меньшее значение, чем документ релевантнее; кличка весит больше
+        sql = f"""
+            SELECT f.rowid
+            FROM {FTS_TABLE} f
+            JOIN blog_pet p ON p.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s {active_clause}
+            ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), f.rowid DESC
+            LIMIT %s
+        """
+        params = [match, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_pets(query, active_only=True, limit=DEFAULT_LIMIT):
+    """Питомцы, найденные по запросу, в порядке релевантности."""
+    pet_ids = search_pet_ids(query, active_only=active_only, limit=limit)
+    pets = Pet.objects.only('id', 'name', 'species', 'age', 'is_active').in_bulk(pet_ids)
+    return [pets[pk] for pk in pet_ids if pk in pets]
@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from users.models import User
+
+from .cache import invalidate_pet
+from .models import Pedigree, Pet, Review
+from .page_cache import invalidate_pages
+from .ratings import apply_review_change, recompute_ratings
+from .search import update_documents
+
+
+def on_commit_once(name, pet_ids, callback):
+    """
+    Копит id питомцев до конца транзакции и вызывает callback(ids) один раз после коммита:
+    каскадное или пакетное изменение строк не ставит отдельный обработчик на каждую строку.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        callback(set(pet_ids))
+        return
+    pending = connection.__dict__.setdefault('blog_pending_pet_ids', {})
+    entry = pending.get(name)
+    # Обработчик из откаченной транзакции или точки сохранения удаляется из run_on_commit
+    if entry is None or not any(func is entry[1] for _, func, _ in connection.run_on_commit):
+        ids = set()
+
+        def flush():
+            if pending.get(name, (None,))[0] is ids:
+                del pending[name]
+            callback(ids)
+
+        entry = pending[name] = (ids, flush)
+        transaction.on_commit(flush)
+    entry[0].update(pet_ids)
+
+
+def deleted_with_pet(instance, origin):
+    """Строка удаляется каскадом вместе со своим питомцем (см. remember_deleted_pet)."""
+    return instance.pet_id in getattr(origin, 'deleted_pet_ids', ())
+
+
+@receiver(pre_delete, sender=Pet)
+def remember_deleted_pet(sender, instance, origin=None, **kwargs):
+    # Django удаляет отзывы и родословные раньше питомца, но pre_delete всех строк приходит до
+    # первого DELETE: id удаляемых питомцев запоминаются на объекте, с которого начато удаление
+    if origin is not None:
+        if not hasattr(origin, 'deleted_pet_ids'):
+            origin.deleted_pet_ids = set()
+        origin.deleted_pet_ids.add(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Pet)
+def pet_changed(sender, instance, **kwargs):
+    invalidate_pet(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Pedigree)
+@receiver([post_save, post_delete], sender=Review)
+def pet_related_changed(sender, instance, **kwargs):
+    invalidate_pet(instance.pet_id)
+
+
+@receiver([post_save, post_delete], sender=Pet)
+@receiver([post_save, post_delete], sender=Pedigree)
+@receiver([post_save, post_delete], sender=Review)
+def pages_changed(sender, instance, **kwargs):
+    # Закэшированные для анонимов списки и страницы отзывов (blog.page_cache)
+    invalidate_pages()
+
+
+def invalidate_user_pets(user):
+    pet_ids = Pet.objects.filter(
+        Q(owner=user) | Q(moderated_by=user) | Q(reviews__author=user)
+    ).values_list('pk', flat=True).distinct()
+    invalidate_pet(*pet_ids)
+    invalidate_pages()
+
+
+@receiver(pre_save, sender=User)
+def remember_user_email(sender, instance, update_fields=None, using=None, **kwargs):
+    # На страницах питомцев показывается только email; вход (last_login), смена пароля
+    # и профиля без смены email кэш не трогают
+    instance._previous_email = None
+    if instance.pk and (update_fields is None or 'email' in update_fields):
+        instance._previous_email = sender._default_manager.using(using).filter(pk=instance.pk).values_list(
+            'email', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # У нового пользователя ещё нет ни питомцев, ни отзывов
+    previous = None if created else getattr(instance, '_previous_email', None)
+    if previous is not None and previous != instance.email:
+        invalidate_user_pets(instance)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_pets(instance)
+
+
+@receiver(post_save, sender=Pet)
+@receiver([post_save, post_delete], sender=Pedigree)
+@receiver([post_save, post_delete], sender=Review)
+def update_search_document(sender, instance, origin=None, **kwargs):
+    # Документ удалённого питомца удаляется каскадно, остальные пересобираются одним пакетом после коммита
+    if sender is not Pet and deleted_with_pet(instance, origin):
+        return
+    on_commit_once('search', [instance.pk if sender is Pet else instance.pet_id], update_documents)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Review.objects.filter(pk=instance.pk).values_list('pet_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_previous', None)
+    if previous is None:
+        if created:
+            apply_review_change(instance.pet_id, added=instance.rating)
+        return
+    previous_pet_id, previous_rating = previous
+    if previous_pet_id != instance.pet_id:
+        apply_review_change(previous_pet_id, removed=previous_rating)
+        apply_review_change(instance.pet_id, added=instance.rating)
+    elif previous_rating != instance.rating:
+        apply_review_change(instance.pet_id, added=instance.rating, removed=previous_rating)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    if origin is instance:
+        apply_review_change(instance.pet_id, removed=instance.rating)
+    elif not deleted_with_pet(instance, origin):
+        # Каскад от пользователя или удаление набора отзывов: агрегаты каждого питомца
+        # пересчитываются один раз после коммита, а не по строке на отзыв
+        on_commit_once('ratings', [instance.pet_id], recompute_ratings)
@@ -0,0 +1,53 @@
+from django import template
+from django.utils.http import urlencode
+
+register = template.Library()
+
+# Ссылок по обе стороны от текущей страницы; первая и последняя выводятся всегда
+WINDOW = 2
+
+
+def page_window(number, num_pages, window=WINDOW):
+    """Номера страниц окна вокруг number; None — пропуск («…») между ними."""
+    numbers = sorted({1, num_pages, *range(max(1, number - window), min(num_pages, number + window) + 1)})
+    pages = []
+    for previous, current in zip([0, *numbers], numbers):
+        if current - previous > 1:
+            pages.append(None)
+        pages.append(current)
+    return pages
+
+
+@register.inclusion_tag('blog/pagination.html', takes_context=True)
+def paginate(context, page, page_param='page', cursor_param=None, label='Page navigation', window=WINDOW):
+    """
+    Навигация по страницам page: {% paginate active_pets 'page_active' 'cursor_active' %}.
+    Остальные параметры запроса (фильтры, сортировка, номер страницы другого раздела) кодируются
+    один раз и дописываются к каждой ссылке; размер разметки не зависит от числа страниц.
+    """
+    params = context['request'].GET.copy()
+    for name in (page_param, cursor_param):
+        params.pop(name, None)
+    preserved = f'&{params.urlencode()}' if params else ''
+
+    def href(number, cursor=''):
+        query = {page_param: number}
+        if cursor and cursor_param:
+            query[cursor_param] = cursor
+        return f'?{urlencode(query)}{preserved}'
+
+    # Курсоры есть только у страниц KeysetPaginator (blog.listing)
+    previous_href = next_href = None
+    if page.has_previous():
+        previous_href = href(page.previous_page_number(), getattr(page, 'previous_cursor', ''))
+    if page.has_next():
+        next_href = href(page.next_page_number(), getattr(page, 'next_cursor', ''))
+    cursor_for = getattr(page, 'cursor_for', lambda number: '')
+    links = [
+        (number, href(number, cursor_for(number)) if number is not None else None)
+        for number in page_window(page.number, page.paginator.num_pages, window)
+    ]
+    return {
+        'label': label, 'number': page.number, 'links': links,
+        'previous_href': previous_href, 'next_href': next_href,
+    }
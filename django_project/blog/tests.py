@@ -1,3 +1,1360 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from contextlib import contextmanager
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.models import Session
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, router, transaction
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from blog import async_views, views
+from blog import cache as blog_cache
+from blog import urls as blog_urls
+from blog import warmup
+from blog import counters
+from blog import page_cache
+from blog.counters import pending_views
+from blog.listing import ORDERING, InvalidCursor, KeysetPaginator, cursor_page, encode_cursor
+from blog.page_cache import get_partition_counts, invalidate_pages
+from blog.ratings import recompute_ratings
+from blog.search import search_pet_ids, update_documents
+from blog.templatetags.pagination_tags import page_window
+from blog.transfer import Importer
+from blog.models import ModerationLog, Pedigree, Pet, PetSearchDocument, Review
+from blog.moderation import moderate_pets
+from config import db_router
+from config.tiered_cache import Stamped, TieredCache, request_stats
+from users import urls as users_urls
+from users.auth import CachedUserBackend
+from users.models import OutgoingEmail, User
+
+# Размеры набора данных, на которых сравнивается число запросов. Прогон на 100 000 строк
+# занимает больше минуты, поэтому включается отдельно: QUERY_BUDGET_LARGE=True
+QUERY_BUDGET_SIZES = [int(n) for n in os.getenv('QUERY_BUDGET_SIZES', '10,1000').split(',')]
+if os.getenv('QUERY_BUDGET_LARGE') == 'True':
+    QUERY_BUDGET_SIZES.append(100000)
+# Сколько отзывов получает питомец, чья страница проверяется
+DETAIL_REVIEWS = 50
+
+
+class QueryBudgetSeeder:
+    """Дозаполняет таблицы до нужного числа строк через bulk_create."""
+
+    def __init__(self):
+        self.admin = User.objects.create_user('admin@example.com', 'secret12345', role='admin',
+                                              is_staff=True, is_superuser=True)
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.admin)
+
+    def seed(self, rows):
+        users = User.objects.count()
+        User.objects.bulk_create(
+            [User(email=f'user{i}@example.com', password='!') for i in range(users, rows)],
+            batch_size=5000,
+        )
+        owners = list(User.objects.values_list('pk', flat=True)[:rows])
+
+        pets = Pet.objects.count()
+        Pet.objects.bulk_create(
+            [Pet(name=f'Питомец {i}', species=Pet.SPECIES_CHOICES[i % 5][0], age=i % 15 + 1,
+                 description='Описание', owner_id=owners[i % len(owners)], is_active=i % 4 != 0)
+             for i in range(pets, rows)],
+            batch_size=5000,
+        )
+
+        pedigrees = Pedigree.objects.count()
+        pet_ids = list(Pet.objects.values_list('pk', flat=True)[:rows])
+        Pedigree.objects.bulk_create(
+            [Pedigree(pet_id=self.pet.pk if i < 2 else pet_ids[i % len(pet_ids)],
+                      parent_type='mother' if i % 2 else 'father', parent_name=f'Родитель {i}')
+             for i in range(pedigrees, rows)],
+            batch_size=5000,
+        )
+
+        reviews = Review.objects.count()
+        Review.objects.bulk_create(
+            [Review(pet_id=self.pet.pk if i < DETAIL_REVIEWS else pet_ids[i % len(pet_ids)],
+                    author_id=owners[i % len(owners)], text='Отзыв', rating=i % 5 + 1, slug=f'r{i}')
+             for i in range(reviews, rows)],
+            batch_size=5000,
+        )
+        # bulk_create не отправляет сигналы, поэтому кэш страниц сбрасываем вручную
+        cache.clear()
+
+    def url_kwargs(self, app_name):
+        user = self.admin
+        return {
+            'pk': self.pet.pk if app_name == 'blog' else user.pk,
+            'pet_pk': self.pet.pk,
+            'slug': Review.objects.filter(pet=self.pet).values_list('slug', flat=True).first(),
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class QueryBudgetTests(TestCase):
+    """
+    Открывает каждый адрес blog.urls и users.urls на наборах данных разного размера
+    и проверяет, что число SQL-запросов не растёт вместе с числом строк.
+    """
+
+    def measure(self, seeder, module):
+        counts = {}
+        for pattern in module.urlpatterns:
+            # Вход обновляет last_login, от которого зависит токен сброса пароля: токен строится после входа
+            self.client.force_login(seeder.admin)
+            kwargs = seeder.url_kwargs(module.app_name)
+            url = reverse(f'{module.app_name}:{pattern.name}',
+                          kwargs={name: kwargs[name] for name in pattern.pattern.converters})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertLess(response.status_code, 400, url)
+            counts[f'{module.app_name}:{pattern.name}'] = len(queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        seeder = QueryBudgetSeeder()
+        measured = []
+        for rows in QUERY_BUDGET_SIZES:
+            seeder.seed(rows)
+            counts = {}
+            for module in (blog_urls, users_urls):
+                counts.update(self.measure(seeder, module))
+            measured.append((rows, counts))
+
+        baseline_rows, baseline = measured[0]
+        for rows, counts in measured[1:]:
+            for name, count in counts.items():
+                self.assertEqual(
+                    count, baseline[name],
+                    f'{name}: {baseline[name]} queries at {baseline_rows} rows, {count} at {rows} rows',
+                )
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class PetFormTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin@example.com', 'secret12345', role='admin',
+                                              is_staff=True, is_superuser=True)
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+        self.url = reverse('blog:pet_update', kwargs={'pk': self.pet.pk})
+        self.client.force_login(self.admin)
+
+    def post(self, owner):
+        return self.client.post(self.url, {
+            'name': 'Рекс', 'species': 'dog', 'age': 3, 'description': 'Пёс', 'is_active': 'on', 'owner': owner,
+            'view_count': 0, 'pedigrees-TOTAL_FORMS': 0, 'pedigrees-INITIAL_FORMS': 0,
+        })
+
+    def test_owner_field_does_not_load_all_users(self):
+        User.objects.bulk_create([User(email=f'user{i}@example.com', password='!') for i in range(500)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'value="owner@example.com"')
+        self.assertNotContains(response, 'user1@example.com')
+        # Пользователи читаются только поштучно по ключу, а не всей таблицей
+        user_queries = [q['sql'] for q in queries if 'FROM "users_user"' in q['sql']]
+        self.assertTrue(user_queries)
+        for sql in user_queries:
+            self.assertIn('"users_user"."id" =', sql)
+
+    def test_owner_is_chosen_by_email(self):
+        other = User.objects.create_user('other@example.com', 'secret12345')
+        self.assertEqual(self.post('nobody@example.com').status_code, 200)
+        self.assertRedirects(self.post('other@example.com'), reverse('blog:pet_list'), fetch_redirect_response=False)
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.owner, other)
+
+# Без сброса буфера просмотров в базу посреди теста
+@override_settings(LANGUAGE_CODE='ru', VIEW_COUNT_FLUSH_INTERVAL=3600)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.viewer = User.objects.create_user('viewer@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+        self.url = reverse('blog:pet_detail', kwargs={'pk': self.pet.pk})
+        self.client.force_login(self.viewer)
+
+    def test_not_modified_skips_rendering_and_counts_view(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Сессия и пользователь (users.auth) и валидаторы берутся из кэша
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(pending_views(self.pet.pk), 2)
+
+    def test_new_review_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Review.objects.create(pet=self.pet, author=self.viewer, text='Отличный пёс', rating=5)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отличный пёс')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_viewer(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(LANGUAGE_CODE='ru', VIEW_COUNT_FLUSH_INTERVAL=3600)
+class AsyncViewParityTests(TestCase):
+    """Асинхронные представления (blog.async_views) отдают то же, что синхронные."""
+
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.admin = User.objects.create_user('admin@example.com', 'secret12345', role='admin')
+        self.pets = Pet.objects.bulk_create([
+            Pet(name=f'Питомец {i}', species='dog' if i % 2 else 'cat', age=i % 10, description='Описание',
+                owner=owner, is_active=i % 3 != 0)
+            for i in range(30)
+        ])
+        Pedigree.objects.create(pet=self.pets[1], parent_type='mother', parent_name='Мать')
+        self.review = Review.objects.create(pet=self.pets[1], author=self.admin, text='Хороший', rating=4)
+        self.client.force_login(self.admin)
+
+    def render(self, view, url, **kwargs):
+        # Просмотр, записанный предыдущим рендерингом, не должен увеличить счётчик на странице
+        cache.clear()
+        request = RequestFactory().get(url)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        handler = SessionMiddleware(AuthenticationMiddleware(MessageMiddleware(
+            lambda request: view(request, **kwargs))))
+        response = handler(request)
+        if hasattr(response, 'render'):
+            response.render()
+        # csrf-токен маскируется заново при каждом рендеринге
+        return response.status_code, re.sub(rb'value="[A-Za-z0-9]{64}"', b'', response.content)
+
+    def assertSameResponse(self, name, url, **kwargs):
+        sync_view = getattr(views, name).as_view()
+        async_view = async_to_sync(getattr(async_views, name).as_view())
+        self.assertEqual(self.render(sync_view, url, **kwargs), self.render(async_view, url, **kwargs), url)
+
+    def test_pet_list(self):
+        self.assertSameResponse('PetListView', '/')
+        self.assertSameResponse('PetListView', '/?species=dog&page_active=2&page_inactive=2')
+        self.assertSameResponse('PetListView', '/?sort=rating&page_active=1000')
+
+    def test_detail_pages(self):
+        self.assertSameResponse('PetDetailView', '/', pk=self.pets[1].pk)
+        self.assertSameResponse('ReviewDetailView', '/', slug=self.review.slug)
+        # Без обработчика исключений Django Http404 доходит до теста
+        with self.assertRaises(Http404):
+            self.render(async_to_sync(async_views.PetDetailView.as_view()), '/', pk=0)
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class ReplicaRouterTests(TestCase):
+    """Выбор базы роутером; сами реплики здесь не нужны, запросы к ним не выполняются."""
+
+    @contextmanager
+    def routing(self, pinned=False, replica_reads=True, wrote=False):
+        state = db_router.RoutingState(pinned)
+        state.replica_reads = replica_reads
+        state.wrote = wrote
+        token = db_router._state.set(state)
+        try:
+            with self.settings(DATABASE_REPLICAS=['replica1']):
+                yield state
+        finally:
+            db_router._state.reset(token)
+
+    def route(self, model, **state):
+        with self.routing(**state):
+            return db_router.ReplicaRouter().db_for_read(model)
+
+    def test_reads_of_list_and_detail_views_go_to_replica(self):
+        self.assertEqual(self.route(Pet), 'replica1')
+        self.assertEqual(self.route(User), 'replica1')
+        # Сессии и всё вне REPLICA_APPS — только default
+        self.assertIsNone(self.route(Session))
+        self.assertIsNone(self.route(Pet, replica_reads=False))
+        # Вне запроса (команды, тесты) роутер не вмешивается
+        with self.settings(DATABASE_REPLICAS=['replica1']):
+            self.assertIsNone(db_router.ReplicaRouter().db_for_read(Pet))
+
+    def test_writes_pin_reads_to_default(self):
+        self.assertIsNone(self.route(Pet, pinned=True))
+        self.assertIsNone(self.route(Pet, wrote=True))
+
+    def test_writes_go_to_default(self):
+        with self.routing() as state:
+            # Объект, прочитанный с реплики, сохраняется в основную базу
+            pet = Pet(pk=1)
+            pet._state.db = 'replica1'
+            self.assertEqual(router.db_for_write(Pet, instance=pet), 'default')
+            self.assertTrue(state.wrote)
+            self.assertIsNone(db_router.ReplicaRouter().db_for_write(Session))
+        self.assertEqual(db_router.ReplicaRouter().db_for_write(Pet), 'default')
+
+    def test_locking_and_transaction_reads_go_to_default(self):
+        with self.routing():
+            with transaction.atomic():
+                self.assertEqual(Pet.objects.all().db, 'default')
+                self.assertEqual(User.objects.filter(pk=1).db, 'default')
+            self.assertEqual(Pet.objects.all().db, 'replica1')
+            # Блокировка — это запись: и она, и дальнейшее чтение в запросе идут на default
+            self.assertEqual(Pet.objects.select_for_update().db, 'default')
+            self.assertEqual(Pet.objects.all().db, 'default')
+
+    def test_pin_cookie_set_after_write(self):
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner)
+        self.client.force_login(User.objects.create_user('viewer@example.com', 'secret12345'))
+        response = self.client.get(reverse('blog:pet_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+        response = self.client.post(reverse('blog:review_create', kwargs={'pet_pk': pet.pk}),
+                                    {'text': 'Отличный пёс', 'rating': 5})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[db_router.PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+
+class PaginationTagTests(TestCase):
+    def render(self, pages, number, query):
+        request = RequestFactory().get('/', query)
+        page = Paginator(range(pages * 10), 10).page(number)
+        template = Template("{% load pagination_tags %}{% paginate page 'page_active' 'cursor_active' %}")
+        return template.render(Context({'page': page, 'request': request}))
+
+    def test_window(self):
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(50, 100), [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(page_window(4, 100), [1, 2, 3, 4, 5, 6, None, 100])
+
+    def test_links_keep_filters_once_encoded(self):
+        html = self.render(10000, 5000, {'name': 'Рекс & Ко', 'page_active': '5000', 'cursor_active': 'abc',
+                                         'page_inactive': '2'})
+        self.assertEqual(html.count('class="page-link"'), 11)
+        self.assertIn('href="?page_active=5001&amp;name=%D0%A0%D0%B5%D0%BA%D1%81+%26+%D0%9A%D0%BE&amp;'
+                      'page_inactive=2"', html)
+        self.assertNotIn('cursor_active', html)
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class PetRowCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        Pet.objects.bulk_create([
+            Pet(name=f'Питомец {i}', species='dog', age=i + 1, description='Описание', owner=self.owner)
+            for i in range(3)
+        ])
+
+    def rendered(self, moderate=False):
+        pets = list(Pet.objects.only(*views.PetListView.list_fields).order_by('pk'))
+        with mock.patch('blog.cache.render_rows', wraps=blog_cache.render_rows) as render_rows:
+            rows = blog_cache.get_pet_rows(pets, moderate)
+        self.assertEqual(set(rows), {pet.pk for pet in pets})
+        return sum(len(call.args[0]) for call in render_rows.call_args_list)
+
+    def test_rows_rendered_once_until_changed(self):
+        self.assertEqual(self.rendered(), 3)
+        self.assertEqual(self.rendered(), 0)
+        # Флажок модерации — другой вариант строки
+        self.assertEqual(self.rendered(moderate=True), 3)
+
+        pet = Pet.objects.order_by('pk').first()
+        pet.name = 'Рекс'
+        pet.save()
+        self.assertEqual(self.rendered(), 1)
+        # Оценки меняются через update() без updated_at, но входят в ключ
+        Review.objects.create(pet=pet, author=self.owner, text='Отзыв', rating=5)
+        self.assertEqual(self.rendered(), 1)
+
+    @override_settings(ANONYMOUS_PAGE_CACHE_TIMEOUT=0)
+    def test_list_page_reads_rows_in_one_round_trip(self):
+        url = reverse('blog:pet_list')
+        self.client.get(url)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many, \
+                mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many:
+            response = self.client.get(url)
+        self.assertContains(response, 'Питомец 2')
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(set_many.call_count, 0)
+
+
+@override_settings(LANGUAGE_CODE='ru', ANONYMOUS_PAGE_CACHE_TIMEOUT=60, VIEW_COUNT_FLUSH_INTERVAL=3600)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_hit_skips_orm_and_templates(self):
+        url = reverse('blog:pet_list')
+        self.get(f'{url}?species=dog&age_min=2')
+        # Порядок параметров и пустые значения на ключ не влияют
+        response, queries = self.get(f'{url}?age_min=2&name=&species=dog')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(queries, 0)
+        self.assertIn('Cookie', response['Vary'])
+        self.assertContains(response, 'Рекс')
+
+        detail = reverse('blog:pet_detail', kwargs={'pk': self.pet.pk})
+        self.get(detail)
+        self.assertEqual(self.get(detail), (mock.ANY, 0))
+
+    def test_language_and_login_bypass(self):
+        with translation.override('en'):
+            english = reverse('blog:pet_list')
+        self.get(reverse('blog:pet_list'))
+        response, _ = self.get(english)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertEqual(response['Content-Language'], 'en')
+
+        self.client.force_login(self.owner)
+        response, _ = self.get(reverse('blog:pet_list'))
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_model_signals_invalidate(self):
+        url = reverse('blog:pet_list')
+        self.get(url)
+        Review.objects.create(pet=self.pet, author=self.owner, text='Отличный пёс', rating=5)
+        response, _ = self.get(url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, '★ 5')
+
+        detail = reverse('blog:pet_detail', kwargs={'pk': self.pet.pk})
+        self.get(detail)
+        Pedigree.objects.create(pet=self.pet, parent_type='mother', parent_name='Мать')
+        self.assertContains(self.get(detail)[0], 'Мать')
+
+    def test_only_email_change_invalidates_user_pages(self):
+        version = page_cache.get_pages_version()
+        response = self.client.post(reverse('users:register'), {
+            'email': 'new@example.com', 'password1': 'Secret-12345', 'password2': 'Secret-12345'})
+        self.assertEqual(response.status_code, 302)
+        self.owner.first_name = 'Анна'
+        self.owner.set_password('another12345')
+        self.owner.save()
+        self.assertEqual(page_cache.get_pages_version(), version)
+
+        pet_version = blog_cache.get_pet_version(self.pet.pk)
+        self.owner.email = 'renamed@example.com'
+        self.owner.save()
+        self.assertNotEqual(page_cache.get_pages_version(), version)
+        self.assertNotEqual(blog_cache.get_pet_version(self.pet.pk), pet_version)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TieredCacheTests(TestCase):
+    # L2 — locmem вместо Redis
+    def setUp(self):
+        cache.clear()
+        self.tiered = TieredCache('default', {'OPTIONS': {
+            'L1_MAX_ENTRIES': 2, 'L1_TIMEOUT': 60, 'L1_EXCLUDE': ['blog:views:'], 'LOCK_TIMEOUT': 1}})
+
+    def test_l1_lru_and_stats(self):
+        cache.set('a', [1])
+        self.assertEqual(self.tiered.get('a'), [1])
+        self.tiered.get('a').append(2)  # L1 отдаёт копию
+        self.assertEqual(self.tiered.get('a'), [1])
+        self.tiered.set_many({'b': 2, 'c': 3})
+        self.assertIsNone(self.tiered.get('missing'))
+        self.assertEqual(self.tiered.get_many(['a', 'b', 'c']), {'a': [1], 'b': 2, 'c': 3})
+        stats = self.tiered.stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (4, 2, 1))
+        self.assertEqual((stats['l1_evictions'], stats['l1_entries']), (2, 2))
+
+        # Запись и удаление идут в L2 и сразу видны в этом процессе
+        self.tiered.delete('b')
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(self.tiered.get('b'))
+        cache.set('blog:views:pending:1', 5)
+        self.tiered.get('blog:views:pending:1')
+        self.assertEqual(self.tiered.incr('blog:views:pending:1'), 6)
+        cache.set('blog:views:pending:1', 7)  # ключи L1_EXCLUDE всегда читаются из L2
+        self.assertEqual(self.tiered.get('blog:views:pending:1'), 7)
+
+    def test_l1_byte_limit(self):
+        tiered = TieredCache('default', {'OPTIONS': {'L1_MAX_ENTRIES': 100, 'L1_MAX_BYTES': 300, 'L1_TIMEOUT': 60}})
+        for key in 'abc':
+            tiered.set(key, 'x' * 100)
+        stats = tiered.stats()
+        # Три значения по ~120 байт не помещаются в 300: самое старое вытеснено
+        self.assertEqual((stats['l1_entries'], stats['l1_evictions']), (2, 1))
+        self.assertLessEqual(stats['l1_bytes'], 300)
+        tiered.set('b', 'x' * 500)  # крупнее всего L1: читается только из L2
+        self.assertEqual(tiered.stats()['l1_entries'], 1)
+        self.assertEqual(tiered.get('b'), 'x' * 500)
+        self.assertEqual(tiered.stats()['misses'] + tiered.stats()['l2_hits'], 1)
+        tiered.clear()
+        self.assertEqual(tiered.stats()['l1_bytes'], 0)
+
+    def test_recompute_does_not_block_other_keys(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'slow'
+
+        thread = threading.Thread(target=lambda: self.tiered.get_or_set('slow', slow, 30))
+        thread.start()
+        started.wait(5)
+        try:
+            began = time.monotonic()
+            # Без прежнего значения запрос, попавший на чужую блокировку, ждал бы её до LOCK_TIMEOUT
+            for i in range(100):
+                self.assertEqual(self.tiered.get_or_set(f'fast:{i}', lambda: 'fast', 30), 'fast')
+            self.assertLess(time.monotonic() - began, 0.5)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(self.tiered._recompute_locks, {})
+
+    def test_get_or_set_coalesces_threads(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'active': 3, 'inactive': 1}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.tiered.get_or_set('counts', compute, 30)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'active': 3, 'inactive': 1}] * 4)
+        self.assertEqual(self.tiered.stats()['coalesced'], 3)
+        # Обычный get видит значение без служебной обёртки
+        self.assertEqual(self.tiered.get('counts'), {'active': 3, 'inactive': 1})
+
+    @mock.patch('config.tiered_cache.random.random', return_value=0.5)
+    def test_early_expiration_and_stale_while_locked(self, _):
+        # Значение истекает через секунду и считалось 10 с: XFetch пересчитывает его заранее
+        cache.set('counts', Stamped('old', 10, time.time() + 1))
+        self.assertEqual(self.tiered.get_or_set('counts', lambda: 'new', 30), 'new')
+        self.assertEqual(self.tiered.stats()['early_recomputes'], 1)
+
+        # Пересчёт идёт в другом процессе (блокировка в L2): отдаётся прежнее значение
+        self.tiered.clear()
+        cache.set('counts', Stamped('old', 10, time.time() + 1))
+        cache.add('counts:recompute-lock', 1)
+        self.assertEqual(self.tiered.get_or_set('counts', lambda: 'new', 30), 'old')
+        self.assertEqual(self.tiered.stats()['stale_hits'], 1)
+
+        # Прежнего значения нет: запрос дожидается результата другого процесса
+        self.tiered.delete('counts')
+        with mock.patch('config.tiered_cache.time.sleep',
+                        side_effect=lambda _: cache.set('counts', Stamped('theirs', 0, time.time() + 30))):
+            self.assertEqual(self.tiered.get_or_set('counts', lambda: 'mine', 30), 'theirs')
+
+    def test_request_stats_count_only_the_block(self):
+        cache.set('a', 1)
+        self.tiered.get('a')
+        with request_stats() as counter:
+            self.tiered.get('a')
+            self.tiered.get('missing')
+        self.tiered.get('a')
+        self.assertEqual(counter, {'l1_hits': 1, 'misses': 1})
+        self.assertEqual(self.tiered.stats()['l1_hits'], 2)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'config.tiered_cache.TieredCache', 'LOCATION': 'shared'},
+                'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'}},
+        INSTRUMENTATION_SAMPLE_RATE=1, LANGUAGE_CODE='ru')
+    def test_log_records_cache_operations_of_the_request(self):
+        self.client.get(reverse('blog:pet_list'))
+        with self.assertLogs('performance') as logs:
+            self.client.get(reverse('blog:pet_list'))
+        record = json.loads(logs.records[-1].getMessage())
+        # Только счётчики этого запроса, без накопленной статистики процесса
+        self.assertNotIn('l1_entries', record['cache'])
+        self.assertEqual(set(record['cache']), {'l1_hits'})
+
+    def test_cache_stats_sums_requests_per_worker(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.log', encoding='utf-8', delete=False) as log:
+            for pid, stats in [(1, {'l1_hits': 3, 'misses': 1}), (1, {'l2_hits': 4}), (2, {'misses': 2})]:
+                log.write(f'2026-01-01 00:00:00 INFO {json.dumps({"pid": pid, "cache": stats})}\n')
+        self.addCleanup(os.remove, log.name)
+        stdout = StringIO()
+        call_command('cache_stats', log=log.name, stdout=stdout)
+        rows = {line.split()[0]: line.split()[1:6] for line in stdout.getvalue().splitlines()
+                if line.split() and line.split()[0].isdigit()}
+        # pid: запросы, L1, L2, промахи, доля попаданий
+        self.assertEqual(rows, {'1': ['2', '3', '4', '1', '87.5'], '2': ['1', '0', '0', '2', '0.0']})
+
+    def test_partition_counts_cached_until_pages_change(self):
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner)
+        self.assertEqual(get_partition_counts(Pet.objects.all()), {'active': 1, 'inactive': 0})
+        with self.assertNumQueries(0):
+            get_partition_counts(Pet.objects.all())
+        Pet.objects.update(is_active=False)
+        invalidate_pages()
+        self.assertEqual(get_partition_counts(Pet.objects.all()), {'active': 0, 'inactive': 1})
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1, INSTRUMENTATION_SERVER_TIMING=True, LANGUAGE_CODE='ru',
+                   ANONYMOUS_PAGE_CACHE_TIMEOUT=0)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner)
+
+    def logged_request(self, get):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('performance') as logs:
+            response = get(reverse('blog:pet_list'))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(logs.records[-1].getMessage()), len(queries), response
+
+    def test_sync_request_records_its_queries(self):
+        record, queries, response = self.logged_request(self.client.get)
+        self.assertGreater(queries, 0)
+        self.assertEqual(record['sql_count'], queries)
+        self.assertIn(f'desc="{queries} queries', response['Server-Timing'])
+
+    def test_asgi_request_records_queries_run_in_sync_to_async_threads(self):
+        # Под ASGI middleware выполняется в цикле событий, а ORM — в другом потоке
+        record, queries, response = self.logged_request(async_to_sync(self.async_client.get))
+        self.assertGreater(queries, 0)
+        self.assertEqual(record['sql_count'], queries)
+
+
+class DbConnectionsCommandTests(TestCase):
+    def write_log(self, records):
+        with tempfile.NamedTemporaryFile('w', suffix='.log', encoding='utf-8', delete=False) as log:
+            log.write('2026-01-01 00:00:00 WARNING not a record\n')
+            for record in records:
+                log.write(f'2026-01-01 00:00:00 INFO {json.dumps(record)}\n')
+        self.addCleanup(os.remove, log.name)
+        return log.name
+
+    def db_connections(self, log):
+        stdout = StringIO()
+        call_command('db_connections', log=log, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_reports_connections_per_request_for_each_worker(self):
+        log = self.write_log([
+            {'pid': 11, 'sampled': True, 'new_connections': 1, 'total_ms': 20.0, 'sql_ms': 4.0},
+            {'pid': 11, 'sampled': True, 'new_connections': 1, 'total_ms': 40.0, 'sql_ms': 6.0},
+            {'pid': 22, 'sampled': True, 'new_connections': 1, 'total_ms': 10.0, 'sql_ms': 2.0},
+            {'pid': 22, 'sampled': True, 'new_connections': 0, 'total_ms': 30.0, 'sql_ms': 2.0},
+            # Медленный запрос без сэмплирования: данных о соединениях нет
+            {'pid': 22, 'sampled': False, 'total_ms': 900.0},
+        ])
+        output = self.db_connections(log)
+        self.assertIn(f'CONN_MAX_AGE:       {settings.DATABASES["default"].get("CONN_MAX_AGE", 0)}', output)
+        rows = {line.split()[0]: line.split()[1:] for line in output.splitlines()
+                if line.split() and line.split()[0].isdigit()}
+        # pid: запросы, новые соединения, на запрос, среднее время, среднее время SQL
+        self.assertEqual(rows, {'11': ['2', '2', '1.00', '30.0', '5.0'], '22': ['2', '1', '0.50', '20.0', '2.0']})
+
+    def test_log_without_connection_data(self):
+        log = self.write_log([{'pid': 11, 'sampled': False, 'total_ms': 900.0}])
+        self.assertIn('No sampled requests with connection data in the log yet', self.db_connections(log))
+
+    def test_missing_log(self):
+        with self.assertRaisesMessage(CommandError, 'not found'):
+            self.db_connections(os.path.join(tempfile.gettempdir(), 'missing-performance.log'))
+
+
+class CacheWarmupTests(TransactionTestCase):
+    # Страницы запрашиваются из потоков со своими соединениями: данные должны быть закоммичены
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.popular = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner,
+                                          view_count=50)
+        Pet.objects.create(name='Мурка', species='cat', age=2, description='Кошка', owner=owner, view_count=5)
+        Pet.objects.create(name='Тихий', species='cat', age=2, description='Скрыт', owner=owner, view_count=500,
+                           is_active=False)
+
+    def test_targets_cover_species_languages_and_most_viewed(self):
+        targets = warmup.build_targets(top=1, languages=['ru', 'en'])
+        lists = [target.url for target in targets if target.kind == 'list']
+        self.assertEqual(len(lists), 2 * (len(Pet.SPECIES_CHOICES) + 1))
+        self.assertIn('/en/?species=cat', lists)
+        self.assertEqual([target.url for target in targets if target.kind == 'detail'],
+                         [f'/ru/pet/{self.popular.pk}/', f'/en/pet/{self.popular.pk}/'])
+
+    def test_warmed_pages_are_served_from_cache(self):
+        targets = warmup.build_targets(top=2, languages=['ru'])
+        results = warmup.warm(targets, workers=2, host='testserver')
+        self.assertEqual(sorted(result.status for result in results), [200] * len(targets))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/ru/?species=dog')
+            detail = self.client.get(f'/ru/pet/{self.popular.pk}/')
+        self.assertEqual((response['X-Page-Cache'], detail['X-Page-Cache']), ('hit', 'hit'))
+        self.assertEqual(len(queries), 0)
+        # Повторный прогрев только читает кэш
+        self.assertTrue(all(result.cached for result in warmup.warm(targets, workers=2, host='testserver')))
+
+    def test_dry_run_only_lists_pages(self):
+        stdout = StringIO()
+        with mock.patch('blog.warmup.warm') as warm:
+            call_command('warm_cache', top=1, language=['ru'], dry_run=True, stdout=stdout, stderr=StringIO())
+        warm.assert_not_called()
+        lines = stdout.getvalue().splitlines()
+        self.assertIn(f'detail  /ru/pet/{self.popular.pk}/', lines)
+        self.assertEqual(lines[-1], f'{len(Pet.SPECIES_CHOICES) + 2} pages')
+        self.assertFalse(self.client.get('/ru/').has_header('X-Page-Cache'))
+
+    def test_failed_pages_are_counted_and_reported(self):
+        targets = [warmup.Target('list', 'ru', '/ru/'),
+                   warmup.Target('detail', 'ru', f'/ru/pet/{self.popular.pk}/'),
+                   warmup.Target('detail', 'ru', '/ru/pet/999999/')]
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch('blog.warmup.build_targets', return_value=targets):
+            call_command('warm_cache', workers=1, host='testserver', stdout=stdout, stderr=stderr)
+        rows = {line.split()[0]: line.split()[1:5] for line in stdout.getvalue().splitlines()
+                if line.startswith(('list ', 'detail '))}
+        # kind: pages, warmed, cached, failed
+        self.assertEqual(rows, {'list': ['1', '1', '0', '0'], 'detail': ['2', '1', '0', '1']})
+        self.assertIn('/ru/pet/999999/: 404', stderr.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        Pet.objects.bulk_create([Pet(name=f'Питомец {i}', species='dog', age=1, description='-', owner=owner)
+                                 for i in range(12)])
+        # Одинаковый created_at у всех: порядок и переходы держатся только на id
+        Pet.objects.update(created_at=Pet.objects.order_by('pk').first().created_at)
+        self.ids = list(Pet.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.paginator = KeysetPaginator(Pet.objects.all(), 5, len(self.ids))
+
+    def test_cursors_walk_forward_and_back_across_equal_keys(self):
+        page, seen = self.paginator.get_page(1), []
+        while True:
+            seen.append([pet.pk for pet in page])
+            if not page.has_next():
+                break
+            page = self.paginator.get_page(page.next_page_number(), page.next_cursor)
+        self.assertEqual(seen, [self.ids[0:5], self.ids[5:10], self.ids[10:12]])
+        self.assertEqual(page.next_cursor, '')
+
+        backwards = []
+        while page.has_previous():
+            page = self.paginator.get_page(page.previous_page_number(), page.previous_cursor)
+            backwards.append([pet.pk for pet in page])
+        self.assertEqual(backwards, [self.ids[5:10], self.ids[0:5]])
+        self.assertEqual(page.previous_cursor, '')
+
+    def test_page_numbers_from_either_end(self):
+        # Последняя страница неполная и выбирается с конца списка в обратном порядке
+        with CaptureQueriesContext(connection) as queries:
+            last = self.paginator.get_page(3)
+        self.assertEqual([pet.pk for pet in last], self.ids[10:])
+        self.assertIn('ASC', queries[0]['sql'])
+        self.assertEqual([pet.pk for pet in self.paginator.get_page(2)], self.ids[5:10])
+        self.assertEqual(self.paginator.get_page(99).number, 3)
+        self.assertEqual(self.paginator.get_page('abc').number, 1)
+
+    def test_invalid_cursors(self):
+        valid = encode_cursor('after', Pet.objects.get(pk=self.ids[4]))
+        forged = valid[:-4] + 'AAAA'
+        for cursor in ('garbage!!', forged, encode_cursor('after', Pet.objects.get(pk=self.ids[4]), ('-id',))):
+            # Список страниц находит страницу по номеру из той же ссылки
+            self.assertEqual([pet.pk for pet in self.paginator.get_page(3, cursor)], self.ids[10:])
+            with self.assertRaises(InvalidCursor):
+                cursor_page(Pet.objects.all(), cursor, 5)
+        rows, next_cursor, previous_cursor = cursor_page(Pet.objects.all(), valid, 5)
+        self.assertEqual(([pet.pk for pet in rows], previous_cursor != ''), (self.ids[5:10], True))
+
+
+    def test_numbered_links_seek_from_the_current_page(self):
+        paginator = KeysetPaginator(Pet.objects.all(), 2, len(self.ids))
+        page = paginator.get_page(3)
+        # Первая и последняя страницы находятся по номеру со смещением 0
+        self.assertEqual([bool(page.cursor_for(number)) for number in range(1, 7)],
+                         [False, True, False, True, True, False])
+        for number in (2, 4, 5):
+            with CaptureQueriesContext(connection) as queries:
+                target = paginator.get_page(number, page.cursor_for(number))
+            self.assertEqual([pet.pk for pet in target], self.ids[(number - 1) * 2:number * 2])
+            # Пропускаются только страницы между текущей и целевой, а не всё начало списка
+            self.assertTrue(all(int(offset) <= 2 for offset in re.findall(r'OFFSET (\d+)', queries[0]['sql'])))
+
+        request = RequestFactory().get('/', {'page_active': '3'})
+        html = Template("{% load pagination_tags %}{% paginate page 'page_active' 'cursor_active' %}").render(
+            Context({'page': page, 'request': request}))
+        # «Предыдущая», «Следующая» и страницы 2, 4, 5; у первой и последней курсора нет
+        self.assertEqual(html.count('cursor_active='), 5)
+
+    def test_cursor_skip_is_limited(self):
+        anchor = Pet.objects.get(pk=self.ids[1])
+        far = encode_cursor('after', anchor, skip=1000)
+        self.assertEqual([pet.pk for pet in self.paginator.get_page(2, far)], self.ids[5:10])
+        # Курсоры API пропуска не несут
+        with self.assertRaises(InvalidCursor):
+            cursor_page(Pet.objects.all(), encode_cursor('after', anchor, skip=5), 5)
+
+class ExplainPetFiltersTests(TestCase):
+    def explain(self, **options):
+        stdout = StringIO()
+        call_command('explain_pet_filters', stdout=stdout, no_color=True, **options)
+        return stdout.getvalue().splitlines()
+
+    def test_reports_index_for_every_filter_combination(self):
+        lines = self.explain()
+        self.assertEqual(lines[0], f'Database: {connection.vendor}')
+        # Колонки: роль, раздел, группы фильтров, индексы
+        rows = {(line[:7].strip(), line[8:17].strip(), line[18:63].strip()): line[64:] for line in lines[1:-1]}
+        # 32 сочетания групп фильтров: публичный список и активный и скрытый разделы администратора
+        self.assertEqual(len(rows), 32 * 3)
+        self.assertRegex(lines[-1], r'^\d+ of 96 filter combinations use an index$')
+        self.assertIn('pet_public_created_idx', rows[('public', 'active', '(no filters)')])
+        self.assertIn('pet_public_species_age_idx', rows[('public', 'active', 'species, age')])
+
+    def test_verbose_plan_prints_explain_output(self):
+        lines = self.explain(verbose_plan=True)
+        plan = Pet.objects.filter(is_active=True).order_by(*ORDERING)[:5].explain()
+        self.assertIn(plan.splitlines()[0], lines)
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters._dirty.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner,
+                                      view_count=98)
+
+    def view_count(self):
+        return Pet.objects.values_list('view_count', flat=True).get(pk=self.pet.pk)
+
+    @contextmanager
+    def shared_cache(self):
+        # Файловый кэш виден всем процессам, в отличие от кэша в памяти
+        with tempfile.TemporaryDirectory() as location:
+            with self.settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}):
+                yield
+
+    def test_views_are_buffered_until_flush(self):
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                counters.record_view(self.pet.pk)
+        self.assertEqual((self.view_count(), pending_views(self.pet.pk)), (98, 3))
+        self.assertEqual(counters.flush_view_counts(), 1)
+        self.assertEqual((self.view_count(), pending_views(self.pet.pk)), (101, 0))
+        self.assertEqual(counters.flush_view_counts(), 0)
+
+    def test_busy_lock_keeps_pets_for_next_flush(self):
+        counters.record_view(self.pet.pk)
+        cache.add(counters.FLUSH_LOCK_KEY, 1)
+        self.assertEqual(counters.flush_view_counts(), 0)
+        cache.delete(counters.FLUSH_LOCK_KEY)
+        self.assertEqual(counters.flush_view_counts(), 1)
+        self.assertEqual(self.view_count(), 99)
+
+    def test_command_flushes_views_left_by_other_processes(self):
+        with self.shared_cache():
+            counters.record_view(self.pet.pk)
+            counters.record_view(self.pet.pk)
+            counters._dirty.clear()  # процесс, накопивший просмотры, остановлен
+            self.assertEqual(counters.flush_view_counts(), 0)
+            call_command('flush_view_counts', chunk_size=1, stdout=StringIO())
+            self.assertEqual((self.view_count(), pending_views(self.pet.pk)), (100, 0))
+
+    def test_command_requires_shared_cache(self):
+        self.assertFalse(counters.buffer_is_shared())
+        with self.assertRaisesMessage(CommandError, 'CACHE_ENABLED=True'):
+            call_command('flush_view_counts', stdout=StringIO())
+        with self.settings(CACHES={
+                'default': {'BACKEND': 'config.tiered_cache.TieredCache', 'LOCATION': 'shared'},
+                'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(counters.buffer_is_shared())
+        with self.shared_cache():
+            self.assertTrue(counters.buffer_is_shared())
+
+    def test_milestone_mail_is_queued_once(self):
+        with self.shared_cache():
+            for _ in range(3):
+                counters.record_view(self.pet.pk)
+            counters.flush_view_counts()
+            counters.record_view(self.pet.pk)
+            counters.flush_view_counts()
+            call_command('flush_view_counts', stdout=StringIO())
+        self.assertEqual(self.view_count(), 102)
+        mail = OutgoingEmail.objects.get()
+        self.assertEqual(mail.recipients, ['owner@example.com'])
+        self.assertIn('100', mail.body)
+
+
+class RecomputeRatingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner)
+        # bulk_create не отправляет сигналы: агрегаты питомца остаются устаревшими
+        Review.objects.bulk_create([Review(slug=f'r{i}', pet=self.pet, author=owner, text='Отзыв', rating=rating)
+                                    for i, rating in enumerate((2, 5, 5))])
+
+    def test_aggregates_and_caches_refresh_after_commit(self):
+        pet_version = blog_cache.get_pet_version(self.pet.pk)
+        pages_version = page_cache.get_pages_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            # Удалённый питомец пропускается
+            self.assertEqual(recompute_ratings([self.pet.pk, self.pet.pk + 1]), 1)
+            # Кэш сбрасывается только после коммита
+            self.assertEqual(blog_cache.get_pet_version(self.pet.pk), pet_version)
+        self.pet.refresh_from_db()
+        self.assertEqual((self.pet.review_count, self.pet.rating_sum, self.pet.rating_histogram),
+                         (3, 12, [0, 1, 0, 0, 2]))
+        self.assertNotEqual(blog_cache.get_pet_version(self.pet.pk), pet_version)
+        self.assertNotEqual(page_cache.get_pages_version(), pages_version)
+
+    def add_reviews(self, pet, author, ratings):
+        for i, rating in enumerate(ratings):
+            Review.objects.create(slug=f'{pet.pk}-{author.pk}-{i}', pet=pet, author=author, text='Отзыв',
+                                  rating=rating)
+
+    def aggregate_queries(self, queries):
+        # Чтение под блокировкой и UPDATE агрегатов отзывов по id питомца
+        return [q['sql'] for q in queries if '"rating_sum"' in q['sql'] and 'WHERE "blog_pet"."id"' in q['sql']]
+
+    def test_deleting_pet_skips_its_aggregates(self):
+        reviewer = User.objects.create_user('reviewer@example.com', 'secret12345')
+        self.add_reviews(self.pet, reviewer, [4] * 20)
+        with mock.patch('blog.signals.recompute_ratings') as recompute, \
+                self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.pet.delete()
+        # Ни блокировок, ни UPDATE агрегатов удаляемого питомца; число запросов не зависит от числа отзывов
+        self.assertEqual(self.aggregate_queries(queries), [])
+        self.assertLessEqual(len(queries), 10)
+        recompute.assert_not_called()
+
+    def test_deleting_user_recomputes_each_other_pet_once(self):
+        reviewer = User.objects.create_user('reviewer@example.com', 'secret12345')
+        owner = self.pet.owner
+        other = Pet.objects.create(name='Мурка', species='cat', age=2, description='Кошка', owner=owner)
+        own = Pet.objects.create(name='Кеша', species='bird', age=1, description='Попугай', owner=reviewer)
+        self.add_reviews(self.pet, reviewer, [1] * 10)
+        self.add_reviews(other, reviewer, [2] * 10)
+        self.add_reviews(own, owner, [3] * 10)
+        with mock.patch('blog.signals.recompute_ratings', wraps=recompute_ratings) as recompute, \
+                self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            reviewer.delete()
+        # Во время удаления агрегаты не трогаются; после коммита — один пересчёт на оба питомца
+        self.assertEqual(self.aggregate_queries(queries), [])
+        self.assertLessEqual(len(queries), 15)
+        recompute.assert_called_once_with({self.pet.pk, other.pk})
+        self.assertFalse(Pet.objects.filter(pk=own.pk).exists())
+        self.assertEqual(list(Pet.objects.order_by('pk').values_list('review_count', 'rating_sum')),
+                         [(3, 12), (0, 0)])
+
+    def test_deleting_one_review_updates_aggregates_at_once(self):
+        recompute_ratings([self.pet.pk])
+        self.pet.reviews.get(rating=2).delete()
+        self.pet.refresh_from_db()
+        self.assertEqual((self.pet.review_count, self.pet.rating_sum), (2, 10))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+
+    def create_pet(self, name='Рекс', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Pet.objects.create(name=name, species='dog', age=3, description='Пёс', owner=self.owner, **fields)
+
+    def test_related_rows_reindex_the_pet_once_per_transaction(self):
+        with mock.patch('blog.signals.update_documents', wraps=update_documents) as update, \
+                self.captureOnCommitCallbacks(execute=True):
+            pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+            Pedigree.objects.create(pet=pet, parent_type='mother', parent_name='Альма', breed='Овчарка')
+            for i in range(3):
+                Review.objects.create(pet=pet, author=self.owner, text=f'Послушный {i}', rating=5)
+        update.assert_called_once_with({pet.pk})
+        self.assertEqual(search_pet_ids('овчарка'), [pet.pk])
+        self.assertEqual(search_pet_ids('послушный'), [pet.pk])
+
+    def test_prefix_match_and_inactive_pets(self):
+        rex = self.create_pet()
+        hidden = self.create_pet('Рекси', is_active=False)
+        self.create_pet('Мурка')
+        self.assertEqual(search_pet_ids('рек'), [rex.pk])
+        self.assertEqual(sorted(search_pet_ids('рек', active_only=False)), [rex.pk, hidden.pk])
+        self.assertEqual(search_pet_ids('   '), [])
+
+    def test_deletes_leave_the_index(self):
+        pet = self.create_pet()
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(pet=pet, author=self.owner, text='Игривый', rating=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+        self.assertEqual(search_pet_ids('игривый'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(pet=pet, author=self.owner, text='Игривый', rating=4)
+        # Каскад от питомца не пересобирает его документ: тот удаляется вместе с питомцем
+        with mock.patch('blog.signals.update_documents') as update, self.captureOnCommitCallbacks(execute=True):
+            pet.delete()
+        update.assert_not_called()
+        self.assertEqual(search_pet_ids('рекс', active_only=False), [])
+        self.assertFalse(PetSearchDocument.objects.exists())
+
+    def test_upsert_refreshes_updated_at(self):
+        pet = self.create_pet()
+        PetSearchDocument.objects.filter(pk=pet.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        stale = PetSearchDocument.objects.get(pk=pet.pk).updated_at
+        update_documents([pet.pk])
+        self.assertGreater(PetSearchDocument.objects.get(pk=pet.pk).updated_at, stale)
+
+    def test_reindex_command_indexes_pets_created_without_signals(self):
+        Pet.objects.bulk_create([Pet(name=f'Шарик {i}', species='dog', age=1, description='Пёс', owner=self.owner)
+                                 for i in range(3)])
+        self.assertEqual(search_pet_ids('шарик'), [])
+        stdout = StringIO()
+        call_command('reindex_pets', chunk_size=2, stdout=stdout)
+        self.assertIn('Reindexed 3 pets', stdout.getvalue())
+        self.assertEqual(len(search_pet_ids('шарик')), 3)
+
+    @override_settings(LANGUAGE_CODE='ru')
+    def test_search_view(self):
+        self.create_pet()
+        response = self.client.get(reverse('blog:pet_search'), {'q': 'рекс'})
+        self.assertContains(response, 'Рекс')
+
+class ImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+
+    def import_rows(self, model_name, rows):
+        importer = Importer(model_name)
+        with self.captureOnCommitCallbacks(execute=True):
+            count = importer.import_batch(rows)
+        return importer, count
+
+    def test_partial_rows_keep_missing_columns(self):
+        pet = {'owner': 'owner@example.com', 'name': 'Рекс', 'species': 'dog'}
+        Pet.objects.create(name='Мурка', species='cat', age=2, description='Кошка', owner=self.owner)
+        cat = {'owner': 'owner@example.com', 'name': 'Мурка', 'species': 'cat'}
+        self.import_rows('pets', [{**pet, 'age': 5}, {**cat, 'description': 'Новое описание'}])
+        self.assertEqual(list(Pet.objects.order_by('pk').values_list('name', 'age', 'description')),
+                         [('Рекс', 5, 'Пёс'), ('Мурка', 2, 'Новое описание')])
+
+    def test_last_row_wins_for_repeated_key(self):
+        row = {'owner': 'owner@example.com', 'name': 'Шарик', 'species': 'dog', 'age': 1, 'description': 'Первая'}
+        importer, count = self.import_rows('pets', [row, {**row, 'description': 'Вторая'},
+                                                    {**row, 'owner': 'nobody@example.com'}])
+        self.assertEqual((count, importer.skipped), (1, 1))
+        self.assertEqual(Pet.objects.get(name='Шарик').description, 'Вторая')
+
+        review = {'slug': 'dup', 'pet_owner': 'owner@example.com', 'pet_name': 'Рекс', 'pet_species': 'dog',
+                  'author': 'owner@example.com', 'text': 'Отзыв'}
+        self.import_rows('reviews', [{**review, 'rating': 1}, {**review, 'rating': 4}])
+        self.pet.refresh_from_db()
+        self.assertEqual((Review.objects.get().rating, self.pet.review_count, self.pet.rating_sum), (4, 1, 4))
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        good = {'owner': 'owner@example.com', 'name': 'Шарик', 'species': 'dog', 'age': 1, 'description': 'Пёс'}
+        lines = [json.dumps(row, ensure_ascii=False) for row in [
+            good,
+            {**good, 'name': 'Бобик', 'age': 'три'},
+            {'owner': 'owner@example.com', 'species': 'dog'},
+        ]] + ['{oops', json.dumps({**good, 'name': 'Змей', 'species': 'dragon'}, ensure_ascii=False),
+              json.dumps({'owner': 'owner@example.com', 'name': 'Тузик', 'species': 'dog'}, ensure_ascii=False)]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8', delete=False) as source:
+            source.write('\n'.join(lines))
+        self.addCleanup(os.remove, source.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_pets', source.name, batch_size=4, stdout=stdout, stderr=stderr)
+        self.assertEqual([line.split(':')[0] for line in stderr.getvalue().splitlines()],
+                         ['Row 2', 'Row 3', 'Row 4', 'Row 5', 'Row 6'])
+        self.assertIn('missing name', stderr.getvalue())
+        self.assertIn('skipped 5 invalid rows', stdout.getvalue())
+        self.assertEqual(sorted(Pet.objects.values_list('name', flat=True)), ['Рекс', 'Шарик'])
+
+        with self.assertRaisesMessage(CommandError, 'Row 2: age'):
+            call_command('import_pets', source.name, strict=True, stdout=StringIO())
+
+    def test_user_import_drops_cached_users(self):
+        backend = CachedUserBackend()
+        self.assertFalse(backend.get_user(self.owner.pk).is_staff)
+        self.import_rows('users', [{'email': 'owner@example.com', 'is_staff': True},
+                                   {'email': 'new@example.com', 'first_name': 'Анна'}])
+        self.assertTrue(backend.get_user(self.owner.pk).is_staff)
+        self.assertEqual(User.objects.get(email='new@example.com').first_name, 'Анна')
+        # Поля, которых нет в строке, не сбрасываются
+        self.assertTrue(User.objects.get(pk=self.owner.pk).has_usable_password())
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=owner)
+
+    def run_suite(self, suite, **options):
+        stdout = StringIO()
+        call_command('run_benchmark', suite=suite, iterations=3, stdout=stdout, stderr=StringIO(), **options)
+        return json.loads(stdout.getvalue())
+
+    def test_detail_suite_measures_the_data_cache_not_the_page_cache(self):
+        with mock.patch('blog.page_cache._from_cache') as from_page_cache:
+            report = self.run_suite('detail', pet=self.pet.pk)
+        from_page_cache.assert_not_called()
+        self.assertGreater(report['scenarios']['cold_cache']['queries'], 0)
+        self.assertEqual(report['scenarios']['warm_cache']['queries'], 0)
+
+    def test_suites_share_the_report_format(self):
+        report = self.run_suite('pagination', pages=[10])
+        self.assertEqual(set(report['scenarios']), {'legacy:10', 'windowed:10'})
+        self.assertTrue({'revision', 'database', 'iterations'} <= set(report))
+        self.assertTrue({'p50_ms', 'p95_ms', 'html_kb'} <= set(report['scenarios']['windowed:10']))
+
+    def write_report(self, directory, name, scenarios, **fields):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump({'revision': name, 'dataset': {'pets': 1}, **fields, 'scenarios': scenarios}, stream)
+        return path
+
+    def test_compare_handles_asgi_reports(self):
+        # В отчёте asgi нет числа запросов: сравниваются пропускная способность и p95
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = self.write_report(directory, 'sync.json', {'pet_list:anonymous': {
+                'throughput_rps': 200.0, 'p95_ms': 10.0}}, views='sync')
+            current = self.write_report(directory, 'async.json', {'pet_list:anonymous': {
+                'throughput_rps': 100.0, 'p95_ms': 11.0}}, views='async')
+            stdout = StringIO()
+            call_command('compare_benchmarks', baseline, current, stdout=stdout)
+            self.assertIn('throughput regression', stdout.getvalue())
+            self.assertIn('sync views @ sync.json -> async views @ async.json', stdout.getvalue())
+            with self.assertRaisesMessage(CommandError, 'pet_list:anonymous'):
+                call_command('compare_benchmarks', baseline, current, fail_on_regression=True, stdout=StringIO())
+
+    def test_run_benchmark_compares_any_suite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = self.write_report(directory, 'before.json', {'legacy:10': {'p95_ms': 0.001, 'html_kb': 1.0}})
+            stderr = StringIO()
+            call_command('run_benchmark', suite='pagination', pages=[10], iterations=3, compare=baseline,
+                         stdout=StringIO(), stderr=stderr)
+        self.assertIn('legacy:10', stderr.getvalue())
+        self.assertIn('p95 regression', stderr.getvalue())
+        self.assertIn('windowed:10              new scenario', stderr.getvalue())
+
+
+@override_settings(LANGUAGE_CODE='ru', ANONYMOUS_PAGE_CACHE_TIMEOUT=60)
+class ModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.moderator = User.objects.create_user('moderator@example.com', 'secret12345', role='moderator')
+        owner = User.objects.create_user('owner@example.com', 'secret12345')
+        Pet.objects.bulk_create([
+            Pet(name=f'Питомец {i}', species='dog', age=i + 1, description='Описание', owner=owner,
+                is_active=i != 4)
+            for i in range(5)
+        ])
+        self.pet_ids = list(Pet.objects.order_by('pk').values_list('pk', flat=True))
+
+    def test_fixed_queries_per_chunk(self):
+        with mock.patch('blog.moderation.MAX_BATCH', 2), CaptureQueriesContext(connection) as queries:
+            changed = moderate_pets(self.pet_ids, False, self.moderator)
+        self.assertEqual(changed, self.pet_ids[:4])
+        # На пачку: SELECT ... FOR UPDATE, UPDATE, INSERT журнала; в последней пачке менять нечего
+        statements = [q['sql'] for q in queries if not q['sql'].upper().startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual([sql.split()[0].upper() for sql in statements],
+                         ['SELECT', 'UPDATE', 'INSERT'] * 2 + ['SELECT'])
+        self.assertFalse(Pet.objects.filter(is_active=True).exists())
+
+    def test_log_rows_share_one_batch(self):
+        moderate_pets(self.pet_ids, False, self.moderator)
+        rows = list(ModerationLog.objects.order_by('pet_id').values_list('pet_id', 'moderator_id', 'action', 'batch'))
+        self.assertEqual([row[:3] for row in rows], [(pk, self.moderator.pk, 'deactivate') for pk in self.pet_ids[:4]])
+        self.assertEqual(len({row[3] for row in rows}), 1)
+        # Питомец, уже бывший неактивным, не изменяется и в журнал не попадает
+        self.assertEqual(list(Pet.objects.order_by('pk').values_list('moderated_by', flat=True)),
+                         [self.moderator.pk] * 4 + [None])
+
+    def test_caches_are_dropped_after_commit(self):
+        url = reverse('blog:pet_list')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        pet_version = blog_cache.get_pet_version(self.pet_ids[0])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            moderate_pets(self.pet_ids, False, self.moderator)
+            # До коммита кэш отдаёт прежнее содержимое: новая версия ещё не видна другим транзакциям
+            self.assertEqual(blog_cache.get_pet_version(self.pet_ids[0]), pet_version)
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(blog_cache.get_pet_version(self.pet_ids[0]), pet_version)
+        response = self.client.get(url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertNotContains(response, 'Питомец 0')
+
+    def test_bulk_view_moderates_selected_pets(self):
+        self.client.force_login(self.moderator, backend='users.auth.CachedUserBackend')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('blog:pet_bulk_moderate'),
+                                        {'action': 'activate', 'pet_ids': [str(pk) for pk in self.pet_ids]})
+        self.assertRedirects(response, reverse('blog:pet_list'), fetch_redirect_response=False)
+        self.assertEqual(ModerationLog.objects.get().pet_id, self.pet_ids[4])
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.member = User.objects.create_user('member@example.com', 'secret12345')
+        Pet.objects.bulk_create([
+            Pet(name=f'Питомец {i}', species='dog', age=i + 1, description='Описание', owner=self.owner,
+                rating_avg=rating)
+            for i, rating in enumerate([3, 5, 1, 5, 4])
+        ])
+        self.pets = list(Pet.objects.order_by('pk'))
+        self.inactive = Pet.objects.create(name='Скрытый', species='cat', age=2, description='Описание',
+                                           owner=self.owner, is_active=False)
+
+    def get(self, name, query='', **kwargs):
+        return self.client.get(reverse(f'blog:{name}', kwargs=kwargs) + (f'?{query}' if query else ''))
+
+    def post_json(self, name, data, client=None, **kwargs):
+        return (client or self.client).post(reverse(f'blog:{name}', kwargs=kwargs), json.dumps(data),
+                                            content_type='application/json')
+
+    def walk(self, query):
+        """id всех питомцев по ссылкам next и первая страница, полученная обратно по previous."""
+        pages, cursor = [], ''
+        while True:
+            data = self.get('api_pet_list', f'{query}&cursor={cursor}').json()
+            pages.append([pet['id'] for pet in data['results']])
+            if not data['next']:
+                break
+            cursor = data['next']
+        previous = self.get('api_pet_list', f'{query}&cursor={data["previous"]}').json()
+        return pages, [pet['id'] for pet in previous['results']]
+
+    def test_fields_and_include(self):
+        pet = self.pets[0]
+        Review.objects.create(pet=pet, author=self.member, text='Хороший', rating=4)
+        data = self.get('api_pet_detail', 'fields=name,rating_avg&include=reviews', pk=pet.pk).json()
+        self.assertEqual(set(data), {'id', 'name', 'rating_avg', 'reviews'})
+        self.assertEqual([(r['author'], r['rating']) for r in data['reviews']], [(self.member.pk, 4)])
+
+        with self.assertNumQueries(3):  # страница, отзывы и родословные одним prefetch на связь
+            data = self.get('api_pet_list', 'fields=name&include=reviews,pedigrees&limit=100').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'name', 'reviews', 'pedigrees'})
+
+        response = self.get('api_pet_list', 'fields=secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('name', response.json()['available'])
+        self.assertEqual(self.get('api_pet_list', 'include=owner').status_code, 400)
+
+    def test_cursor_round_trip(self):
+        newest_first = [pet.pk for pet in reversed(self.pets)]
+        pages, previous = self.walk('limit=2')
+        self.assertEqual(pages, [newest_first[:2], newest_first[2:4], newest_first[4:]])
+        self.assertEqual(previous, newest_first[2:4])
+
+        by_rating = [pet.pk for pet in sorted(self.pets, key=lambda pet: (-pet.rating_avg, -pet.pk))]
+        pages, previous = self.walk('limit=2&sort=rating')
+        self.assertEqual(sum(pages, []), by_rating)
+        self.assertEqual(previous, by_rating[2:4])
+
+        # Курсор одной сортировки не подходит к другой
+        cursor = self.get('api_pet_list', 'limit=2&sort=rating').json()['next']
+        self.assertEqual(self.get('api_pet_list', f'limit=2&cursor={cursor}').status_code, 400)
+
+    def test_errors_are_json(self):
+        pet = self.pets[0]
+        response = self.post_json('api_pet_list', {'name': 'Новый'})
+        self.assertEqual((response.status_code, response.json()['detail']), (401, 'Authentication required'))
+        # Неактивный питомец для анонимного посетителя не существует
+        self.assertEqual(self.get('api_pet_detail', pk=self.inactive.pk).status_code, 404)
+        self.assertEqual(self.get('api_review_detail', slug='missing').status_code, 404)
+
+        self.client.force_login(self.member, backend='users.auth.CachedUserBackend')
+        response = self.client.patch(reverse('blog:api_pet_detail', kwargs={'pk': pet.pk}),
+                                     json.dumps({'name': 'Чужой'}), content_type='application/json')
+        self.assertEqual((response.status_code, response.json()['detail']), (403, 'You cannot edit this pet'))
+        self.assertEqual(self.client.delete(reverse('blog:api_pet_detail', kwargs={'pk': pet.pk})).status_code, 403)
+
+    def test_etag_not_modified(self):
+        pet = self.pets[0]
+        for name, kwargs in [('api_pet_detail', {'pk': pet.pk}), ('api_pet_list', {}),
+                             ('api_review_list', {'pk': pet.pk})]:
+            url = reverse(f'blog:{name}', kwargs=kwargs)
+            etag = self.client.get(url)['ETag']
+            # 304 отдаётся по версии из кэша до запросов к базе и сериализации
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Другие поля — другой ответ
+            self.assertNotEqual(self.client.get(url + '?fields=id')['ETag'], etag)
+        etag = self.get('api_pet_detail', pk=pet.pk)['ETag']
+        url = reverse('blog:api_pet_detail', kwargs={'pk': pet.pk})
+        pet.name = 'Новое имя'
+        pet.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['name']), (200, 'Новое имя'))
+
+    def test_review_updates_pet_aggregates(self):
+        pet = self.pets[0]
+        self.client.force_login(self.member, backend='users.auth.CachedUserBackend')
+        response = self.post_json('api_review_list', {'text': 'Отличный', 'rating': 5}, pk=pet.pk)
+        self.assertEqual(response.status_code, 201)
+        self.post_json('api_review_list', {'text': 'Неплохой', 'rating': 2}, pk=pet.pk)
+        data = self.get('api_pet_detail', 'fields=review_count,rating_avg', pk=pet.pk).json()
+        self.assertEqual((data['review_count'], data['rating_avg']), (2, 3.5))
+
+        self.client.force_login(self.owner, backend='users.auth.CachedUserBackend')
+        response = self.post_json('api_review_list', {'text': 'Свой', 'rating': 5}, pk=pet.pk)
+        self.assertEqual(response.status_code, 403)
+
+    def test_csrf_failure_is_json(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.member, backend='users.auth.CachedUserBackend')
+        response = self.post_json('api_review_list', {'text': 'Отзыв', 'rating': 5}, client=client,
+                                  pk=self.pets[0].pk)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['detail'], 'CSRF verification failed')
+
+        # Токен из cookie, выставленной GET-запросом к API, принимается в заголовке
+        client.get(reverse('blog:api_pet_list'))
+        token = client.cookies[settings.CSRF_COOKIE_NAME].value
+        response = client.post(reverse('blog:api_review_list', kwargs={'pk': self.pets[0].pk}),
+                               json.dumps({'text': 'Отзыв', 'rating': 5}), content_type='application/json',
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
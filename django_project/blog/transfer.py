@@ -0,0 +1,336 @@
+import csv
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from users.auth import invalidate_users
+from users.models import User
+
+from .cache import invalidate_pet
+from .models import Pedigree, Pet, Review
+from .page_cache import invalidate_pages
+from .ratings import recompute_ratings
+from .search import update_documents
+
+# Потоковый импорт и экспорт для команд import_pets/export_pets.
+# Связи выгружаются натуральными ключами: пользователь — email, питомец —
+# (email владельца, кличка, вид), отзыв — slug, родословная — (питомец, тип родителя).
+FORMATS = ('jsonl', 'csv')
+
+COLUMNS = {
+    'users': [
+        ('email', 'email'), ('password', 'password'), ('role', 'role'), ('first_name', 'first_name'),
+        ('last_name', 'last_name'), ('phone', 'phone'), ('telegram', 'telegram'),
+        ('is_active', 'is_active'), ('is_staff', 'is_staff'), ('is_superuser', 'is_superuser'),
+    ],
+    'pets': [
+        ('owner', 'owner__email'), ('name', 'name'), ('species', 'species'), ('age', 'age'),
+        ('birth_date', 'birth_date'), ('description', 'description'), ('is_active', 'is_active'),
+        ('view_count', 'view_count'),
+    ],
+    'pedigrees': [
+        ('pet_owner', 'pet__owner__email'), ('pet_name', 'pet__name'), ('pet_species', 'pet__species'),
+        ('parent_type', 'parent_type'), ('parent_name', 'parent_name'), ('breed', 'breed'),
+        ('birth_date', 'birth_date'), ('description', 'description'),
+    ],
+    'reviews': [
+        ('slug', 'slug'), ('pet_owner', 'pet__owner__email'), ('pet_name', 'pet__name'),
+        ('pet_species', 'pet__species'), ('author', 'author__email'), ('text', 'text'), ('rating', 'rating'),
+    ],
+}
+
+MODELS = {'users': User, 'pets': Pet, 'pedigrees': Pedigree, 'reviews': Review}
+
+# Колонки, без которых строку не сопоставить с записью, и поля, без которых запись не создать
+REQUIRED = {
+    'users': ['email'],
+    'pets': ['owner', 'name', 'species'],
+    'pedigrees': ['pet_owner', 'pet_name', 'pet_species', 'parent_type'],
+    'reviews': ['slug', 'pet_owner', 'pet_name', 'pet_species', 'author', 'text', 'rating'],
+}
+REQUIRED_ON_CREATE = {'pets': ['age']}
+
+
+# Экспорт
+
+def export_rows(model_name, chunk_size=2000):
+    names = [name for name, _ in COLUMNS[model_name]]
+    lookups = [lookup for _, lookup in COLUMNS[model_name]]
+    queryset = MODELS[model_name].objects.order_by('pk').values_list(*lookups)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, row))
+
+
+def write_rows(rows, stream, fmt, model_name):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=[name for name, _ in COLUMNS[model_name]])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: '' if value is None else value for key, value in row.items()})
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            stream.write('\n')
+            count += 1
+    return count
+
+
+# Импорт
+
+def read_rows(stream, fmt):
+    """Строки файла; нечитаемая строка JSON Lines отдаётся как None и считается ошибочной."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _value(model, field_name, raw):
+    """Значение поля из файла; неверное (тип, выбор из списка, длина) — ValidationError."""
+    field = model._meta.get_field(field_name)
+    if raw is None or raw == '':
+        if field.null:
+            return None
+        if field.blank or field.has_default():
+            return field.get_default() if field.has_default() else ''
+    return field.clean(raw, None)
+
+
+def _touch(objects):
+    now = timezone.now()
+    for obj in objects:
+        obj.updated_at = now
+
+
+def _fields(row, names):
+    # Строки уже проверены и приведены к типам полей (Importer._clean)
+    return {name: row[name] for name in names if name in row}
+
+
+def _last_by_key(rows, key):
+    # Повтор натурального ключа в пачке: побеждает последняя строка, как при построчном импорте
+    return list({key(row): row for row in rows}.values())
+
+
+def _bulk_update(model, updates):
+    """
+    updates — пары (объект, поля). bulk_update пишет переданные поля во все строки, поэтому
+    объекты группируются по набору полей: колонка, которой нет в строке файла, не сбрасывается.
+    """
+    groups = {}
+    for obj, fields in updates:
+        if fields:
+            groups.setdefault(tuple(fields), []).append(obj)
+    for fields, objects in groups.items():
+        model.objects.bulk_update(objects, list(fields))
+
+
+class InvalidRow(ValueError):
+    def __init__(self, number, message):
+        super().__init__(f'Row {number}: {message}')
+        self.number = number
+        self.message = message
+
+
+class Importer:
+    """
+    Импортирует пачки записей, сопоставляя email пользователей через заранее загруженный словарь.
+    Ошибочные строки пропускаются и собираются в invalid (номер строки, причина);
+    со strict=True первая из них прерывает импорт исключением InvalidRow.
+    """
+
+    def __init__(self, model_name, strict=False):
+        self.model_name = model_name
+        self.strict = strict
+        self.skipped = 0
+        self.invalid = []
+        self.user_ids = dict(User.objects.values_list('email', 'pk'))
+
+    def import_batch(self, batch, first_row=1):
+        """first_row — номер первой строки пачки в файле, он попадает в отчёт об ошибках."""
+        rows = []
+        for number, row in enumerate(batch, start=first_row):
+            try:
+                rows.append(self._clean(row, number))
+            except InvalidRow as error:
+                self._reject(error)
+        with transaction.atomic():
+            return getattr(self, f'_import_{self.model_name}')(rows)
+
+    def _reject(self, error):
+        if self.strict:
+            raise error
+        self.invalid.append((error.number, error.message))
+
+    def _clean(self, row, number):
+        # Значения проверяются до транзакции: одна плохая строка не откатывает пачку
+        if not isinstance(row, dict):
+            raise InvalidRow(number, 'not a JSON object')
+        missing = [name for name in REQUIRED[self.model_name] if row.get(name) in (None, '')]
+        if missing:
+            raise InvalidRow(number, f'missing {", ".join(missing)}')
+        model = MODELS[self.model_name]
+        values = {}
+        for name, lookup in COLUMNS[self.model_name]:
+            if name in row and '__' not in lookup:
+                try:
+                    values[name] = _value(model, lookup, row[name])
+                except ValidationError as error:
+                    raise InvalidRow(number, f'{name}: {" ".join(error.messages)}')
+        return {**row, **values, 'row_number': number}
+
+    def _pet_ids(self, rows, prefix):
+        # Питомцы пачки находятся одним запросом по владельцам и кличкам
+        keys = set()
+        for row in rows:
+            owner_id = self.user_ids.get(row.get(f'{prefix}owner'))
+            if owner_id:
+                keys.add((owner_id, row.get(f'{prefix}name'), row.get(f'{prefix}species')))
+        if not keys:
+            return {}
+        found = Pet.objects.filter(
+            owner_id__in={key[0] for key in keys}, name__in={key[1] for key in keys}
+        ).values_list('owner_id', 'name', 'species', 'pk')
+        return {(owner_id, name, species): pk for owner_id, name, species, pk in found
+                if (owner_id, name, species) in keys}
+
+    def _pet_key(self, row, prefix):
+        return self.user_ids.get(row.get(f'{prefix}owner')), row.get(f'{prefix}name'), row.get(f'{prefix}species')
+
+    def _import_users(self, rows):
+        names = ['role', 'first_name', 'last_name', 'phone', 'telegram', 'is_active', 'is_staff', 'is_superuser']
+        rows = _last_by_key(rows, lambda row: row['email'])
+        existing = User.objects.filter(email__in=[row['email'] for row in rows]).in_bulk(field_name='email')
+        created, updated = [], []
+        for row in rows:
+            values = _fields(row, names)
+            if row.get('password'):
+                values['password'] = row['password']
+            user = existing.get(row['email'])
+            if user is None:
+                values.setdefault('password', make_password(None))
+                created.append(User(email=row['email'], **values))
+            else:
+                for name, value in values.items():
+                    setattr(user, name, value)
+                updated.append((user, list(values)))
+        User.objects.bulk_create(created)
+        _bulk_update(User, updated)
+        self.user_ids.update((user.email, user.pk) for user in created)
+        if updated:
+            # bulk_update не отправляет post_save: роль, пароль и активность из кэша пользователей
+            # (users.auth) сбрасываются после коммита пачки
+            user_ids = [user.pk for user, _ in updated]
+            transaction.on_commit(lambda: invalidate_users(*user_ids))
+        return len(rows)
+
+    def _import_pets(self, rows):
+        names = ['age', 'birth_date', 'description', 'is_active', 'view_count']
+        known = [row for row in rows if self._pet_key(row, '')[0] is not None]
+        self.skipped += len(rows) - len(known)
+        rows = _last_by_key(known, lambda row: self._pet_key(row, ''))
+        existing = self._pet_ids(rows, '')
+        created, updated = [], []
+        for row in rows:
+            owner_id, name, species = key = self._pet_key(row, '')
+            values = _fields(row, names)
+            if key in existing:
+                pet = Pet(pk=existing[key], owner_id=owner_id, name=name, species=species, **values)
+                # bulk_update не заполняет auto_now-поля, а updated_at входит в ETag страницы питомца
+                updated.append((pet, list(values) + ['updated_at']))
+            else:
+                missing = [name for name in REQUIRED_ON_CREATE['pets'] if name not in values]
+                if missing:
+                    self._reject(InvalidRow(row['row_number'], f'missing {", ".join(missing)} for a new pet'))
+                    continue
+                created.append(Pet(owner_id=owner_id, name=name, species=species, **values))
+        Pet.objects.bulk_create(created)
+        _touch(pet for pet, _ in updated)
+        _bulk_update(Pet, updated)
+        self._refresh_pets([pet.pk for pet in created] + [pet.pk for pet, _ in updated])
+        return len(created) + len(updated)
+
+    def _import_pedigrees(self, rows):
+        names = ['parent_name', 'breed', 'birth_date', 'description']
+        pet_ids = self._pet_ids(rows, 'pet_')
+        existing = {}
+        for pk, pet_id, parent_type in Pedigree.objects.filter(pet_id__in=pet_ids.values()).values_list(
+                'pk', 'pet_id', 'parent_type'):
+            existing.setdefault((pet_id, parent_type), pk)
+        known = [row for row in rows if pet_ids.get(self._pet_key(row, 'pet_')) is not None]
+        self.skipped += len(rows) - len(known)
+        rows = _last_by_key(known, lambda row: (pet_ids[self._pet_key(row, 'pet_')], row['parent_type']))
+        created, updated = [], []
+        for row in rows:
+            pet_id = pet_ids[self._pet_key(row, 'pet_')]
+            values = _fields(row, names)
+            pk = existing.get((pet_id, row['parent_type']))
+            pedigree = Pedigree(pk=pk, pet_id=pet_id, parent_type=row['parent_type'], **values)
+            if pk:
+                updated.append((pedigree, list(values) + ['updated_at']))
+            else:
+                created.append(pedigree)
+        Pedigree.objects.bulk_create(created)
+        _touch(pedigree for pedigree, _ in updated)
+        _bulk_update(Pedigree, updated)
+        self._refresh_pets({pedigree.pet_id for pedigree in created} | {pedigree.pet_id for pedigree, _ in updated})
+        return len(created) + len(updated)
+
+    def _import_reviews(self, rows):
+        rows = _last_by_key(rows, lambda row: row['slug'])
+        pet_ids = self._pet_ids(rows, 'pet_')
+        existing = Review.objects.filter(slug__in=[row['slug'] for row in rows]).in_bulk(field_name='slug')
+        created, updated = [], []
+        moved_from = set()
+        for row in rows:
+            pet_id = pet_ids.get(self._pet_key(row, 'pet_'))
+            author_id = self.user_ids.get(row.get('author'))
+            if pet_id is None or author_id is None:
+                self.skipped += 1
+                continue
+            values = {'pet_id': pet_id, 'author_id': author_id, 'text': row['text'], 'rating': row['rating']}
+            review = existing.get(row['slug'])
+            if review is None:
+                created.append(Review(slug=row['slug'], **values))
+            else:
+                moved_from.add(review.pet_id)
+                for name, value in values.items():
+                    setattr(review, name, value)
+                updated.append(review)
+        Review.objects.bulk_create(created)
+        if updated:
+            Review.objects.bulk_update(updated, ['pet_id', 'author_id', 'text', 'rating'])
+        affected = moved_from | {review.pet_id for review in created + updated}
+        # bulk-операции не отправляют сигналы: агрегаты оценок пересчитываем по пачке
+        recompute_ratings(affected)
+        self._refresh_pets(affected)
+        return len(created) + len(updated)
+
+    def _refresh_pets(self, pet_ids):
+        pet_ids = list(pet_ids)
+        if pet_ids:
+            update_documents(pet_ids)
+            invalidate_pet(*pet_ids)
+            invalidate_pages()
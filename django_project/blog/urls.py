@@ -1,15 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 app_name = 'blog'
 
+# Страницы чтения под ASGI обслуживают асинхронные версии (см. blog.async_views)
+read_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.PetListView.as_view(), name='pet_list'),
-    path('pet/<int:pk>/', views.PetDetailView.as_view(), name='pet_detail'),
+    path('', read_views.PetListView.as_view(), name='pet_list'),
+    path('search/', views.PetSearchView.as_view(), name='pet_search'),
+    path('pet/<int:pk>/', read_views.PetDetailView.as_view(), name='pet_detail'),
     path('pet/create/', views.PetCreateView.as_view(), name='pet_create'),
     path('pet/<int:pk>/update/', views.PetUpdateView.as_view(), name='pet_update'),
     path('pet/<int:pk>/delete/', views.PetDeleteView.as_view(), name='pet_delete'),
     path('pet/<int:pk>/toggle-active/', views.PetToggleActiveView.as_view(), name='pet_toggle_active'),
+    path('pet/moderate/', views.PetBulkModerateView.as_view(), name='pet_bulk_moderate'),
     path('pet/<int:pet_pk>/review/', views.ReviewCreateView.as_view(), name='review_create'),
-    path('review/<slug:slug>/', views.ReviewDetailView.as_view(), name='review_detail'),
+    path('review/<slug:slug>/', read_views.ReviewDetailView.as_view(), name='review_detail'),
+    # JSON API (см. blog.api)
+    path('api/pets/', api.PetListApiView.as_view(), name='api_pet_list'),
+    path('api/pets/<int:pk>/', api.PetDetailApiView.as_view(), name='api_pet_detail'),
+    path('api/pets/<int:pk>/pedigrees/', api.PedigreeListApiView.as_view(), name='api_pedigree_list'),
+    path('api/pets/<int:pk>/reviews/', api.ReviewListApiView.as_view(), name='api_review_list'),
+    path('api/reviews/<slug:slug>/', api.ReviewDetailApiView.as_view(), name='api_review_detail'),
 ]
\ No newline at end of file
@@ -1,17 +1,37 @@
+import hashlib
+
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
+from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
 from .models import Pet, Pedigree, Review
 from .forms import PetForm, ReviewForm
-from datetime import timedelta
-from django.utils import timezone
+from .cache import get_pet_detail, get_pet_rows, get_pet_validators
+from .counters import pending_views, record_view
+from .moderation import MAX_BATCH, moderate_pets
+from .page_cache import AnonymousPageCacheMixin, PetPageCacheMixin, get_partition_counts
+from .listing import ORDERING, SORT_ORDERINGS, KeysetPaginator, filter_pets
+from .search import search_pets
 from django.forms import inlineformset_factory
 from django.urls import reverse_lazy
-from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
+from users.permissions import get_permissions
+from config.conditional import ConditionalGetMixin
+from config.db_router import ReplicaReadMixin
+
+class CachedObjectMixin:
+    """
+    Запоминает результат get_object(): test_func, get/post и form_valid
+    получают один и тот же объект без повторного запроса.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
 
 PedigreeFormSet = inlineformset_factory(
     Pet, Pedigree, fields=('parent_type', 'parent_name', 'breed', 'birth_date', 'description'),
@@ -19,67 +39,55 @@ PedigreeFormSet = inlineformset_factory(
 )
 
 
-class PetListView(ListView):
+class PetListView(AnonymousPageCacheMixin, ReplicaReadMixin, ListView):
     model = Pet
     template_name = 'blog/pet_list.html'
     context_object_name = 'pets'
     paginate_by = 5  # Пагинация: 5 записей на страницу для каждого списка
+    # Поля, которые выводит шаблон списка
+    list_fields = ('id', 'name', 'species', 'age', 'created_at', 'updated_at', 'is_active', 'rating_avg',
+                   'review_count')
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        # Базовая фильтрация для неадминистраторов и не модераторов
-        if not (self.request.user.is_authenticated and self.request.user.role in ['admin', 'moderator']):
-            queryset = queryset.filter(is_active=True)
-
-        # Применяем фильтры
-        name_filter = self.request.GET.get('name', '')
-        if name_filter:
-            queryset = queryset.filter(name__icontains=name_filter)
-
-        species_filter = self.request.GET.get('species', '')
-        if species_filter:
-            queryset = queryset.filter(species=species_filter)
-
-        age_min = self.request.GET.get('age_min', '')
-        age_max = self.request.GET.get('age_max', '')
-        if age_min and age_min.isdigit():
-            queryset = queryset.filter(age__gte=int(age_min))
-        if age_max and age_max.isdigit():
-            queryset = queryset.filter(age__lte=int(age_max))
-
-        owner_filter = self.request.GET.get('owner', '')
-        if owner_filter and self.request.user.is_authenticated and self.request.user.role == 'admin':
-            queryset = queryset.filter(owner__email__icontains=owner_filter)
-
-        created_at_filter = self.request.GET.get('created_at', '')
-        if created_at_filter == 'last_month':
-            one_month_ago = timezone.now() - timedelta(days=30)
-            queryset = queryset.filter(created_at__gte=one_month_ago)
-
-        return queryset
+        return filter_pets(super().get_queryset(), self.request.GET, self.request.user)
+
+    def get_paginate_by(self, queryset):
+        # Общий список не пагинируется: страницы строятся отдельно для каждого раздела
+        return None
+
+    def get_paginators(self, queryset, counts):
+        """Пагинаторы разделов active и inactive с параметрами их страниц из запроса."""
+        ordering = SORT_ORDERINGS.get(self.request.GET.get('sort', ''), ORDERING)
+        paginators = []
+        for section, is_active in (('active', True), ('inactive', False)):
+            paginator = KeysetPaginator(queryset.filter(is_active=is_active), self.paginate_by, counts[section],
+                                        ordering)
+            params = (self.request.GET.get(f'page_{section}', 1), self.request.GET.get(f'cursor_{section}'))
+            paginators.append((paginator, params))
+        return paginators
+
+    def get_pages(self, queryset):
+        # Количество активных и неактивных питомцев считаем одним запросом
+        counts = get_partition_counts(queryset)
+        return [paginator.get_page(*params) for paginator, params in self.get_paginators(queryset, counts)]
+
+    def get_rows(self, pets):
+        """Разметка строк обоих разделов одним обращением к кэшу: {pk: html}."""
+        return get_pet_rows(pets, get_permissions(self.request.user).can_toggle_active)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Получаем все питомцев для фильтрации
-        base_queryset = self.get_queryset()
-
-        # Разделяем на активных и неактивных
-        active_pets = base_queryset.filter(is_active=True)
-        inactive_pets = base_queryset.filter(is_active=False)
+        page_obj_active, page_obj_inactive = self.get_pages(self.object_list.only(*self.list_fields))
+        pets = [*page_obj_active, *page_obj_inactive]
+        rows = self.get_rows(pets)
+        for pet in pets:
+            pet.row = rows[pet.pk]
 
         # Пагинация для активных питомцев
-        paginator_active = self.get_paginator(active_pets, self.paginate_by, orphans=self.get_paginate_orphans(),
-                                              allow_empty_first_page=self.get_allow_empty())
-        page_number_active = self.request.GET.get('page_active', 1)
-        page_obj_active = paginator_active.get_page(page_number_active)
         context['active_pets'] = page_obj_active
         context['is_paginated_active'] = page_obj_active.has_other_pages()
 
         # Пагинация для неактивных питомцев
-        paginator_inactive = self.get_paginator(inactive_pets, self.paginate_by, orphans=self.get_paginate_orphans(),
-                                                allow_empty_first_page=self.get_allow_empty())
-        page_number_inactive = self.request.GET.get('page_inactive', 1)
-        page_obj_inactive = paginator_inactive.get_page(page_number_inactive)
         context['inactive_pets'] = page_obj_inactive
         context['is_paginated_inactive'] = page_obj_inactive.has_other_pages()
 
@@ -88,41 +96,69 @@ class PetListView(ListView):
         context['species_filter'] = self.request.GET.get('species', '')
         context['age_min'] = self.request.GET.get('age_min', '')
         context['age_max'] = self.request.GET.get('age_max', '')
-        context['owner_filter'] = self.request.GET.get('owner',
-                                                       '') if self.request.user.is_authenticated and self.request.user.role == 'admin' else ''
+        context['owner_filter'] = self.request.GET.get('owner', '') if get_permissions(
+            self.request.user).can_filter_owner else ''
         context['created_at_filter'] = self.request.GET.get('created_at', '')
+        context['rating_min'] = self.request.GET.get('rating_min', '')
+        context['sort'] = self.request.GET.get('sort', '')
         context['species_choices'] = Pet.SPECIES_CHOICES
         return context
 
 
-class PetDetailView(DetailView):
+class PetSearchView(ReplicaReadMixin, ListView):
+    template_name = 'blog/pet_search.html'
+    context_object_name = 'pets'
+
+    def get_queryset(self):
+        active_only = not get_permissions(self.request.user).can_view_inactive
+        return search_pets(self.request.GET.get('q', ''), active_only=active_only)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class PetDetailView(PetPageCacheMixin, ReplicaReadMixin, ConditionalGetMixin, DetailView):
     model = Pet
     template_name = 'blog/pet_detail.html'
     context_object_name = 'pet'
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        return queryset
+    def get_validators(self):
+        return self.use_validators(get_pet_validators(self.kwargs['pk']))
+
+    def use_validators(self, validators):
+        # Несуществующий питомец проходит обычным путём и получает 404
+        self.validators = validators
+        if validators is None:
+            return None
+        return validators['version'], validators['last_modified']
+
+    def not_modified(self):
+        # Просмотр учитывается и при ответе 304; счётчик на странице браузера обновится
+        # вместе со следующим изменением питомца
+        if self.counts_view(self.validators['owner_id']):
+            record_view(self.kwargs['pk'])
+
+    def counts_view(self, owner_id):
+        return self.request.user.is_authenticated and owner_id != self.request.user.pk
 
     def get_object(self, queryset=None):
-        obj = super().get_object(queryset)
-        if self.request.user.is_authenticated and obj.owner != self.request.user:
-            obj.view_count += 1
-            if obj.view_count % 100 == 0 and obj.owner:
-                send_mail(
-                    'Достигнуто 100 просмотров!',
-                    f'Ваш питомец {obj.name} набрал {obj.view_count} просмотров.',
-                    settings.EMAIL_HOST_USER,
-                    [obj.owner.email],
-                    fail_silently=True,
-                )
-            obj.save()
+        # Питомец, родословная и отзывы берутся из кэша (см. blog.cache)
+        self.payload = get_pet_detail(self.kwargs['pk'])
+        obj = self.payload['pet']
+        if self.counts_view(obj.owner_id):
+            # Просмотр копится в буфере и сбрасывается в базу пакетно (см. blog.counters)
+            record_view(obj.pk)
+        obj.view_count += pending_views(obj.pk)
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['reviews'] = self.object.reviews.all()
-        if self.request.user.is_authenticated and self.request.user != self.object.owner:
+        context['pedigrees'] = self.payload['pedigrees']
+        context['reviews'] = self.payload['reviews']
+        context['can_edit'] = get_permissions(self.request.user).can_edit(self.object)
+        if self.request.user.is_authenticated and self.request.user.pk != self.object.owner_id:
             context['review_form'] = ReviewForm()
         return context
 
@@ -157,7 +193,7 @@ class PetCreateView(LoginRequiredMixin, CreateView):
         return reverse_lazy('blog:pet_list')
 
 
-class PetUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class PetUpdateView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, UpdateView):
     model = Pet
     form_class = PetForm
     template_name = 'blog/pet_form.html'
@@ -165,9 +201,9 @@ class PetUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.POST:
-            context['pedigree_formset'] = PedigreeFormSet(self.request.POST, instance=self.get_object())
+            context['pedigree_formset'] = PedigreeFormSet(self.request.POST, instance=self.object)
         else:
-            context['pedigree_formset'] = PedigreeFormSet(instance=self.get_object())
+            context['pedigree_formset'] = PedigreeFormSet(instance=self.object)
         return context
 
     def form_valid(self, form):
@@ -183,8 +219,7 @@ class PetUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             return self.form_invalid(form)
 
     def test_func(self):
-        pet = self.get_object()
-        return self.request.user == pet.owner or self.request.user.role == 'admin'
+        return get_permissions(self.request.user).can_edit(self.get_object())
 
     def handle_no_permission(self):
         messages.error(self.request, 'Вы не можете редактировать этого питомца!')
@@ -195,21 +230,20 @@ class PetUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        if self.request.user.role not in ['admin', 'moderator']:
+        if not get_permissions(self.request.user).can_moderate_fields:
             for field in ['is_active', 'owner', 'view_count']:
                 form.fields[field].widget = form.fields[field].hidden_widget()
                 form.fields[field].required = False
         return form
 
 
-class PetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class PetDeleteView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DeleteView):
     model = Pet
     template_name = 'blog/pet_confirm_delete.html'
     context_object_name = 'pet'
 
     def test_func(self):
-        pet = self.get_object()
-        return self.request.user == pet.owner or self.request.user.role == 'admin'
+        return get_permissions(self.request.user).can_delete(self.get_object())
 
     def handle_no_permission(self):
         messages.error(self.request, 'Вы не можете удалить этого питомца!')
@@ -223,24 +257,25 @@ class PetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return reverse_lazy('blog:pet_list')
 
 
-class PetToggleActiveView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class PetToggleActiveView(LoginRequiredMixin, UserPassesTestMixin, CachedObjectMixin, UpdateView):
     model = Pet
     fields = ['is_active']
     template_name = 'blog/pet_confirm_toggle_active.html'
     context_object_name = 'pet'
 
     def test_func(self):
-        return self.request.user.role in ['admin', 'moderator']
+        return get_permissions(self.request.user).can_toggle_active
 
     def handle_no_permission(self):
         messages.error(self.request, 'У вас нет прав для изменения статуса активности!')
         return redirect('blog:pet_list')
 
     def form_valid(self, form):
-        pet = self.get_object()
-        pet.is_active = not pet.is_active
-        pet.moderated_by = self.request.user
-        pet.save()
+        pet = self.object
+        # Форма уже записала в объект отправленное значение, статус переключается от исходного.
+        # Тот же путь, что и у пакетной модерации: один UPDATE и запись в журнал
+        pet.is_active = not form.initial['is_active']
+        moderate_pets([pet.pk], pet.is_active, self.request.user)
         if pet.is_active:
             messages.success(self.request, f'Питомец {pet.name} активирован!')
         else:
@@ -251,6 +286,37 @@ class PetToggleActiveView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return reverse_lazy('blog:pet_list')
 
 
+class PetBulkModerateView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Активация и деактивация выбранных питомцев одним запросом (GET — подтверждение, POST — изменение)."""
+    template_name = 'blog/pet_confirm_bulk_moderate.html'
+
+    def test_func(self):
+        return get_permissions(self.request.user).can_toggle_active
+
+    def handle_no_permission(self):
+        messages.error(self.request, 'У вас нет прав для изменения статуса активности!')
+        return redirect('blog:pet_list')
+
+    def get_pet_ids(self, data):
+        return [int(pk) for pk in data.getlist('pet_ids') if pk.isdigit()][:MAX_BATCH]
+
+    def get(self, request):
+        pets = Pet.objects.filter(pk__in=self.get_pet_ids(request.GET)).only('id', 'name', 'is_active')
+        return render(request, self.template_name, {
+            'pets': pets,
+            'action': request.GET.get('action') if request.GET.get('action') in ('activate', 'deactivate') else '',
+        })
+
+    def post(self, request):
+        action = request.POST.get('action')
+        if action not in ('activate', 'deactivate'):
+            messages.error(request, 'Неизвестное действие.')
+            return redirect('blog:pet_list')
+        changed = moderate_pets(self.get_pet_ids(request.POST), action == 'activate', request.user)
+        messages.success(request, f'Статус изменён у питомцев: {len(changed)}.')
+        return redirect('blog:pet_list')
+
+
 class ReviewCreateView(LoginRequiredMixin, CreateView):
     model = Review
     form_class = ReviewForm
@@ -258,27 +324,47 @@ class ReviewCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        pet = Pet.objects.get(pk=self.kwargs['pet_pk'])
+        pet = Pet.objects.only('id', 'name').get(pk=self.kwargs['pet_pk'])
         context['pet'] = pet
         return context
 
     def form_valid(self, form):
         form.instance.author = self.request.user
         form.instance.pet_id = self.kwargs['pet_pk']
+        # Отзыв и агрегаты оценок питомца (см. blog.ratings) сохраняются в одной транзакции
+        with transaction.atomic():
+            response = super().form_valid(form)
         messages.success(self.request, 'Отзыв успешно добавлен!')
-        return super().form_valid(form)
+        return response
 
     def get_success_url(self):
         return reverse_lazy('blog:pet_detail', kwargs={'pk': self.kwargs['pet_pk']})
 
 
-class ReviewDetailView(DetailView):
+class ReviewDetailView(AnonymousPageCacheMixin, ReplicaReadMixin, ConditionalGetMixin, DetailView):
     model = Review
     template_name = 'blog/review_detail.html'
     context_object_name = 'review'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def get_validators(self):
+        return self.use_validators(self.validators_queryset().first())
+
+    def validators_queryset(self):
+        return Review.objects.filter(slug=self.kwargs['slug']).values_list(
+            'pk', 'rating', 'text', 'created_at', 'pet__updated_at')
+
+    def use_validators(self, row):
+        if row is None:
+            return None
+        pk, rating, text, created_at, pet_updated_at = row
+        text_hash = hashlib.md5(text.encode()).hexdigest()
+        return f'{pk}|{rating}|{text_hash}|{created_at}|{pet_updated_at}', max(created_at, pet_updated_at)
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('pet', 'author')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['pet'] = self.object.pet
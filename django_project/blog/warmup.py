@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import translation
+from django.utils.http import urlencode
+from django.utils.translation import get_supported_language_variant
+
+from .models import Pet
+
+# Прогрев кэша после деплоя или очистки Redis (команда warm_cache). Страницы запрашиваются
+# анонимно через обработчик Django внутри процесса (BaseHandler с middleware проекта, как у
+# WSGI-сервера, без инструментирования тестового клиента), поэтому заполняются те же ключи, что читают
+# живые запросы: кэш страниц (blog.page_cache) с языком и фильтром в ключе, строки списка,
+# число питомцев в разделах, данные и валидаторы страницы питомца. Анонимный GET ничего
+# не пишет в базу (просмотры считаются только у вошедших), а версии в кэше создаются через add(),
+# поэтому прогрев можно запускать под живым трафиком.
+Target = namedtuple('Target', 'kind language url')
+Result = namedtuple('Result', 'target status ms cached error')
+
+
+def warm_languages():
+    """Языки из LANGUAGES; без явной настройки — только язык по умолчанию, а не весь список Django."""
+    codes = [code for code, _ in settings.LANGUAGES] if settings.is_overridden('LANGUAGES') else [
+        settings.LANGUAGE_CODE]
+    return list(dict.fromkeys(get_supported_language_variant(code) for code in codes))
+
+
+def build_targets(top=100, languages=None):
+    """Списки без фильтра и по каждому виду, затем самые просматриваемые питомцы — на каждом языке."""
+    languages = languages or warm_languages()
+    queries = [{}] + [{'species': species} for species, _ in Pet.SPECIES_CHOICES]
+    # Анонимный посетитель видит только активных питомцев
+    pet_ids = list(
+        Pet.objects.filter(is_active=True).order_by('-view_count', '-id').values_list('pk', flat=True)[:top]
+    )
+    targets = []
+    for language in languages:
+        with translation.override(language):
+            url = reverse('blog:pet_list')
+            targets += [Target('list', language, f'{url}?{urlencode(query)}' if query else url) for query in queries]
+    for pet_id in pet_ids:
+        for language in languages:
+            with translation.override(language):
+                targets.append(Target('detail', language, reverse('blog:pet_detail', kwargs={'pk': pet_id})))
+    return targets
+
+
+def default_host():
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def _handler():
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler
+
+
+def _fetch(handler, factory, target):
+    started = time.perf_counter()
+    try:
+        # Исключение представления обработчик превращает в ответ 500, как на живом сервере
+        response = handler.get_response(factory.get(target.url))
+        # close() отправляет request_finished: соединения с базой ведут себя как после обычного запроса
+        response.close()
+    except Exception as error:  # ошибка одной страницы не останавливает прогрев
+        return Result(target, None, (time.perf_counter() - started) * 1000, False, repr(error))
+    return Result(target, response.status_code, (time.perf_counter() - started) * 1000,
+                  response.get('X-Page-Cache') == 'hit', None)
+
+
+def warm(targets, workers=4, host=None, callback=None):
+    """
+    Запрашивает targets не более чем в workers потоков; callback(result) вызывается
+    после каждой страницы (из потока-исполнителя). Возвращает список Result.
+    """
+    queue = SimpleQueue()
+    for target in targets:
+        queue.put(target)
+    results = []
+    lock = threading.Lock()
+    # Обработчик общий, как у WSGI-сервера; запросы без cookie, то есть анонимные
+    handler = _handler()
+    factory = RequestFactory(HTTP_HOST=host or default_host())
+
+    def worker():
+        # Соединение с базой у каждого потока своё и закрывается, когда очередь пуста
+        try:
+            while True:
+                try:
+                    target = queue.get_nowait()
+                except Empty:
+                    return
+                result = _fetch(handler, factory, target)
+                with lock:
+                    results.append(result)
+                    if callback is not None:
+                        callback(result)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(worker) for _ in range(min(workers, len(targets)))]:
+            future.result()
+    return results
@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Под ASGI страницы чтения работают асинхронно (см. blog.async_views); ASYNC_VIEWS=False отключает
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+# Постоянные соединения под ASGI не переиспользуются, вместо них используйте DB_POOL=True
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
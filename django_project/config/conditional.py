@@ -0,0 +1,89 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+# Условный GET для страниц деталей. Представление описывает версию страницы (get_validators);
+# если она совпала с If-None-Match или If-Modified-Since, ответ 304 отдаётся до get_object(),
+# то есть без связанных запросов и рендеринга шаблона.
+
+
+def viewer_key(request):
+    # Страница зависит от того, кто смотрит: меню, кнопки редактирования, форма отзыва
+    user = request.user
+    if not user.is_authenticated:
+        return f'anonymous|{get_language()}'
+    return f'{user.pk}|{user.role}|{user.is_superuser}|{get_language()}'
+
+
+def _check(request, validators):
+    """Возвращает (etag, timestamp, ответ 304/412 или None)."""
+    version, last_modified = validators
+    etag = quote_etag(hashlib.md5(f'{version}|{viewer_key(request)}'.encode()).hexdigest())
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def _finish(request, response, etag, timestamp):
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Браузер и CDN переспрашивают сервер при каждом обращении и получают 304, пока версия та же
+    patch_cache_control(response, no_cache=True)
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+class ConditionalGetMixin:
+    def get_validators(self):
+        """Возвращает (версия страницы, время изменения или None) либо None, если проверять нечего."""
+        raise NotImplementedError
+
+    def not_modified(self):
+        """Вызывается перед ответом 304."""
+
+    def get(self, request, *args, **kwargs):
+        # Сообщения выводятся при рендеринге: страница с ними не заменяется закэшированной
+        validators = None if len(get_messages(request)) else self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        etag, timestamp, response = _check(request, validators)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        elif response.status_code == 304:
+            self.not_modified()
+        return _finish(request, response, etag, timestamp)
+
+
+class AsyncConditionalGetMixin:
+    """То же для асинхронных представлений: страницу строит корутина render_page()."""
+
+    async def aget_validators(self):
+        raise NotImplementedError
+
+    async def anot_modified(self):
+        pass
+
+    async def render_page(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        # Пользователь загружается асинхронно; шаблон и проверки ниже используют этот же объект
+        request.user = await request.auser()
+        # Хранилище сообщений может обращаться к сессии (FallbackStorage, SessionStorage),
+        # а синхронная загрузка сессии в event loop запрещена
+        has_messages = await sync_to_async(len)(get_messages(request))
+        validators = None if has_messages else await self.aget_validators()
+        if validators is None:
+            return await self.render_page(request, *args, **kwargs)
+        etag, timestamp, response = _check(request, validators)
+        if response is None:
+            response = await self.render_page(request, *args, **kwargs)
+        elif response.status_code == 304:
+            await self.anot_modified()
+        return _finish(request, response, etag, timestamp)
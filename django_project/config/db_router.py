@@ -0,0 +1,119 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Чтение со страниц списков и деталей уходит на реплики (DATABASE_REPLICAS), всё остальное —
+# на default. Клиент, который только что что-то записал, REPLICA_PIN_SECONDS читает с основной
+# базы (cookie PIN_COOKIE), чтобы сразу увидеть свой отзыв или питомца несмотря на отставание реплик.
+PIN_COOKIE = 'db_pin'
+# Приложения, чьи таблицы читаются с реплик; сессии, права и типы содержимого всегда идут на default
+REPLICA_APPS = frozenset({'blog', 'users'})
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Маршрутизация в рамках одного запроса."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned  # клиент недавно писал в базу
+        self.replica_reads = False  # представление разрешило чтение с реплик (ReplicaReadMixin)
+        self.wrote = False  # в этом запросе была запись
+
+    @property
+    def use_replica(self):
+        return self.replica_reads and not (self.pinned or self.wrote)
+
+
+def in_transaction():
+    """
+    Открыт ли atomic() на основной базе. Блоки, которыми TestCase оборачивает тест,
+    не считаются — так же их пропускает проверка durable-блоков в самом Django.
+    """
+    return any(not block._from_testcase for block in connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or not settings.DATABASE_REPLICAS:
+            return None
+        if model._meta.app_label not in REPLICA_APPS:
+            return None
+        # Внутри транзакции чтение должно видеть её же записи и блокировки
+        if in_transaction():
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in REPLICA_APPS:
+            return None
+        # Django спрашивает базу для записи и при проверке ограничений формы, поэтому флаг
+        # означает «запрос мог писать»: дальнейшее чтение в этом запросе идёт на default
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Явно default: без ответа роутера Django сохраняет объект в базу, из которой он прочитан
+        # (instance._state.db), то есть на реплику. select_for_update() тоже спрашивает базу для записи
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        return True
+
+
+class ReplicaReadMixin:
+    """
+    Чтение в GET-запросе к представлению (и при рендеринге его шаблона) идёт на реплику.
+    Флаг не снимается до конца запроса, поэтому работает и с асинхронными представлениями.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        state = _state.get()
+        if state is not None and request.method in ('GET', 'HEAD'):
+            state.replica_reads = True
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRoutingMiddleware:
+    """Создаёт RoutingState на запрос и ставит cookie закрепления после записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    def pin(self, request, response, state):
+        # Закрепляем только после изменяющих запросов: GET может записать разве что
+        # счётчики просмотров, и ради них переводить клиента на default незачем
+        if state.wrote and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .tiered_cache import request_stats
+
+# Замеры времени запроса: SQL (постоянная обёртка execute_wrappers соединений), рендеринг шаблона
+# и всё остальное. Результат уходит в заголовок Server-Timing и в лог performance
+# одной JSON-строкой на запрос (сводку строит команда slow_endpoints).
+logger = logging.getLogger('performance')
+# Замер текущего запроса: сюда же сигнал connection_created добавляет открытые соединения
+_current_recorder = ContextVar('performance_recorder', default=None)
+
+
+class QueryRecorder:
+    """execute_wrapper, считающий запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()  # одинаковый SQL с любыми параметрами (признак N+1)
+        self.exact = Counter()  # одинаковый SQL с одинаковыми параметрами (дубликаты)
+        self.connections = 0  # новые соединения с базой (при CONN_MAX_AGE=0 — на каждый запрос)
+        self.cache = None  # операции двухуровневого кэша за запрос (config.tiered_cache.request_stats)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+            self.exact[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.exact.values())
+
+    def most_repeated(self):
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+def read_records(path):
+    """Записи лога performance (для команд slow_endpoints и db_connections)."""
+    # Строка лога: "<дата> <время> <уровень> {json}"
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            start = line.find('{')
+            if start == -1:
+                continue
+            try:
+                yield json.loads(line[start:])
+            except ValueError:
+                continue
+
+
+def _record_query(execute, sql, params, many, context):
+    # Замер берётся из контекста, а не из соединения: под ASGI ORM выполняется в потоке
+    # sync_to_async со своими соединениями, а ContextVar переходит туда вместе с контекстом
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    """Ставит _record_query на соединение один раз, в начало списка: execute_wrapper() снимает последнюю обёртку."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@receiver(request_started)
+def install_query_recorders(sender, **kwargs):
+    # Под ASGI сигнал отправляется через sync_to_async, то есть в потоке, где выполняются запросы к базе
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    install_query_recorder(connection)
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.connections += 1
+
+
+class PerformanceMiddleware:
+    """
+    Должен стоять первым в MIDDLEWARE, чтобы учитывать запросы сессий и авторизации.
+    Подробно замеряется доля запросов INSTRUMENTATION_SAMPLE_RATE; у остальных считается
+    только общее время, и они попадают в лог, если медленнее INSTRUMENTATION_SLOW_MS.
+    """
+
+    # Поддерживает оба режима: синхронный middleware в цепочке под ASGI заставил бы Django
+    # выполнять асинхронные представления (blog.async_views) через async_to_sync
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        recorder, stack, started = self.start(request)
+        with stack:
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder, stack, started = self.start(request)
+        with stack:
+            response = await self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    def start(self, request):
+        sampled = random.random() < settings.INSTRUMENTATION_SAMPLE_RATE
+        recorder = QueryRecorder() if sampled else None
+        request._template_timing = [None, 0.0] if sampled else None
+        stack = ExitStack()
+        if sampled:
+            token = _current_recorder.set(recorder)
+            stack.callback(_current_recorder.reset, token)
+            recorder.cache = stack.enter_context(request_stats())
+        return recorder, stack, time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        total = (time.perf_counter() - started) * 1000
+        sampled = recorder is not None
+        slow = total >= settings.INSTRUMENTATION_SLOW_MS
+        if not (sampled or slow):
+            return response
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': request.resolver_match.view_name if request.resolver_match else None,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'sampled': sampled,
+            'pid': os.getpid(),
+        }
+        if sampled:
+            template = request._template_timing[1] * 1000
+            sql = recorder.duration * 1000
+            statement, repeats = recorder.most_repeated()
+            record.update({
+                'sql_count': recorder.count,
+                'sql_ms': round(sql, 2),
+                'duplicates': recorder.duplicates,
+                'new_connections': recorder.connections,
+                'template_ms': round(template, 2),
+                'most_repeated': {'count': repeats, 'sql': statement[:300]} if repeats > 1 else None,
+            })
+            # Операции двухуровневого кэша за этот запрос (config.tiered_cache); сводку по воркерам
+            # строит команда cache_stats
+            if recorder.cache:
+                record['cache'] = dict(recorder.cache)
+            if settings.INSTRUMENTATION_SERVER_TIMING:
+                response['Server-Timing'] = ', '.join([
+                    f'sql;dur={sql:.2f};desc="{recorder.count} queries, {recorder.duplicates} duplicates"',
+                    f'tpl;dur={template:.2f}',
+                    f'app;dur={max(total - sql - template, 0):.2f}',
+                    f'total;dur={total:.2f}',
+                ])
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        # TemplateResponse рендерится после этого хука: время до post-render callback — это шаблон.
+        # Представления, вызывающие render() сами, учитываются в app.
+        timing = getattr(request, '_template_timing', None)
+        if timing is not None:
+            timing[0] = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._template_done(timing))
+        return response
+
+    @staticmethod
+    def _template_done(timing):
+        timing[1] += time.perf_counter() - timing[0]
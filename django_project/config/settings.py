@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -32,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.instrumentation.PerformanceMiddleware',  # Замеры SQL и шаблонов, должен быть первым
+    'config.db_router.ReplicaRoutingMiddleware',  # Чтение с реплик и закрепление за основной базой
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Для мультиязычности
@@ -56,6 +59,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.i18n',  # Для перевода
+                'users.permissions.access',  # Права текущего пользователя (access.can_...)
             ],
         },
     },
@@ -65,6 +69,9 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Соединение переиспользуется между запросами DB_CONN_MAX_AGE секунд: 0 — закрывать после каждого
+# запроса, пустое значение — без ограничения. Перед повторным использованием проверяется, живо ли оно
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',  # Используем PostgreSQL
@@ -73,8 +80,40 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', 'alen2005'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None,
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'OPTIONS': {
+            # Имя процесса в pg_stat_activity (см. команду db_connections)
+            'application_name': os.getenv('DB_APPLICATION_NAME', 'petblog'),
+        },
     }
 }
+# Пул соединений psycopg 3 (pip install "psycopg[pool]"). Размер пула — на процесс: под gunicorn
+# суммарно workers * DB_POOL_MAX_SIZE должно оставаться меньше max_connections PostgreSQL (см. README).
+# С пулом соединения возвращаются в пул после запроса, поэтому CONN_MAX_AGE должен быть 0.
+# Под ASGI соединение привязано к контексту запроса и между запросами не переиспользуется:
+# config/asgi.py по умолчанию отключает CONN_MAX_AGE, там имеет смысл только пул.
+DB_POOL = os.getenv('DB_POOL') == 'True'
+if DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # Сколько секунд запрос ждёт свободное соединение, прежде чем упасть с ошибкой
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2 добавляет алиасы replica1, replica2
+# с параметрами default. Списки и страницы деталей читают с них (config.db_router), клиент после
+# записи REPLICA_PIN_SECONDS секунд читает с основной базы.
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], 'HOST': host.strip(), 'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -93,6 +132,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Профиль хэширования паролей. fast (MD5) годится только для тестов: PBKDF2 на каждый
+# create_user заметно замедляет тестовый прогон. По умолчанию fast включается для manage.py test.
+PASSWORD_HASHER_PROFILE = os.getenv('PASSWORD_HASHER_PROFILE', 'fast' if sys.argv[1:2] == ['test'] else 'default')
+if PASSWORD_HASHER_PROFILE == 'fast':
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        # Остальные оставлены, чтобы проверялись уже сохранённые хэши
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 LANGUAGE_CODE = 'ru-ru'
@@ -117,16 +170,66 @@ LOGOUT_REDIRECT_URL = 'blog:pet_list'
 LOGIN_URL = '/users/'
 LOGOUT_URL = '/users/logout/'
 
+# Сессии: cached_db читает сессию из кэша и пишет в базу и в кэш, без кэша остаётся прежний db.
+# signed_cookies вообще не обращается к серверу, но сессию нельзя отозвать при выходе.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# Сообщения живут в подписанной cookie и не создают и не изменяют сессию
+MESSAGE_STORAGE = os.getenv('MESSAGE_STORAGE', 'django.contrib.messages.storage.cookie.CookieStorage')
+# Пользователь запроса берётся из кэша (users.auth); ModelBackend остаётся для сессий,
+# созданных до его подключения. При двух бэкендах login() без authenticate() требует backend=
+AUTHENTICATION_BACKENDS = ['users.auth.CachedUserBackend', 'django.contrib.auth.backends.ModelBackend']
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', '300'))
+
 # Cache settings
 CACHE_ENABLED = os.getenv('CACHE_ENABLED') == 'True'
 if CACHE_ENABLED:
     CACHES = {
+        # Общий кэш читается через L1 в памяти процесса (config.tiered_cache): CACHE_L1_MAX_ENTRIES
+        # записей общим размером до CACHE_L1_MAX_BYTES не дольше CACHE_L1_TIMEOUT секунд;
+        # CACHE_L1_MAX_ENTRIES=0 оставляет только L2
         'default': {
-            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'BACKEND': 'config.tiered_cache.TieredCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES', '1000')),
+                'L1_MAX_BYTES': int(os.getenv('CACHE_L1_MAX_BYTES', str(16 * 1024 * 1024))),
+                'L1_TIMEOUT': float(os.getenv('CACHE_L1_TIMEOUT', '2')),
+                # Сессии и буфер просмотров (blog.counters) должны читаться из общего кэша
+                'L1_EXCLUDE': ['django.contrib.sessions', 'blog:views:'],
+            },
+        },
+        'shared': {
+            # Можно подключить и файловый кэш: CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+            'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
             'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/1')
-        }
+        },
     }
 
+# Время жизни (в секундах) закэшированных данных страницы питомца
+PET_DETAIL_CACHE_TIMEOUT = int(os.getenv('PET_DETAIL_CACHE_TIMEOUT', '300'))
+# Время жизни разметки строк списка питомцев; ключ версионирован updated_at, поэтому срок может быть долгим
+PET_ROW_CACHE_TIMEOUT = int(os.getenv('PET_ROW_CACHE_TIMEOUT', '3600'))
+# Кэш целых страниц списка, питомца и отзыва для анонимных посетителей (blog.page_cache), 0 — выключен
+ANONYMOUS_PAGE_CACHE_TIMEOUT = int(os.getenv('ANONYMOUS_PAGE_CACHE_TIMEOUT', '60'))
+# Число активных и неактивных питомцев для списка (blog.page_cache.get_partition_counts), 0 — без кэша
+PARTITION_COUNTS_CACHE_TIMEOUT = int(os.getenv('PARTITION_COUNTS_CACHE_TIMEOUT', '60'))
+
+# Буфер счётчика просмотров: как часто (в секундах) накопленные просмотры сбрасываются в базу.
+# Без CACHE_ENABLED буфер живёт в памяти процесса, и команда flush_view_counts его не видит
+VIEW_COUNT_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNT_FLUSH_INTERVAL', '10'))
+
+# Замеры производительности (config.instrumentation): доля запросов с подробными замерами,
+# порог медленного запроса в мс (такие пишутся в лог всегда) и заголовок Server-Timing
+INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('INSTRUMENTATION_SAMPLE_RATE', '1.0' if DEBUG else '0.01'))
+INSTRUMENTATION_SLOW_MS = float(os.getenv('INSTRUMENTATION_SLOW_MS', '500'))
+INSTRUMENTATION_SERVER_TIMING = os.getenv('INSTRUMENTATION_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+PERFORMANCE_LOG_FILE = os.getenv('PERFORMANCE_LOG_FILE', BASE_DIR / 'performance.log')
+
+# Асинхронные версии списка питомцев, страницы питомца и отзыва (blog.async_views).
+# Имеют смысл только под ASGI: config/asgi.py включает их по умолчанию, под WSGI каждый
+# асинхронный запрос выполнялся бы через async_to_sync
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.mail.ru'
@@ -141,6 +244,12 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'performance': {
+            'format': '{asctime} {levelname} {message}',
+            'style': '{',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
@@ -149,6 +258,11 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'email_debug.log',
         },
+        'performance_file': {
+            'class': 'logging.FileHandler',
+            'filename': PERFORMANCE_LOG_FILE,
+            'formatter': 'performance',
+        },
     },
     'loggers': {
         'django.core.mail': {
@@ -156,5 +270,10 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'performance': {
+            'handlers': ['performance_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
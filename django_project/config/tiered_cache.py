@@ -0,0 +1,392 @@
+import math
+import pickle
+import random
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+# Двухуровневый кэш: L1 — LRU в памяти процесса, ограниченный числом записей и суммарным размером
+# значений в байтах (pickle), L2 — общий кэш из CACHES (Redis).
+# Чтение сначала смотрит в L1 и идёт в L2 только при промахе; запись уходит в L2 и обновляет L1.
+# L1 живёт не дольше L1_TIMEOUT секунд: столько другие процессы могут видеть значение,
+# изменённое или удалённое в соседнем процессе. Ключи с префиксами L1_EXCLUDE (сессии, буфер
+# счётчика просмотров) в L1 не попадают и всегда читаются из L2.
+#
+# get_or_set с вызываемым default защищает дорогие значения от одновременного пересчёта:
+# - вероятностное досрочное истечение (XFetch): чем ближе срок и чем дольше считалось значение,
+#   тем вероятнее, что один из запросов пересчитает его заранее, пока остальные читают старое;
+# - объединение запросов: пересчитывает тот, кто взял блокировку (в процессе — threading.Lock
+#   этого ключа, между процессами — add() ключа блокировки в L2), остальные отдают прежнее
+#   значение или ждут нового не дольше LOCK_TIMEOUT секунд. Разные ключи друг друга не ждут.
+_MISSING = object()
+LOCK_SUFFIX = ':recompute-lock'
+# Интервал опроса L2, пока значение пересчитывает другой процесс
+POLL_INTERVAL = 0.05
+
+STATS = ('l1_hits', 'l2_hits', 'misses', 'l1_evictions', 'l1_expirations',
+         'recomputes', 'early_recomputes', 'coalesced', 'stale_hits')
+
+# Значение get_or_set в L2: срок (time.time()) и время его вычисления в секундах нужны XFetch
+Stamped = namedtuple('Stamped', 'value delta expires_at')
+
+# Счётчики текущего запроса (см. request_stats); stats() возвращает накопленные за весь процесс
+_request_stats = ContextVar('tiered_cache_request_stats', default=None)
+
+
+@contextmanager
+def request_stats():
+    """Counter операций кэша внутри блока: PerformanceMiddleware пишет его в лог performance."""
+    counter = Counter()
+    token = _request_stats.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_stats.reset(token)
+
+
+def _unwrap(value):
+    return value.value if isinstance(value, Stamped) else value
+
+
+class TieredCache(BaseCache):
+    """
+    LOCATION — алиас L2 в CACHES. OPTIONS: L1_MAX_ENTRIES (0 выключает L1), L1_MAX_BYTES,
+    L1_TIMEOUT, L1_EXCLUDE, LOCK_TIMEOUT, BETA (агрессивность досрочного пересчёта, 1.0 — по умолчанию XFetch).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.l1_max_bytes = int(options.get('L1_MAX_BYTES', 16 * 1024 * 1024))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 2))
+        self.l1_exclude = tuple(options.get('L1_EXCLUDE', ()))
+        self.lock_timeout = float(options.get('LOCK_TIMEOUT', 10))
+        self.beta = float(options.get('BETA', 1.0))
+        self._l1 = OrderedDict()
+        self._l1_bytes = 0
+        self._lock = threading.Lock()
+        # Блокировки пересчёта get_or_set: ключ -> [Lock, число потоков, которые её держат или ждут]
+        self._recompute_locks = {}
+        self._stats = Counter()
+
+    @cached_property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # Статистика процесса
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._add(name, n)
+
+    def _add(self, name, n=1):
+        # Вызывается под self._lock
+        self._stats[name] += n
+        counter = _request_stats.get()
+        if counter is not None:
+            counter[name] += n
+
+    def stats(self):
+        with self._lock:
+            result = {name: self._stats[name] for name in STATS}
+            result['l1_entries'] = len(self._l1)
+            result['l1_bytes'] = self._l1_bytes
+        result['l1_max_entries'] = self.l1_max_entries
+        result['l1_max_bytes'] = self.l1_max_bytes
+        return result
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    # L1
+
+    def _l1_key(self, key, version):
+        if not self.l1_max_entries or key.startswith(self.l1_exclude):
+            return None
+        return self.l2.make_key(key, version)
+
+    def _l1_get(self, l1_key):
+        if l1_key is None:
+            return _MISSING
+        with self._lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                self._l1_pop(l1_key)
+                self._add('l1_expirations')
+                return _MISSING
+            self._l1.move_to_end(l1_key)
+            self._add('l1_hits')
+        # L1 хранит байты, как locmem: изменение полученного объекта не меняет кэш
+        return pickle.loads(pickled)
+
+    def _l1_set(self, l1_key, value, timeout=None):
+        if l1_key is None:
+            return
+        ttl = self.l1_timeout if timeout is None else min(self.l1_timeout, timeout)
+        if isinstance(value, Stamped):
+            ttl = min(ttl, value.expires_at - time.time())
+        if ttl <= 0:
+            self._l1_delete(l1_key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1_pop(l1_key)
+            if len(pickled) > self.l1_max_bytes:
+                # Значение больше всего L1 читается только из L2
+                return
+            self._l1[l1_key] = (time.monotonic() + ttl, pickled)
+            self._l1_bytes += len(pickled)
+            while len(self._l1) > self.l1_max_entries or self._l1_bytes > self.l1_max_bytes:
+                self._l1_pop(next(iter(self._l1)))
+                self._add('l1_evictions')
+
+    def _l1_pop(self, l1_key):
+        # Вызывается под self._lock
+        entry = self._l1.pop(l1_key, None)
+        if entry is not None:
+            self._l1_bytes -= len(entry[1])
+
+    def _l1_delete(self, l1_key):
+        if l1_key is not None:
+            with self._lock:
+                self._l1_pop(l1_key)
+
+    def _timeout(self, timeout):
+        """Время жизни в секундах (None — бессрочно), как его поймёт L2."""
+        return self.l2.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _from_l2(self, l1_key, value):
+        if value is _MISSING:
+            self._count('misses')
+        else:
+            self._count('l2_hits')
+            self._l1_set(l1_key, value)
+        return value
+
+    def _get(self, key, version):
+        l1_key = self._l1_key(key, version)
+        value = self._l1_get(l1_key)
+        if value is _MISSING:
+            value = self._from_l2(l1_key, self.l2.get(key, _MISSING, version=version))
+        return l1_key, value
+
+    # Интерфейс BaseCache
+
+    def get(self, key, default=None, version=None):
+        _, value = self._get(key, version)
+        return default if value is _MISSING else _unwrap(value)
+
+    async def aget(self, key, default=None, version=None):
+        l1_key = self._l1_key(key, version)
+        value = self._l1_get(l1_key)
+        if value is _MISSING:
+            value = self._from_l2(l1_key, await self.l2.aget(key, _MISSING, version=version))
+        return default if value is _MISSING else _unwrap(value)
+
+    def _split(self, keys, version):
+        found, rest = {}, {}
+        for key in keys:
+            l1_key = self._l1_key(key, version)
+            value = self._l1_get(l1_key)
+            if value is _MISSING:
+                rest[key] = l1_key
+            else:
+                found[key] = _unwrap(value)
+        return found, rest
+
+    def _merge(self, found, rest, fetched):
+        for key, l1_key in rest.items():
+            value = self._from_l2(l1_key, fetched.get(key, _MISSING))
+            if value is not _MISSING:
+                found[key] = _unwrap(value)
+        return found
+
+    def get_many(self, keys, version=None):
+        found, rest = self._split(keys, version)
+        fetched = self.l2.get_many(list(rest), version=version) if rest else {}
+        return self._merge(found, rest, fetched)
+
+    async def aget_many(self, keys, version=None):
+        # aget_many из BaseCache обращается к L2 по ключу; промахи L1 читаются одним get_many
+        found, rest = self._split(keys, version)
+        fetched = await sync_to_async(self.l2.get_many)(list(rest), version=version) if rest else {}
+        return self._merge(found, rest, fetched)
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self._l1_key(key, version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1_set(self._l1_key(key, version), value, self._timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self._l1_key(key, version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(l1_key, value, self._timeout(timeout))
+        else:
+            # В L2 уже лежит чужое значение: L1 перечитает его при следующем get
+            self._l1_delete(l1_key)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout=timeout, version=version)
+        timeout = self._timeout(timeout)
+        for key, value in data.items():
+            l1_key = self._l1_key(key, version)
+            if key in failed:
+                self._l1_delete(l1_key)
+            else:
+                self._l1_set(l1_key, value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            self._l1_delete(self._l1_key(key, version))
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self.l2.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._l1_delete(self._l1_key(key, version))
+        self.l2.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_delete(self._l1_key(key, version))
+        return self.l2.decr(key, delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+            self._l1_bytes = 0
+        self.l2.clear()
+
+    # get_or_set с защитой от одновременного пересчёта
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        if not callable(default):
+            return super().get_or_set(key, default, timeout=timeout, version=version)
+        l1_key, entry = self._get(key, version)
+        if not isinstance(entry, Stamped):
+            # Значение, записанное обычным set(), возвращается как есть
+            if entry is not _MISSING:
+                return entry
+            return self._recompute(key, default, timeout, version, l1_key, stale=None)
+        if not self._expiring(entry):
+            return entry.value
+        return self._recompute(key, default, timeout, version, l1_key, stale=entry)
+
+    async def aget_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        # default вызывается в потоке: асинхронный код передаёт сюда синхронную функцию с ORM
+        return await sync_to_async(self.get_or_set)(key, default, timeout=timeout, version=version)
+
+    def _expiring(self, entry):
+        # XFetch: -log(U) ~ Exp(1), пересчёт тем раньше, чем больше delta * BETA
+        return time.time() - entry.delta * self.beta * math.log(1 - random.random()) >= entry.expires_at
+
+    def _recompute_lock(self, name):
+        with self._lock:
+            entry = self._recompute_locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+        return entry[0]
+
+    def _release_recompute_lock(self, name):
+        # Блокировка живёт, пока её держит или ждёт хотя бы один поток
+        with self._lock:
+            entry = self._recompute_locks[name]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._recompute_locks[name]
+
+    def _recompute(self, key, default, timeout, version, l1_key, stale):
+        name = l1_key or self.l2.make_key(key, version)
+        lock = self._recompute_lock(name)
+        try:
+            return self._recompute_locked(lock, key, default, timeout, version, l1_key, stale)
+        finally:
+            self._release_recompute_lock(name)
+
+    def _recompute_locked(self, lock, key, default, timeout, version, l1_key, stale):
+        acquired = lock.acquire(blocking=False)
+        waited = False
+        if not acquired and stale is None:
+            acquired = waited = lock.acquire(timeout=self.lock_timeout)
+        if not acquired and stale is not None:
+            # Соседний поток уже пересчитывает значение
+            self._count('stale_hits')
+            return stale.value
+        try:
+            if waited:
+                entry = self.l2.get(key, _MISSING, version=version)
+                if isinstance(entry, Stamped) and entry.expires_at > time.time():
+                    self._count('coalesced')
+                    self._l1_set(l1_key, entry)
+                    return entry.value
+            lock_key = key + LOCK_SUFFIX
+            if not self.l2.add(lock_key, 1, timeout=self.lock_timeout, version=version):
+                # Пересчитывает другой процесс
+                if stale is not None:
+                    self._count('stale_hits')
+                    return stale.value
+                entry = self._wait(key, version, l1_key)
+                if entry is not _MISSING:
+                    self._count('coalesced')
+                    return entry.value
+                return self._compute(key, default, timeout, version, l1_key, stale)
+            try:
+                return self._compute(key, default, timeout, version, l1_key, stale)
+            finally:
+                self.l2.delete(lock_key, version=version)
+        finally:
+            if acquired:
+                lock.release()
+
+    def _wait(self, key, version, l1_key):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = self.l2.get(key, _MISSING, version=version)
+            if isinstance(entry, Stamped):
+                self._l1_set(l1_key, entry)
+                return entry
+        # Держатель блокировки не успел (или упал): значение считает этот запрос
+        return _MISSING
+
+    def _compute(self, key, default, timeout, version, l1_key, stale):
+        started = time.monotonic()
+        value = default()
+        delta = time.monotonic() - started
+        self._count('early_recomputes' if stale is not None and stale.expires_at > time.time() else 'recomputes')
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            return value
+        entry = Stamped(value, delta, math.inf if timeout is None else time.time() + timeout)
+        # L2 держит значение на LOCK_TIMEOUT дольше срока: пока его пересчитывают,
+        # остальные запросы отдают прежнее значение, а не ждут
+        self.l2.set(key, entry, timeout=None if timeout is None else timeout + self.lock_timeout, version=version)
+        self._l1_set(l1_key, entry)
+        return value
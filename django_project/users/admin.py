@@ -1,4 +1,10 @@
 from django.contrib import admin
-from users.models import User
+from users.models import User, OutgoingEmail
 
 admin.site.register(User)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
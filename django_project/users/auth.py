@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+
+# Пользователь запроса загружается из кэша, а не из users_user. Вместе с сессиями cached_db
+# запрос вошедшего пользователя проходит SessionMiddleware и AuthenticationMiddleware без
+# обращений к базе. Анонимный запрос без cookie сессии не трогает ни сессии, ни пользователей:
+# AuthenticationMiddleware загружает пользователя лениво, только при обращении к request.user.
+USER_KEY = 'users:user:{}'
+
+
+def _users():
+    # Пользователь читается с основной базы, даже если запрос читает с реплик (config.db_router):
+    # иначе в кэш на USER_CACHE_TIMEOUT попала бы отставшая копия (например, прежняя роль сразу
+    # после invalidate_users), а объект хранил бы в _state.db алиас реплики
+    return User._default_manager.db_manager(DEFAULT_DB_ALIAS)
+
+
+class CachedUserBackend(ModelBackend):
+    """ModelBackend, у которого get_user() читает пользователя из кэша (USER_CACHE_TIMEOUT секунд)."""
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = _users().filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, timeout=settings.USER_CACHE_TIMEOUT)
+        # Проверка is_active остаётся на каждый запрос, как в ModelBackend
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # Асинхронные представления (request.auser()) читают тот же ключ
+        key = USER_KEY.format(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await _users().filter(pk=user_id).afirst()
+            if user is None:
+                return None
+            await cache.aset(key, user, timeout=settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+def invalidate_users(*user_ids):
+    if user_ids:
+        cache.delete_many([USER_KEY.format(user_id) for user_id in user_ids])
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Роль, пароль (хэш сессии), активность и last_login сразу видны следующему запросу
+    invalidate_users(instance.pk)
@@ -0,0 +1,98 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# Повторные попытки: 1, 2, 4, 8... минут между попытками
+RETRY_BASE_DELAY = timedelta(minutes=1)
+MAX_ATTEMPTS = 5
+# Сколько письмо остаётся за воркером, забравшим его. Письмо, отправленное воркером, который упал
+# до отметки sent, после этого срока уйдёт повторно: доставка «хотя бы один раз»
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def enqueue_mail(subject, message, from_email, recipient_list):
+    """Ставит письмо в очередь. Отправляет его команда send_queued_mail."""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def claim_batch(batch_size=50):
+    """
+    Забирает пачку писем короткой транзакцией: статус sending и срок аренды CLAIM_LEASE.
+    Блокировки строк снимаются до обращения к SMTP.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked позволяет запускать несколько воркеров одновременно
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending', send_after__lte=now) | Q(status='sending', claimed_until__lte=now))
+            .order_by('send_after', 'id')[:batch_size]
+        )
+        if batch:
+            OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status='sending', claimed_until=now + CLAIM_LEASE)
+    return batch
+
+
+def send_queued_mail(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Отправляет одну пачку писем из очереди через одно SMTP-соединение.
+    Возвращает кортеж (отправлено, ошибок).
+    """
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _mark_failed(email, e, max_attempts)
+        return sent, len(batch)
+
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients,
+                                   connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                _mark_failed(email, e, max_attempts)
+                failed += 1
+            else:
+                # Отдельный короткий UPDATE на каждое письмо: сбой после отправки оставит
+                # письмо в sending до конца аренды, а не вернёт его в очередь сразу
+                OutgoingEmail.objects.filter(pk=email.pk).update(
+                    status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, claimed_until=None)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _mark_failed(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.claimed_until = None
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.send_after = timezone.now() + RETRY_BASE_DELAY * 2 ** (email.attempts - 1)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'send_after', 'claimed_until'])
+    logger.warning('Не удалось отправить письмо %s (попытка %s): %s', email.pk, email.attempts, error)
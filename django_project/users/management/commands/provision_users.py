@@ -0,0 +1,47 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import FIELDS, provision_users
+
+
+def _read(path):
+    with open(path, encoding='utf-8', newline='') as stream:
+        if path.endswith('.csv'):
+            rows = list(csv.DictReader(stream))
+        else:
+            rows = [json.loads(line) for line in stream if line.strip()]
+    for row in rows:
+        for name in ('is_active', 'is_staff', 'is_superuser'):
+            if isinstance(row.get(name), str):
+                row[name] = row[name].strip().lower() in ('1', 'true', 'yes')
+        if row.get('password') == '':
+            row['password'] = None
+    return rows
+
+
+class Command(BaseCommand):
+    help = (f'Creates or updates users from a CSV or JSON Lines file (email, password, {", ".join(FIELDS)}), '
+            'hashing passwords in a process pool')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--processes', type=int, help='Hashing processes (defaults to the number of CPUs)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            rows = _read(options['path'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read {options["path"]}: {error}')
+        if any(not row.get('email') for row in rows):
+            raise CommandError('Every row needs an email')
+
+        started = time.perf_counter()
+        result = provision_users(rows, processes=options['processes'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(result.created)}, updated {len(result.updated)}, unchanged {len(result.unchanged)} '
+            f'users in {elapsed:.1f}s ({len(rows) / elapsed:.0f} users/s)'))
@@ -1,5 +1,14 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
+
+ROLE_CHOICES = [
+    ('user', 'Обычный пользователь'),
+    ('moderator', 'Модератор'),
+    ('admin', 'Администратор'),
+]
+# Подписи ролей строятся один раз при импорте, а не на каждый вызов get_role_display
+ROLE_LABELS = dict(ROLE_CHOICES)
 
 
 class UserManager(BaseUserManager):
@@ -10,7 +19,6 @@ class UserManager(BaseUserManager):
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
-        print(f"Created user: {email}, role={user.role}, is_staff={user.is_staff}, is_superuser={user.is_superuser}")
         return user
 
     def create_superuser(self, email, password, **extra_fields):
@@ -30,11 +38,7 @@ class User(AbstractUser):
     telegram = models.CharField(max_length=100, blank=True, null=True)
     role = models.CharField(
         max_length=20,
-        choices=[
-            ('user', 'Обычный пользователь'),
-            ('moderator', 'Модератор'),
-            ('admin', 'Администратор'),
-        ],
+        choices=ROLE_CHOICES,
         default='user'
     )
     is_active = models.BooleanField(default=True)
@@ -48,4 +52,37 @@ class User(AbstractUser):
         return self.email
 
     def get_role_display(self):
-        return dict(self._meta.get_field('role').choices).get(self.role, 'Не определено')
+        return ROLE_LABELS.get(self.role, 'Не определено')
+
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст письма')
+    from_email = models.CharField(max_length=254, verbose_name='Отправитель')
+    recipients = models.JSONField(default=list, verbose_name='Получатели')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    send_after = models.DateTimeField(default=timezone.now, verbose_name='Отправить не раньше')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата отправки')
+    # Срок, до которого письмо в статусе sending закреплено за воркером; после него письмо
+    # считается брошенным (воркер упал) и забирается снова
+    claimed_until = models.DateTimeField(null=True, blank=True, verbose_name='Занято воркером до')
+
+    def __str__(self):
+        return f'{self.subject} → {", ".join(self.recipients)}'
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='users_outbox_due_idx'),
+        ]
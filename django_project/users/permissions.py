@@ -0,0 +1,71 @@
+from django.utils.functional import SimpleLazyObject
+
+# Права ролей (см. prava_dostups.txt). Проверки в представлениях, шаблонах и фильтрах
+# идут через Permissions, а не через сравнение user.role со строками.
+ROLE_CAPABILITIES = {
+    'admin': frozenset({
+        'view_inactive', 'toggle_active', 'moderate_fields', 'edit_any', 'delete_any', 'filter_owner',
+        'edit_pets',
+    }),
+    'moderator': frozenset({'view_inactive', 'toggle_active', 'moderate_fields'}),
+    'user': frozenset({'edit_pets'}),
+}
+
+
+class Permissions:
+    """Возможности пользователя, вычисленные один раз."""
+
+    def __init__(self, user):
+        self.user = user
+        self.role = getattr(user, 'role', None)
+        self.capabilities = ROLE_CAPABILITIES.get(user.role, frozenset()) if user.is_authenticated else frozenset()
+
+    def __contains__(self, capability):
+        return capability in self.capabilities
+
+    @property
+    def can_view_inactive(self):
+        return 'view_inactive' in self.capabilities
+
+    @property
+    def can_toggle_active(self):
+        return 'toggle_active' in self.capabilities
+
+    @property
+    def can_moderate_fields(self):
+        # Поля is_active, owner и view_count в форме питомца
+        return 'moderate_fields' in self.capabilities
+
+    @property
+    def can_filter_owner(self):
+        return 'filter_owner' in self.capabilities
+
+    @property
+    def can_edit_pets(self):
+        # Модератор меняет только статус активности и не пользуется формой питомца
+        return 'edit_pets' in self.capabilities
+
+    def is_owner(self, obj):
+        # Сравнение по owner_id не загружает владельца из базы
+        return self.user.is_authenticated and obj.owner_id == self.user.pk
+
+    def can_edit(self, obj):
+        return self.is_owner(obj) or 'edit_any' in self.capabilities
+
+    def can_delete(self, obj):
+        return self.is_owner(obj) or 'delete_any' in self.capabilities
+
+
+def get_permissions(user):
+    """Permissions пользователя; запоминаются на объекте, то есть на время запроса."""
+    permissions = getattr(user, '_permissions', None)
+    # После смены роли на том же объекте права вычисляются заново
+    if permissions is None or permissions.role != getattr(user, 'role', None):
+        permissions = Permissions(user)
+        user._permissions = permissions
+    return permissions
+
+
+def access(request):
+    """Контекстный процессор: {{ access.can_toggle_active }} и т. п. в шаблонах."""
+    return {'access': SimpleLazyObject(lambda: get_permissions(request.user))}
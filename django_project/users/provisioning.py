@@ -0,0 +1,88 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.db import transaction
+
+from .auth import invalidate_users
+from .models import User
+
+# Массовое создание и обновление пользователей. Хэширование паролей (PBKDF2) — самая
+# дорогая часть, поэтому оно выполняется в пуле процессов, а запись идёт через bulk_create/bulk_update.
+# Меньше этого числа паролей пул не поднимается: запуск процессов дороже самого хэширования
+POOL_THRESHOLD = 8
+FIELDS = ['role', 'first_name', 'last_name', 'phone', 'telegram', 'is_active', 'is_staff', 'is_superuser']
+
+ProvisionResult = namedtuple('ProvisionResult', 'created updated unchanged')
+
+
+def _init_worker():
+    # При запуске через spawn дочерний процесс не унаследует настроенный Django
+    django.setup()
+
+
+def _hash(task):
+    """Возвращает хэш пароля: прежний, если он подходит и не устарел, иначе новый."""
+    raw, encoded = task
+    if raw is None:
+        return encoded or make_password(None)
+    if encoded and check_password(raw, encoded):
+        try:
+            if not identify_hasher(encoded).must_update(encoded):
+                return encoded
+        except ValueError:
+            pass
+    return make_password(raw)
+
+
+def hash_passwords(tasks, processes=None):
+    """Хэширует пары (пароль, текущий хэш) на всех ядрах, сохраняя порядок."""
+    tasks = list(tasks)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(tasks) < POOL_THRESHOLD:
+        return [_hash(task) for task in tasks]
+    chunksize = max(1, len(tasks) // (processes * 4))
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+        return list(pool.map(_hash, tasks, chunksize=chunksize))
+
+
+def provision_users(rows, processes=None, batch_size=1000):
+    """
+    Создаёт или обновляет пользователей по email. Строка — словарь с email, password
+    (может отсутствовать) и полями из FIELDS. Неизменившиеся пользователи не перезаписываются.
+    """
+    rows = {User.objects.normalize_email(row['email']): row for row in rows}
+    existing = {}
+    emails = list(rows)
+    for start in range(0, len(emails), batch_size):
+        existing.update(User.objects.filter(email__in=emails[start:start + batch_size]).in_bulk(field_name='email'))
+
+    hashes = hash_passwords(
+        [(rows[email].get('password'), existing[email].password if email in existing else None) for email in emails],
+        processes,
+    )
+
+    created, updated, unchanged = [], [], []
+    for email, password in zip(emails, hashes):
+        values = {name: rows[email][name] for name in FIELDS if name in rows[email]}
+        user = existing.get(email)
+        if user is None:
+            created.append(User(email=email, password=password, **values))
+            continue
+        values['password'] = password
+        if all(getattr(user, name) == value for name, value in values.items()):
+            unchanged.append(user)
+            continue
+        for name, value in values.items():
+            setattr(user, name, value)
+        updated.append(user)
+
+    with transaction.atomic():
+        User.objects.bulk_create(created, batch_size=batch_size)
+        if updated:
+            User.objects.bulk_update(updated, FIELDS + ['password'], batch_size=batch_size)
+            # bulk_update не отправляет post_save: сбрасываем закэшированных пользователей сами
+            transaction.on_commit(lambda: invalidate_users(*(user.pk for user in updated)))
+    return ProvisionResult(created, updated, unchanged)
@@ -1,3 +1,226 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Pet
+from config import db_router
+
+from .auth import CachedUserBackend
+from .mail import MAX_ATTEMPTS, claim_batch, enqueue_mail, send_queued_mail
+from .models import OutgoingEmail, User
+from .permissions import get_permissions
+from .provisioning import provision_users
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', LANGUAGE_CODE='ru')
+class MailQueueTests(TestCase):
+    def test_register_only_enqueues(self):
+        response = self.client.post(reverse('users:register'), {
+            'email': 'new@example.com', 'password1': 'secret12345', 'password2': 'secret12345',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.recipients, ['new@example.com'])
+        self.assertEqual(queued.status, 'pending')
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for i in range(3):
+            enqueue_mail('Тема', 'Текст', 'from@example.com', [f'user{i}@example.com'])
+        with mock.patch('users.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            sent, failed = send_queued_mail(batch_size=10)
+        self.assertEqual((sent, failed), (3, 0))
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.filter(status='pending').exists())
+
+    def test_failed_send_is_retried_later(self):
+        email = enqueue_mail('Тема', 'Текст', 'from@example.com', ['user@example.com'])
+        with mock.patch('users.mail.EmailMessage.send', side_effect=OSError('smtp down')):
+            self.assertEqual(send_queued_mail(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.send_after, email.created_at)
+        # Повторная попытка ещё не наступила
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_email_marked_failed_after_max_attempts(self):
+        email = enqueue_mail('Тема', 'Текст', 'from@example.com', ['user@example.com'])
+        OutgoingEmail.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS - 1)
+        with mock.patch('users.mail.EmailMessage.send', side_effect=OSError('smtp down')):
+            send_queued_mail()
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+
+    def test_claimed_emails_wait_for_the_lease(self):
+        email = enqueue_mail('Тема', 'Текст', 'from@example.com', ['user@example.com'])
+        self.assertEqual([claimed.pk for claimed in claim_batch()], [email.pk])
+        # Письмо занято другим воркером
+        self.assertEqual(send_queued_mail(), (0, 0))
+        OutgoingEmail.objects.filter(pk=email.pk).update(claimed_until=email.created_at)
+        self.assertEqual(send_queued_mail(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.claimed_until), ('sent', 1, None))
+
+    def test_database_error_after_smtp_does_not_resend(self):
+        enqueue_mail('Тема', 'Текст', 'from@example.com', ['user@example.com'])
+        update = QuerySet.update
+
+        def failing_update(queryset, **kwargs):
+            if kwargs.get('status') == 'sent':
+                raise DatabaseError('connection lost')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=failing_update):
+            with self.assertRaises(DatabaseError):
+                send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get().status, 'sending')
+        self.assertEqual(send_queued_mail(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_password_reset_enqueues(self):
+        User.objects.create_user('reset@example.com', 'secret12345')
+        self.client.post(reverse('users:password_reset'), {'email': 'reset@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual([e.recipients for e in OutgoingEmail.objects.all()], [['reset@example.com']] * 2)
+
+
+class ProvisioningTests(TestCase):
+    def test_second_run_keeps_hashes_and_skips_writes(self):
+        rows = [{'email': f'user{i}@example.com', 'password': f'secret{i}', 'role': 'user'} for i in range(3)]
+        result = provision_users(rows, processes=1)
+        self.assertEqual(len(result.created), 3)
+        hashes = dict(User.objects.values_list('email', 'password'))
+
+        rows[0]['role'] = 'moderator'
+        result = provision_users(rows, processes=1)
+        self.assertEqual([user.email for user in result.updated], ['user0@example.com'])
+        self.assertEqual(len(result.unchanged), 2)
+        self.assertEqual(dict(User.objects.values_list('email', 'password')), hashes)
+        self.assertTrue(User.objects.get(email='user2@example.com').check_password('secret2'))
+
+    def test_changed_password_is_rehashed(self):
+        provision_users([{'email': 'user@example.com', 'password': 'old-secret'}], processes=1)
+        result = provision_users([{'email': 'user@example.com', 'password': 'new-secret'}], processes=1)
+        self.assertEqual(len(result.updated), 1)
+        self.assertTrue(User.objects.get().check_password('new-secret'))
+
+    @override_settings(LANGUAGE_CODE='ru')
+    def test_register_hashes_password_once(self):
+        with mock.patch('django.contrib.auth.base_user.make_password', wraps=make_password) as hasher:
+            self.client.post(reverse('users:register'), {
+                'email': 'new@example.com', 'password1': 'secret12345', 'password2': 'secret12345',
+            })
+        self.assertEqual(hasher.call_count, 1)
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+
+class PermissionsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner@example.com', 'secret12345')
+        self.other = User.objects.create_user('other@example.com', 'secret12345')
+        self.pet = Pet.objects.create(name='Рекс', species='dog', age=3, description='Пёс', owner=self.owner)
+
+    def test_roles_grant_capabilities(self):
+        admin = User(email='admin@example.com', role='admin')
+        moderator = User(email='moderator@example.com', role='moderator')
+        self.assertTrue(get_permissions(admin).can_filter_owner)
+        self.assertTrue(get_permissions(admin).can_edit_pets)
+        self.assertTrue(get_permissions(moderator).can_toggle_active)
+        self.assertTrue(get_permissions(moderator).can_view_inactive)
+        self.assertFalse(get_permissions(moderator).can_edit_pets)
+        self.assertFalse(get_permissions(moderator).can_filter_owner)
+        self.assertTrue(get_permissions(self.other).can_edit_pets)
+        self.assertFalse(get_permissions(self.other).can_toggle_active)
+        self.assertFalse(get_permissions(self.other).can_moderate_fields)
+
+    def test_anonymous_and_unknown_roles_get_nothing(self):
+        self.assertEqual(get_permissions(AnonymousUser()).capabilities, frozenset())
+        self.assertFalse(get_permissions(AnonymousUser()).can_edit(self.pet))
+        self.assertEqual(get_permissions(User(email='ghost@example.com', role='ghost')).capabilities, frozenset())
+
+    def test_object_checks(self):
+        self.assertTrue(get_permissions(self.owner).can_edit(self.pet))
+        self.assertTrue(get_permissions(self.owner).can_delete(self.pet))
+        self.assertFalse(get_permissions(self.other).can_edit(self.pet))
+        self.assertFalse(get_permissions(self.other).can_delete(self.pet))
+        moderator = User.objects.create_user('moderator@example.com', 'secret12345', role='moderator')
+        self.assertFalse(get_permissions(moderator).can_edit(self.pet))
+        admin = User.objects.create_user('admin@example.com', 'secret12345', role='admin')
+        self.assertTrue(get_permissions(admin).can_edit(self.pet))
+        self.assertTrue(get_permissions(admin).can_delete(self.pet))
+
+    def test_permissions_are_computed_once_per_user_object(self):
+        permissions = get_permissions(self.other)
+        self.assertIs(get_permissions(self.other), permissions)
+        with self.assertNumQueries(0):
+            self.assertFalse(get_permissions(self.other).is_owner(self.pet))
+
+    def test_role_change_resets_cached_permissions(self):
+        self.assertFalse(get_permissions(self.other).can_toggle_active)
+        self.other.role = 'moderator'
+        self.other.save()
+        self.assertTrue(get_permissions(self.other).can_toggle_active)
+        self.assertFalse(get_permissions(self.other).can_edit_pets)
+
+
+@override_settings(LANGUAGE_CODE='ru')
+class SessionLayerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member@example.com', 'secret12345')
+        self.client.force_login(self.user)
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries if 'django_session' in q['sql'] or 'users_user' in q['sql']]
+
+    def test_authenticated_request_reads_session_and_user_from_cache(self):
+        self.session_queries(reverse('blog:pet_list'))
+        response, queries = self.session_queries(reverse('blog:pet_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_saved_user_is_reloaded(self):
+        self.client.get(reverse('blog:pet_list'))
+        self.user.role = 'moderator'
+        self.user.save()
+        response = self.client.get(reverse('blog:pet_list'))
+        self.assertEqual(response.wsgi_request.user.role, 'moderator')
+
+    def test_logout_deletes_session_once_and_keeps_message_in_cookie(self):
+        response, queries = self.session_queries(reverse('users:logout'))
+        self.assertRedirects(response, reverse('blog:pet_list'), fetch_redirect_response=False)
+        self.assertEqual(len([sql for sql in queries if sql.startswith('DELETE')]), 1)
+        self.assertFalse(Session.objects.exists())
+        self.assertIn('messages', response.cookies)
+
+    def test_user_cached_during_replica_read_is_saved_to_default(self):
+        # Алиаса replica1 в тестах нет: обращение к нему завершилось бы ошибкой
+        state = db_router.RoutingState(pinned=False)
+        state.replica_reads = True
+        token = db_router._state.set(state)
+        try:
+            with self.settings(DATABASE_REPLICAS=['replica1']):
+                self.assertEqual(Pet.objects.all().db, 'replica1')
+                CachedUserBackend().get_user(self.user.pk)
+                user = CachedUserBackend().get_user(self.user.pk)
+        finally:
+            db_router._state.reset(token)
+        self.assertEqual(user._state.db, 'default')
+        user.first_name = 'Анна'
+        user.save(update_fields=['first_name'])
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, 'Анна')
@@ -1,12 +1,16 @@
+import hashlib
+
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.views import LoginView, PasswordResetView, PasswordResetConfirmView
 from django.views.generic import View, UpdateView, TemplateView, ListView, DetailView
 from django.urls import reverse_lazy
-from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserUpdateForm
-from django.core.mail import send_mail
+from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserUpdateForm, QueuedPasswordResetForm
+from .mail import enqueue_mail
 from django.conf import settings
+from config.conditional import ConditionalGetMixin
+from config.db_router import ReplicaReadMixin
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
@@ -28,22 +32,21 @@ class RegisterView(View):
     def post(self, request):
         form = self.form_class(request.POST)
         if form.is_valid():
-            user = form.save(commit=False)
+            # form.save() захэшировал бы введённый пароль, который тут же заменяется случайным:
+            # берём заполненный формой объект и хэшируем пароль один раз
+            user = form.instance
             # Генерируем случайный пароль
             random_password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
             user.set_password(random_password)
             user.save()
-            login(request, user)
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             # Отправка email с случайным паролем на email пользователя
             subject = 'Добро пожаловать в наш сервис!'
             message = f'Здравствуйте, {user.email}!\n\nВы успешно зарегистрированы на нашем сайте.\nВаши учетные данные:\nEmail: {user.email}\nВаш случайный пароль: {random_password}\n\nСохраните этот пароль или измените его в профиле.\nС уважением,\nКоманда сайта'
             from_email = settings.EMAIL_HOST_USER  # Отправляется от lachenil@yandex.ru
             recipient_list = [user.email]  # Отправка на email пользователя
-            try:
-                send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-                messages.success(request, f'Регистрация прошла успешно! Пароль отправлен на {user.email}.')
-            except Exception as e:
-                messages.error(request, f'Ошибка отправки email: {str(e)}. Пароль: {random_password}')
+            enqueue_mail(subject, message, from_email, recipient_list)
+            messages.success(request, f'Регистрация прошла успешно! Пароль отправлен на {user.email}.')
             return redirect('blog:pet_list')
         return render(request, self.template_name, {'form': form})
 
@@ -95,11 +98,12 @@ class ChangePasswordView(View):
         request.user.set_password(new_password1)
         request.user.save()
         messages.success(request, 'Пароль успешно изменён!')
-        login(request, request.user)
+        login(request, request.user, backend=settings.AUTHENTICATION_BACKENDS[0])
         return redirect('users:profile')
 
 
 class CustomPasswordResetView(PasswordResetView):
+    form_class = QueuedPasswordResetForm
     template_name = 'users/reset_password.html'
     email_template_name = 'users/password_reset_email.html'
     success_url = reverse_lazy('users:login')
@@ -110,11 +114,8 @@ class CustomPasswordResetView(PasswordResetView):
         if user:
             subject = 'Сброс пароля'
             message = f'Здравствуйте, {user.email}!\n\nВы запросили сброс пароля. Перейдите по ссылке для создания нового пароля:\n{self.request.build_absolute_uri(reverse_lazy("users:password_reset_confirm", kwargs={"uidb64": urlsafe_base64_encode(force_bytes(user.pk)), "token": default_token_generator.make_token(user)}))}\n\nЕсли это были не вы, проигнорируйте это письмо.\nС уважением,\nКоманда сайта'
-            try:
-                send_mail(subject, message, settings.EMAIL_HOST_USER, [email], fail_silently=False)
-                messages.success(self.request, f'Ссылка для сброса пароля отправлена на {email}.')
-            except Exception as e:
-                messages.error(self.request, f'Ошибка отправки email: {str(e)}.')
+            enqueue_mail(subject, message, settings.EMAIL_HOST_USER, [email])
+            messages.success(self.request, f'Ссылка для сброса пароля отправлена на {email}.')
         else:
             messages.error(self.request, 'Пользователь с таким email не найден.')
         return super().form_valid(form)
@@ -127,20 +128,33 @@ class CustomPasswordResetConfirmView(PasswordResetConfirmView):
 
 class LogoutView(View):
     def get(self, request):
+        # logout() уже очищает сессию; сообщение уходит в cookie (MESSAGE_STORAGE), а не в сессию
         logout(request)
-        request.session.flush()
         messages.success(request, 'Вы успешно вышли из системы.')
         return redirect('blog:pet_list')
 
 
-class UserListView(ListView):
+class UserListView(ReplicaReadMixin, ListView):
     model = User
     template_name = 'users/user_list.html'
     context_object_name = 'users'
     paginate_by = 5
 
+    def get_queryset(self):
+        # Шаблон выводит только email и роль
+        return User.objects.only('id', 'email', 'role').order_by('id')
+
 
-class UserDetailView(DetailView):
+class UserDetailView(ReplicaReadMixin, ConditionalGetMixin, DetailView):
     model = User
     template_name = 'users/user_detail.html'
     context_object_name = 'user'
+    # Поля, которые выводит шаблон профиля
+    profile_fields = ('email', 'role', 'first_name', 'last_name', 'phone', 'telegram', 'date_joined', 'is_active')
+
+    def get_validators(self):
+        # У пользователя нет даты изменения: версия — сами выводимые поля, Last-Modified не отдаётся
+        row = User.objects.filter(pk=self.kwargs['pk']).values_list(*self.profile_fields).first()
+        if row is None:
+            return None
+        return hashlib.md5(repr(row).encode()).hexdigest(), None